@@ -1,13 +1,15 @@
-"""ASCII変換や描画に関するユーティリティ群."""
+"""ASCII変換に関するユーティリティ群 (描画は ascii_render)."""
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Iterable
+from dataclasses import dataclass, replace
+from functools import lru_cache
 
 import numpy as np
 import cv2
-from PIL import Image, ImageDraw, ImageFont
+
+from glyph_atlas import GLYPH_PATCH, charset_ramp, glyph_matrix
+from perf_stats import StatsCallback, Stopwatch
 
 
 CHARSETS = {
@@ -16,6 +18,20 @@ CHARSETS = {
     "Dense (16)": " .'`\",:;Il!i><~+_-?][}{1)(|\\/*tfjrxnuvczXYUJCLQ0OZmwqpdbkhao*#MW&8%B@$",
 }
 
+MATCH_MODES = ("tone", "shape")
+# charset: 文字セットの並びのまま / sorted: 実測の被覆率順に並べ替え / even: さらに被覆率に比例して輝度を割り当て
+RAMP_MODES = ("charset", "sorted", "even")
+DITHER_MODES = ("none", "bayer", "blue_noise", "error_diffusion")
+# 輪郭セルに使う文字。勾配方向を45度刻みにした輪郭線の向き (縦・右上がり・横・右下がり) の順
+EDGE_GLYPHS = "|/-\\"
+_EDGE_COHERENCE = 0.5  # 方向のそろい具合 (0..1) がこれ未満のセルはテクスチャとみなす
+COLOR_MODES = ("mono", "color")
+# 1チャンネルあたりの階調数。パレットは levels**3 色 (6 ならWebセーフ216色)
+COLOR_LEVELS = (2, 3, 4, 6, 8)
+# ChangeDetector が変化なしとみなす、セルの格子に縮めた輝度の差 (0..255) の平均と最大
+CHANGE_MEAN_THRESHOLD = 1.0
+CHANGE_MAX_THRESHOLD = 6
+
 
 @dataclass
 class AsciiParams:
@@ -31,6 +47,38 @@ class AsciiParams:
     gamma: float = 1.0
     contrast: float = 1.0
     brightness: float = 0.0  # -100..100
+    color_mode: str = "mono"
+    color_levels: int = 4
+    hysteresis: int = 0  # 0..255。0で時間方向の安定化なし
+    dither: str = "none"  # DITHER_MODES のいずれか (2値化時は無効)
+    match_mode: str = "tone"  # "shape" ならセル内の形が近い文字を選ぶ
+    glyph_font: str = ""  # 形状マッチ・濃度順の計測でラスタライズするフォントファイル (空なら既定の候補)
+    ramp: str = "charset"  # RAMP_MODES のいずれか
+    edges: bool = False  # 輪郭の強いセルを向きに応じた線の文字に置き換える
+    edge_threshold: int = 64  # 輪郭とみなすセル内の勾配の強さ (0..255)
+    # 変換する範囲 (x, y, 幅, 高さ)。フレームに対する0..1の割合で、Noneならフレーム全体
+    roi: tuple[float, float, float, float] | None = None
+
+
+def roi_bounds(width: int, height: int,
+               roi: tuple[float, float, float, float] | None) -> tuple[int, int, int, int]:
+    """``roi`` を画素範囲 (x0, y0, x1, y1) にする。フレームからはみ出た分は切り詰め、最低1画素は残す."""
+    if roi is None:
+        return 0, 0, width, height
+    x, y, w, h = (float(v) for v in roi)
+    x0 = min(max(int(round(x * width)), 0), max(width - 1, 0))
+    y0 = min(max(int(round(y * height)), 0), max(height - 1, 0))
+    x1 = min(max(int(round((x + w) * width)), x0 + 1), width)
+    y1 = min(max(int(round((y + h) * height)), y0 + 1), height)
+    return x0, y0, x1, y1
+
+
+def crop_roi(img: np.ndarray, roi: tuple[float, float, float, float] | None) -> np.ndarray:
+    """``roi`` の範囲だけを指すビュー (コピーしない)."""
+    if roi is None:
+        return img
+    x0, y0, x1, y1 = roi_bounds(img.shape[1], img.shape[0], roi)
+    return img[y0:y1, x0:x1]
 
 
 def apply_tone(gray: np.ndarray, gamma: float, contrast: float, brightness: float) -> np.ndarray:
@@ -43,109 +91,516 @@ def apply_tone(gray: np.ndarray, gamma: float, contrast: float, brightness: floa
     return (x * 255.0).astype(np.uint8)
 
 
-def frame_to_ascii(gray: np.ndarray, params: AsciiParams) -> list[str]:
-    """グレースケールフレームをASCII行配列に変換."""
-    small = cv2.resize(gray, (params.cols, params.rows), interpolation=cv2.INTER_AREA)
-    small = apply_tone(small, params.gamma, params.contrast, params.brightness)
+@dataclass
+class AsciiFrame:
+    """文字テーブルへのインデックス格子として表した1フレーム分のASCII.
 
-    binary_mask: np.ndarray | None = None
-    if params.binarize:
-        thresh = int(np.clip(params.binarize_threshold, 0, 255))
-        binary_mask = small >= thresh
-        small = np.where(binary_mask, 255, 0).astype(np.uint8)
+    ``luma`` はトーン補正後・2値化前の縮小輝度 (rows x cols, uint8)。
+    ``colors`` はカラーモード時のみ、パレットに量子化したセルの平均色
+    (rows x cols x 3, uint8, BGR順)。
+    """
 
-    if params.invert:
-        small = 255 - small
-        if binary_mask is not None:
-            binary_mask = ~binary_mask
+    indices: np.ndarray
+    glyphs: str
+    luma: np.ndarray | None = None
+    colors: np.ndarray | None = None
 
+    @property
+    def shape(self) -> tuple[int, int]:
+        return int(self.indices.shape[0]), int(self.indices.shape[1])
+
+    @property
+    def lines(self) -> list[str]:
+        return glyph_grid_to_lines(self.indices, self.glyphs)
+
+
+def glyph_grid_to_lines(indices: np.ndarray, glyphs: str) -> list[str]:
+    """インデックス格子を行文字列のリストに展開."""
+    rows, cols = indices.shape
+    if rows == 0 or cols == 0:
+        return [""] * rows
+    table = np.array(list(glyphs), dtype="<U1")
+    chars = np.ascontiguousarray(table[indices])
+    # 1文字ずつのU1配列を行単位のU{cols}として読み替えると一括で文字列化できる
+    return chars.view(f"<U{cols}").ravel().tolist()
+
+
+def resolve_charset(params: AsciiParams) -> tuple[str, bool]:
+    """使用する文字セットと、カスタム文字セットが選ばれているかを返す."""
     custom_charset = (params.custom_charset or "").rstrip("\n")
-    custom_selected = params.charset_name == "Custom" and custom_charset
+    custom_selected = bool(params.charset_name == "Custom" and custom_charset)
     if custom_selected:
         charset = custom_charset
     else:
         charset = CHARSETS.get(params.charset_name, CHARSETS["Blocks (5)"])
     if not charset:
         charset = CHARSETS["Blocks (5)"]
+    return charset, custom_selected
+
+
+def uses_pattern(params: AsciiParams) -> bool:
+    _, custom_selected = resolve_charset(params)
+    return bool(params.binarize and custom_selected and params.binarize_custom_mode == "pattern")
+
+
+def glyph_table(params: AsciiParams) -> str:
+    """``AsciiFrame.glyphs`` として使われる文字テーブル."""
+    glyphs = _tone_glyphs(params)
+    if uses_edges(params):
+        # 輪郭用の文字は末尾に足し、輝度の割り当てには使わない
+        return glyphs + EDGE_GLYPHS
+    return glyphs
+
+
+def _tone_glyphs(params: AsciiParams) -> str:
+    charset, _ = resolve_charset(params)
+    if uses_pattern(params):
+        # パターンモードでは末尾に空白を足し、マスク外のセルはそれを指す
+        return charset + " "
+    if uses_ramp(params):
+        return charset_ramp(params.glyph_font, charset)[0]
+    return charset
+
+
+def uses_shape(params: AsciiParams) -> bool:
+    # パターンモードは文字の並びが決まっているので輝度だけで割り当てる
+    return params.match_mode == "shape" and not uses_pattern(params)
+
+
+def uses_ramp(params: AsciiParams) -> bool:
+    # パターンモードの文字列は敷き詰める順番そのものなので並べ替えない
+    return params.ramp in RAMP_MODES[1:] and not uses_pattern(params)
+
+
+def uses_edges(params: AsciiParams) -> bool:
+    return bool(params.edges) and not uses_pattern(params)
+
+
+def uses_glyph_font(params: AsciiParams) -> bool:
+    """変換結果が ``glyph_font`` のラスタライズに依存するか."""
+    return uses_shape(params) or uses_ramp(params)
+
+
+def uses_color(params: AsciiParams) -> bool:
+    return params.color_mode == "color"
+
+
+@lru_cache(maxsize=16)
+def _color_lut(levels: int) -> np.ndarray:
+    """チャンネル値(0..255) -> 最も近いパレット階調."""
+    levels = int(np.clip(levels, 2, 256))
+    step = 255.0 / (levels - 1)
+    v = np.arange(256, dtype=np.float32)
+    lut = np.clip(np.round(np.round(v / step) * step), 0, 255).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+def cell_colors(bgr: np.ndarray, params: AsciiParams) -> np.ndarray:
+    """セルごとの平均色をパレットに量子化して返す (rows x cols x 3, BGR)."""
+    small = cv2.resize(bgr, (params.cols, params.rows), interpolation=cv2.INTER_AREA)
+    return _color_lut(params.color_levels)[small]
+
+
+@lru_cache(maxsize=64)
+def _tone_lut(levels: int, invert: bool) -> np.ndarray:
+    """輝度(0..255) -> 文字インデックスの変換表."""
+    v = np.arange(256, dtype=np.uint8)
+    if invert:
+        v = 255 - v
+    idx = (v.astype(np.float32) / 255.0) * (levels - 1)
+    lut = (levels - 1 - idx).astype(np.int32).astype(np.uint16)
+    lut.flags.writeable = False
+    return lut
+
+
+@lru_cache(maxsize=64)
+def _ramp_lut(coverage: tuple[float, ...], invert: bool) -> np.ndarray:
+    """輝度(0..255) -> 被覆率が最も近い文字のインデックス.
+
+    ``coverage`` は薄い順に並んだ正規化済みの被覆率。``_tone_lut`` と同じ向きで、
+    非反転なら暗いほど濃い文字になる。
+    """
+    v = np.arange(256, dtype=np.float32)
+    if invert:
+        v = 255.0 - v
+    density = 1.0 - v / 255.0
+    cov = np.asarray(coverage, dtype=np.float32)
+    lut = np.abs(density[:, None] - cov[None, :]).argmin(axis=1).astype(np.uint16)
+    lut.flags.writeable = False
+    return lut
+
+
+def luma_grid(gray: np.ndarray, params: AsciiParams) -> np.ndarray:
+    """``params.roi`` の範囲をセルの格子 (rows x cols) に面積平均で縮めた輝度."""
+    return cv2.resize(crop_roi(gray, params.roi), (params.cols, params.rows), interpolation=cv2.INTER_AREA)
+
+
+def convert_frame(gray: np.ndarray, params: AsciiParams,
+                  stats: StatsCallback | None = None,
+                  bgr: np.ndarray | None = None,
+                  small: np.ndarray | None = None) -> AsciiFrame:
+    """グレースケールフレームを文字インデックス格子に変換.
+
+    カラーモードでは元のBGRフレームも渡すと ``colors`` を埋める。
+    ``params.roi`` があれば縮小の前に切り出し、範囲外の画素には触れない。
+    ``small`` は縮小済みの輝度 (``luma_grid``)。あれば縮小を省く (形状マッチでは使わない)。
+    """
+    watch = Stopwatch(stats)
+    if params.roi is not None:
+        gray = crop_roi(gray, params.roi)
+        if bgr is not None:
+            bgr = crop_roi(bgr, params.roi)
+    if uses_shape(params):
+        pw, ph = GLYPH_PATCH
+        big = cv2.resize(gray, (params.cols * pw, params.rows * ph), interpolation=cv2.INTER_AREA)
+        watch.lap("resize")
+        tone = _tone_curve(params.gamma, params.contrast, params.brightness)[big]
+        watch.lap("tone")
+        frame = shape_to_glyphs(tone, params)
+        watch.lap("glyph")
+        if uses_edges(params):
+            # 同じ解像度に縮小済みなので輪郭の計測にも使い回す
+            gray = big
+    else:
+        if small is None:
+            # gray は切り出し済み
+            small = cv2.resize(gray, (params.cols, params.rows), interpolation=cv2.INTER_AREA)
+        watch.lap("resize")
+        tone = apply_tone(small, params.gamma, params.contrast, params.brightness)
+        watch.lap("tone")
+        frame = tone_to_glyphs(tone, params)
+        watch.lap("glyph")
+    if uses_edges(params):
+        frame = overlay_edges(frame, gray, params)
+        watch.lap("edges")
+    if bgr is not None and uses_color(params):
+        frame.colors = cell_colors(bgr, params)
+        watch.lap("color")
+    return frame
+
+
+@lru_cache(maxsize=4)
+def _bayer_matrix(n: int = 8) -> np.ndarray:
+    """n x n のBayer行列を (0, 1) の閾値にしたもの."""
+    m = np.zeros((1, 1), dtype=np.float32)
+    while m.shape[0] < n:
+        m = np.block([[4 * m, 4 * m + 2], [4 * m + 3, 4 * m + 1]])
+    m = ((m + 0.5) / m.size).astype(np.float32)
+    m.flags.writeable = False
+    return m
+
 
-    use_pattern = (
-        params.binarize and
-        custom_selected and
-        params.binarize_custom_mode == "pattern" and
-        binary_mask is not None
+@lru_cache(maxsize=1)
+def _blue_noise_matrix(size: int = 64, seed: int = 7) -> np.ndarray:
+    """白色ノイズの低域を繰り返し除いて順位化した、周期的な青色ノイズ閾値."""
+    rng = np.random.default_rng(seed)
+    noise = rng.random((size, size))
+    fy = np.fft.fftfreq(size)[:, None]
+    fx = np.fft.fftfreq(size)[None, :]
+    lowpass = np.exp(-(fx ** 2 + fy ** 2) * (2.0 * np.pi * 1.5) ** 2 / 2.0)
+    for _ in range(4):
+        # FFTでの畳み込みなので端は自動的に周期的につながり、タイル張りしても継ぎ目が出ない
+        noise = noise - np.real(np.fft.ifft2(np.fft.fft2(noise) * lowpass))
+        ranks = np.argsort(np.argsort(noise, axis=None))
+        noise = ranks.reshape(size, size) / float(size * size)
+    m = (noise + 0.5 / (size * size)).astype(np.float32)
+    m.flags.writeable = False
+    return m
+
+
+@lru_cache(maxsize=32)
+def _threshold_tile(mode: str, rows: int, cols: int) -> np.ndarray:
+    base = _bayer_matrix() if mode == "bayer" else _blue_noise_matrix()
+    reps = (-(-rows // base.shape[0]), -(-cols // base.shape[1]))
+    tile = np.ascontiguousarray(np.tile(base, reps)[:rows, :cols])
+    tile.flags.writeable = False
+    return tile
+
+
+def dither_indices(tone: np.ndarray, levels: int, invert: bool, mode: str) -> np.ndarray:
+    """ディザを掛けて ``levels`` 段階に量子化し、文字インデックスを返す.
+
+    ディザなしの ``_tone_lut`` と同じく、明るいほど小さいインデックスになる。
+    """
+    v = tone.astype(np.float32)
+    if invert:
+        v = 255.0 - v
+    scaled = v * ((levels - 1) / 255.0)
+    top = levels - 1
+    if mode == "error_diffusion":
+        q = _diffuse_rows(scaled, top)
+    else:
+        q = np.floor(scaled + _threshold_tile(mode, *tone.shape))
+        np.clip(q, 0, top, out=q)
+    return (top - q).astype(np.uint16)
+
+
+# Floyd-Steinberg の次行への重み (左下, 真下, 右下)。行内の右隣は逐次依存になるので使わない
+_DIFFUSION_WEIGHTS = (3.0 / 9.0, 5.0 / 9.0, 1.0 / 9.0)
+
+
+def _diffuse_rows(scaled: np.ndarray, top: int) -> np.ndarray:
+    """行単位の誤差拡散。各行をまとめて丸め、誤差は次の行へ配る (行ごとに左右反転)."""
+    rows, cols = scaled.shape
+    q = np.empty_like(scaled)
+    kernels = (
+        np.array(_DIFFUSION_WEIGHTS[::-1], dtype=np.float32),
+        np.array(_DIFFUSION_WEIGHTS, dtype=np.float32),
     )
+    carry = np.zeros(cols, dtype=np.float32)
+    for r in range(rows):
+        row = scaled[r] + carry
+        qr = q[r]
+        np.rint(row, out=qr)
+        np.clip(qr, 0, top, out=qr)
+        spread = np.convolve(row - qr, kernels[r & 1])
+        # 端からはみ出た分は隣接セルに折り返して誤差の総量を保つ
+        spread[1] += spread[0]
+        spread[-2] += spread[-1]
+        carry = spread[1:-1]
+    return q
 
-    if use_pattern:
-        pattern = charset
-        if len(pattern) == 0:
-            pattern = CHARSETS["Blocks (5)"]
-        pat_len = len(pattern)
-        idx = 0
-        lines: list[str] = []
-        mask = binary_mask
-        for r in range(mask.shape[0]):
-            row_chars: list[str] = []
-            for c in range(mask.shape[1]):
-                if mask[r, c]:
-                    row_chars.append(pattern[idx % pat_len])
-                    idx += 1
-                else:
-                    row_chars.append(" ")
-            lines.append("".join(row_chars))
-        return lines
 
-    n = len(charset)
-    idx = (small.astype(np.float32) / 255.0) * (n - 1)
-    idx = (n - 1 - idx).astype(np.int32)
-    return ["".join(charset[i] for i in row) for row in idx]
-
-
-def render_ascii_image(
-    lines: Iterable[str],
-    font: ImageFont.FreeTypeFont,
-    pad: int = 8,
-    fg=(245, 245, 245),
-    bg=(10, 10, 10),
-) -> Image.Image:
-    """ASCIIテキストをPillow画像に描画."""
-    lines = list(lines)
-    ascent, descent = font.getmetrics()
-    char_length = None
-    try:
-        char_length = font.getlength("M")
-    except Exception:
-        pass
-    if char_length is None:
-        try:
-            bbox = font.getbbox("M")
-            char_length = bbox[2] - bbox[0]
-        except Exception:
-            pass
-    if char_length is None:
-        try:
-            char_length = font.getsize("M")[0]
-        except Exception:
-            pass
-    if char_length is not None:
-        cell_w = max(1, int(np.ceil(char_length)))
+@lru_cache(maxsize=8)
+def _tone_curve(gamma: float, contrast: float, brightness: float) -> np.ndarray:
+    """``apply_tone`` を256段の表にしたもの (拡大画像にまとめて掛ける用)."""
+    lut = apply_tone(np.arange(256, dtype=np.uint8), gamma, contrast, brightness)
+    lut.flags.writeable = False
+    return lut
+
+
+def shape_to_glyphs(tone: np.ndarray, params: AsciiParams) -> AsciiFrame:
+    """各セルを ``GLYPH_PATCH`` 解像度で見て、インク分布が最も近い文字を選ぶ.
+
+    ``tone`` は (rows * patch_h, cols * patch_w) のトーン補正済み輝度。全セルと
+    全文字の距離を1回の行列積で求める。
+    """
+    glyphs = _tone_glyphs(params)
+    rows, cols = params.rows, params.cols
+    pw, ph = GLYPH_PATCH
+    atlas = glyph_matrix(params.glyph_font, glyphs)
+    if params.binarize:
+        ink = (tone >= int(np.clip(params.binarize_threshold, 0, 255))).astype(np.float32)
+    else:
+        ink = tone.astype(np.float32) * np.float32(1.0 / 255.0)
+    if not params.invert:
+        ink = 1.0 - ink
+    patches = ink.reshape(rows, ph, cols, pw).swapaxes(1, 2).reshape(rows * cols, ph * pw)
+    # |p - g|^2 が最小の g は 2 p.g - |g|^2 が最大の g
+    score = patches @ (2.0 * atlas.T)
+    score -= np.einsum("kd,kd->k", atlas, atlas)
+    indices = score.argmax(axis=1).astype(np.uint16).reshape(rows, cols)
+    luma = cv2.resize(tone, (cols, rows), interpolation=cv2.INTER_AREA)
+    return AsciiFrame(indices, glyphs, luma)
+
+
+def tone_to_glyphs(tone: np.ndarray, params: AsciiParams) -> AsciiFrame:
+    """トーン補正済みの縮小輝度から文字インデックスを決める."""
+    glyphs = _tone_glyphs(params)
+    small = tone
+    binary_mask: np.ndarray | None = None
+    if params.binarize:
+        thresh = int(np.clip(params.binarize_threshold, 0, 255))
+        binary_mask = small >= thresh
+        small = np.where(binary_mask, 255, 0).astype(np.uint8)
+        if params.invert:
+            binary_mask = ~binary_mask
+
+    if binary_mask is not None and uses_pattern(params):
+        pat_len = len(glyphs) - 1
+        # マスク内のセルだけ行優先で数え、パターン文字を順番に敷き詰める
+        flat = binary_mask.ravel()
+        order = np.cumsum(flat, dtype=np.int64) - 1
+        indices = np.where(flat, order % pat_len, pat_len).astype(np.uint16)
+        return AsciiFrame(indices.reshape(binary_mask.shape), glyphs, tone)
+
+    if binary_mask is None and params.dither in DITHER_MODES[1:] and len(glyphs) > 1:
+        return AsciiFrame(dither_indices(tone, len(glyphs), bool(params.invert), params.dither), glyphs, tone)
+
+    if params.ramp == "even" and uses_ramp(params):
+        lut = _ramp_lut(charset_ramp(params.glyph_font, resolve_charset(params)[0])[1], bool(params.invert))
     else:
-        cell_w = 1
-    cell_h = max(1, ascent + descent)
+        lut = _tone_lut(len(glyphs), bool(params.invert))
+    return AsciiFrame(lut[small], glyphs, tone)
+
+
+def edge_orientation(gray: np.ndarray, rows: int, cols: int) -> tuple[np.ndarray, np.ndarray]:
+    """セルごとの輪郭の強さ (0..255) と向き (``EDGE_GLYPHS`` の番号) を返す.
+
+    ``GLYPH_PATCH`` 解像度のSobel勾配から構造テンソル (gx^2, gy^2, gx*gy) を作り、
+    セル単位に面積平均して最大固有値と主方向を使う。勾配の向きを直接平均すると
+    線の両側で打ち消し合うので、2倍角で扱えるテンソルのほうで平均する。
+    """
+    pw, ph = GLYPH_PATCH
+    work_w, work_h = cols * pw, rows * ph
+    h, w = gray.shape[:2]
+    if (h, w) != (work_h, work_w):
+        # 整数倍の縮小はOpenCVの高速経路に乗るので、先にそこまで縮めてから合わせる
+        fx, fy = max(1, w // work_w), max(1, h // work_h)
+        if fx > 1 or fy > 1:
+            gray = cv2.resize(gray[:h - h % fy, :w - w % fx], (w // fx, h // fy), interpolation=cv2.INTER_AREA)
+        gray = cv2.resize(gray, (work_w, work_h), interpolation=cv2.INTER_AREA)
+    # 3x3 Sobelの最大応答 4*255 を 255 に合わせる
+    gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3, scale=0.25)
+    gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3, scale=0.25)
+    # セルの整数倍なので面積平均はそのままブロック平均になる
+    jxx, jyy, jxy = (
+        cv2.resize(cv2.multiply(a, b), (cols, rows), interpolation=cv2.INTER_AREA)
+        for a, b in ((gx, gx), (gy, gy), (gx, gy))
+    )
+    trace = jxx + jyy
+    spread = np.sqrt((jxx - jyy) ** 2 + 4.0 * jxy * jxy)
+    strength = np.sqrt(np.maximum((trace + spread) * 0.5, 0.0))
+    strength[spread < _EDGE_COHERENCE * trace] = 0.0
+    # 主な勾配の向き (-90..90度)。輪郭線はそれに直交する
+    angle = 0.5 * np.arctan2(2.0 * jxy, jxx - jyy)
+    direction = np.rint(angle * np.float32(4.0 / np.pi)).astype(np.int64) % 4
+    return strength, direction.astype(np.uint16)
+
+
+def overlay_edges(frame: AsciiFrame, gray: np.ndarray, params: AsciiParams) -> AsciiFrame:
+    """輪郭の強いセルだけ ``EDGE_GLYPHS`` に置き換え、それ以外は輝度の割り当てのまま."""
+    rows, cols = frame.shape
+    strength, direction = edge_orientation(gray, rows, cols)
+    edge = strength >= float(np.clip(params.edge_threshold, 1, 255))
+    base = len(frame.glyphs)
+    indices = np.where(edge, direction + np.uint16(base), frame.indices).astype(np.uint16)
+    return AsciiFrame(indices, frame.glyphs + EDGE_GLYPHS, frame.luma, frame.colors)
+
+
+class ChangeDetector:
+    """見た目がほぼ変わらないフレームでは、前に変換した ``AsciiFrame`` を使い回す.
+
+    セルの格子に縮めた輝度を最後に実際に変換したフレームと比べ、差の平均と
+    最大がしきい値以下なら変換しない。比べる相手は直前のフレームではないので、
+    ゆっくりした変化も溜まれば変換し直す。カラーモードでBGRも渡されたときは、
+    パレットに量子化したセルの色が1つでも変われば変換し直す。変換した場合も
+    縮めた輝度と色をそのまま使うので、縮小はそれぞれ1回で済む。
+    """
+
+    def __init__(self, mean_threshold: float = CHANGE_MEAN_THRESHOLD, max_threshold: int = CHANGE_MAX_THRESHOLD):
+        self.mean_threshold = float(mean_threshold)
+        self.max_threshold = int(max_threshold)
+        self.skipped = 0
+        self.converted = 0
+        self.reset()
+
+    def reset(self):
+        """次のフレームを必ず変換する (パラメータ変更・シークのとき)."""
+        self._grid: np.ndarray | None = None
+        self._frame: AsciiFrame | None = None
+        self._params: AsciiParams | None = None
 
-    cols = max((len(s) for s in lines), default=0)
-    rows = len(lines)
+    def convert(self, gray: np.ndarray, params: AsciiParams, stats: StatsCallback | None = None,
+                bgr: np.ndarray | None = None) -> tuple[AsciiFrame, bool]:
+        """``convert_frame`` の代わり。2つ目は前の変換結果を使い回したかどうか."""
+        watch = Stopwatch(stats)
+        grid = luma_grid(gray, params)
+        colors = cell_colors(crop_roi(bgr, params.roi), params) if bgr is not None and uses_color(params) else None
+        last = self._frame
+        if last is not None and self._params == params and self._grid.shape == grid.shape:
+            diff = cv2.absdiff(grid, self._grid)
+            same_colors = colors is None or (last.colors is not None and np.array_equal(colors, last.colors))
+            if same_colors and int(diff.max()) <= self.max_threshold and float(diff.mean()) <= self.mean_threshold:
+                watch.lap("change_check")
+                self.skipped += 1
+                return last, True
+        watch.lap("change_check")
+        frame = convert_frame(gray, params, stats=stats, small=grid)
+        if colors is not None:
+            frame.colors = colors
+        self._grid = grid
+        self._frame = frame
+        if self._params != params:
+            self._params = replace(params)
+        self.converted += 1
+        return frame, False
 
-    w = pad * 2 + cols * cell_w
-    h = pad * 2 + rows * cell_h
 
-    img = Image.new("RGB", (max(1, w), max(1, h)), color=bg)
-    draw = ImageDraw.Draw(img)
+class TemporalStabilizer:
+    """直前フレームからの輝度変化がヒステリシス幅を超えたセルだけ文字を変える.
 
-    y = pad
-    for line in lines:
-        draw.text((pad, y), line, font=font, fill=fg)
-        y += cell_h
-    return img
+    1本のフレーム列(書き出しやプレビュー再生)ごとに1つ持つ。入力は変換済みの
+    ``AsciiFrame`` で、保持している輝度と比べて幅以内のセルは直前に表示した
+    文字を残すので、キャッシュには安定化前のフレームをそのまま置ける。
+    フレーム番号が戻ったり ``max_gap`` より飛んだりしたら状態を捨てる。
+    """
+
+    def __init__(self, band: int = 0, max_gap: int | None = None):
+        self.band = int(band)
+        self.max_gap = max_gap
+        self.reset()
+        self.reset_metrics()
+
+    def reset(self):
+        self._held: np.ndarray | None = None
+        self._raw: np.ndarray | None = None
+        self._shown: np.ndarray | None = None
+        self._before: tuple | None = None
+        self._last_idx: int | None = None
+        self._glyphs: str | None = None
+
+    def reset_metrics(self):
+        self.frames = 0
+        self.cells = 0
+        self.raw_changed = 0
+        self.changed = 0
+
+    def apply(self, frame: AsciiFrame, frame_idx: int | None = None) -> AsciiFrame:
+        if self.band <= 0 or frame.luma is None:
+            return frame
+        count = True
+        if frame_idx is not None and self._last_idx is not None:
+            if frame_idx == self._last_idx and self._before is not None:
+                # 同じフレームの描き直しは、そのフレームを入れる前の状態からやり直す
+                self._held, self._raw, self._shown = self._before
+                count = False
+            elif frame_idx < self._last_idx or (
+                self.max_gap is not None and frame_idx - self._last_idx > self.max_gap
+            ):
+                self.reset()
+        held = self._held
+        if held is None or held.shape != frame.luma.shape or self._glyphs != frame.glyphs:
+            stable = frame
+            held = frame.luma
+        else:
+            tone = frame.luma
+            moved = np.abs(tone.astype(np.int16) - held.astype(np.int16)) > self.band
+            held = np.where(moved, tone, held)
+            indices = np.where(moved, frame.indices, self._shown)
+            stable = AsciiFrame(indices, frame.glyphs, held, frame.colors)
+            if count:
+                self.frames += 1
+                self.cells += frame.indices.size
+                self.raw_changed += int(np.count_nonzero(frame.indices != self._raw))
+                self.changed += int(np.count_nonzero(stable.indices != self._shown))
+        self._before = (self._held, self._raw, self._shown)
+        self._held = held
+        self._raw = frame.indices
+        self._shown = stable.indices
+        self._glyphs = frame.glyphs
+        self._last_idx = frame_idx
+        return stable
+
+    def summary(self) -> dict[str, float]:
+        """安定化前後で、前フレームから文字が変わったセルの割合."""
+        cells = max(1, self.cells)
+        return {
+            "frames": float(self.frames),
+            "raw_changed_ratio": self.raw_changed / cells,
+            "changed_ratio": self.changed / cells,
+        }
+
+
+def frame_to_ascii(gray: np.ndarray, params: AsciiParams,
+                   stats: StatsCallback | None = None) -> list[str]:
+    """グレースケールフレームをASCII行配列に変換."""
+    frame = convert_frame(gray, params, stats=stats)
+    watch = Stopwatch(stats)
+    lines = frame.lines
+    watch.lap("lines")
+    return lines
 
 
 def apply_mask_to_ascii_lines(lines: list[str], mask: np.ndarray | None) -> list[str]:
@@ -165,3 +620,30 @@ def apply_mask_to_ascii_lines(lines: list[str], mask: np.ndarray | None) -> list
                 line_chars[c] = " "
         masked.append("".join(line_chars))
     return masked + lines[rows:]
+
+
+def mask_ascii_frame(frame: AsciiFrame, mask: np.ndarray | None) -> AsciiFrame:
+    """マスクされたセルを空白にした ``AsciiFrame`` (``apply_mask_to_ascii_lines`` の格子版)."""
+    if mask is None or mask.shape != frame.shape:
+        return frame
+    mask = np.asarray(mask, dtype=bool)
+    if not mask.any():
+        return frame
+    glyphs = frame.glyphs
+    space = glyphs.find(" ")
+    if space < 0:
+        # 空白を含まない文字セットでは末尾に足して指す
+        space = len(glyphs)
+        glyphs += " "
+    indices = frame.indices.copy()
+    indices[mask] = space
+    return AsciiFrame(indices, glyphs, frame.luma, frame.colors)
+
+
+def __getattr__(name: str):
+    # 描画系はPillowに依存するので、参照されたときに初めて読み込む
+    if name in {"render_ascii_image", "redraw_ascii_rows"}:
+        import ascii_render
+
+        return getattr(ascii_render, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,144 @@
+"""ASCIIテキストをPillow画像へ描画するユーティリティ群."""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+# 等幅フォントの候補。先頭から順に読めたものを使う
+FONT_CANDIDATES = (
+    "lucida-console.ttf",
+    "lucon.ttf",
+    "C:/Windows/Fonts/lucon.ttf",
+    "C:/Windows/Fonts/cour.ttf",
+    "/Library/Fonts/Lucida Console.ttf",
+    "/Library/Fonts/Menlo.ttc",
+    "/System/Library/Fonts/Menlo.ttc",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf",
+    "/usr/share/fonts/truetype/freefont/FreeMono.ttf",
+)
+
+
+def load_font(path: str | None = None, size: int = 18) -> ImageFont.FreeTypeFont:
+    """``path`` を、読めなければ ``FONT_CANDIDATES`` を順に試す。どれも無ければPillowの既定フォント."""
+    for candidate in ([path] if path else []) + list(FONT_CANDIDATES):
+        try:
+            return ImageFont.truetype(candidate, size=size)
+        except Exception:
+            continue
+    return ImageFont.load_default()
+
+
+def font_cell_size(font: ImageFont.FreeTypeFont) -> tuple[int, int]:
+    """フォントから1セルのピクセルサイズを求める."""
+    ascent, descent = font.getmetrics()
+    char_length = None
+    try:
+        char_length = font.getlength("M")
+    except Exception:
+        pass
+    if char_length is None:
+        try:
+            bbox = font.getbbox("M")
+            char_length = bbox[2] - bbox[0]
+        except Exception:
+            pass
+    if char_length is None:
+        try:
+            char_length = font.getsize("M")[0]
+        except Exception:
+            pass
+    if char_length is not None:
+        cell_w = max(1, int(np.ceil(char_length)))
+    else:
+        cell_w = 1
+    cell_h = max(1, ascent + descent)
+    return cell_w, cell_h
+
+
+def _draw_line(draw: ImageDraw.ImageDraw, xy: tuple[int, int], line: str,
+               font: ImageFont.FreeTypeFont, fg, row_colors: np.ndarray | None):
+    if row_colors is None:
+        draw.text(xy, line, font=font, fill=fg)
+        return
+    x, y = xy
+    n = min(len(line), row_colors.shape[0])
+    if n == 0:
+        return
+    # 同じ色が続く区間ごとにまとめて描く (色はBGR)
+    changed = np.any(row_colors[1:n] != row_colors[:n - 1], axis=1)
+    starts = [0] + (np.flatnonzero(changed) + 1).tolist()
+    ends = starts[1:] + [n]
+    for start, end in zip(starts, ends):
+        segment = line[start:end]
+        if not segment.strip():
+            continue
+        b, g, r = (int(v) for v in row_colors[start])
+        offset = font.getlength(line[:start]) if start else 0
+        draw.text((x + offset, y), segment, font=font, fill=(r, g, b))
+    if len(line) > n:
+        draw.text((x + font.getlength(line[:n]), y), line[n:], font=font, fill=fg)
+
+
+def render_ascii_image(
+    lines: Iterable[str],
+    font: ImageFont.FreeTypeFont,
+    pad: int = 8,
+    fg=(245, 245, 245),
+    bg=(10, 10, 10),
+    colors: np.ndarray | None = None,
+) -> Image.Image:
+    """ASCIIテキストをPillow画像に描画.
+
+    ``colors`` (rows x cols x 3, BGR) を渡すとセルごとにその色で描く。
+    """
+    lines = list(lines)
+    cell_w, cell_h = font_cell_size(font)
+
+    cols = max((len(s) for s in lines), default=0)
+    rows = len(lines)
+
+    w = pad * 2 + cols * cell_w
+    h = pad * 2 + rows * cell_h
+
+    img = Image.new("RGB", (max(1, w), max(1, h)), color=bg)
+    draw = ImageDraw.Draw(img)
+
+    y = pad
+    for r, line in enumerate(lines):
+        row_colors = colors[r] if colors is not None and r < colors.shape[0] else None
+        _draw_line(draw, (pad, y), line, font, fg, row_colors)
+        y += cell_h
+    return img
+
+
+def redraw_ascii_rows(
+    img: Image.Image,
+    lines: list[str],
+    rows: Iterable[int],
+    font: ImageFont.FreeTypeFont,
+    pad: int = 8,
+    fg=(245, 245, 245),
+    bg=(10, 10, 10),
+    colors: np.ndarray | None = None,
+) -> tuple[int, int] | None:
+    """描画済み画像の指定行だけを描き直し、更新したy範囲を返す."""
+    _, cell_h = font_cell_size(font)
+    draw = ImageDraw.Draw(img)
+    y_min: int | None = None
+    y_max: int | None = None
+    for r in sorted(set(rows)):
+        if r < 0 or r >= len(lines):
+            continue
+        y = pad + r * cell_h
+        draw.rectangle((0, y, img.width - 1, y + cell_h - 1), fill=bg)
+        row_colors = colors[r] if colors is not None and r < colors.shape[0] else None
+        _draw_line(draw, (pad, y), lines[r], font, fg, row_colors)
+        y_min = y if y_min is None else min(y_min, y)
+        y_max = y + cell_h if y_max is None else max(y_max, y + cell_h)
+    if y_min is None or y_max is None:
+        return None
+    return y_min, min(y_max, img.height)
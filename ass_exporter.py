@@ -1,15 +1,55 @@
-"""ASS字幕ファイル出力ロジック."""
+"""ASS字幕ファイル出力ロジック.
+
+GUIを使わずに書き出す場合はコマンドラインからも実行できる::
+
+    python ass_exporter.py input.mp4 output.ass --cols 100 --rows 45 --fontsize 4
+
+``--variant`` を重ねると、同じデコード結果から別のグリッドサイズも書き出す::
+
+    python ass_exporter.py input.mp4 desktop.ass --cols 120 --rows 54 --variant mobile.ass:60x27
+
+``--region`` は画面の一部だけを、全体のブロックと同じ位置・文字の大きさで書き出す::
+
+    python ass_exporter.py input.mp4 face.ass --region 0.4,0.1,0.2,0.3 --region 0.7,0.7,0.2,0.2 --regions-only
+"""
 
 from __future__ import annotations
 
+import argparse
+import heapq
 import math
+import sys
 from collections.abc import Callable
+from contextlib import ExitStack
+from dataclasses import dataclass, replace
 from pathlib import Path
 
-import cv2
 import numpy as np
 
-from ascii_core import AsciiParams, apply_mask_to_ascii_lines, frame_to_ascii
+from ascii_core import (
+    CHARSETS,
+    COLOR_LEVELS,
+    DITHER_MODES,
+    MATCH_MODES,
+    RAMP_MODES,
+    AsciiFrame,
+    AsciiParams,
+    ChangeDetector,
+    TemporalStabilizer,
+    apply_mask_to_ascii_lines,
+    convert_frame,
+    uses_color,
+)
+from conversion_cache import ConversionCache
+from frame_source import RAW_FORMATS, FrameSource, open_source
+from perf_stats import StatsCallback, Stopwatch, with_prefix
+from project_file import is_project_file, load_project
+
+
+YT_PLAY_RES_X = 384
+YT_PLAY_RES_Y = 288
+# 等幅フォントの1文字の幅 (\fs に対する比)。領域ブロックの配置に使う
+CELL_WIDTH_RATIO = 0.6
 
 
 ASS_HEADER = """[Script Info]
@@ -69,76 +109,569 @@ def escape_ass_text(s: str) -> str:
     return "".join(result)
 
 
-def lines_to_ass_text(lines: list[str]) -> str:
-    return "\\N".join(escape_ass_text(line) for line in lines)
+def ass_color_tag(key: int) -> str:
+    """``(B << 16) | (G << 8) | R`` の色キーを ``{\\c&HBBGGRR&}`` にする."""
+    return f"{{\\c&H{key:06X}&}}"
 
 
-def export_ass(
-    video_path: Path,
-    out_path: Path,
-    params: AsciiParams,
+def color_change_points(lines: list[str], colors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """色タグを挟む位置 (行優先の通し番号) と、その位置からの色キーを返す.
+
+    ``\\c`` は改行をまたいで効き続け、空白セルの色は見えないので、空白以外の
+    セルを読み順に並べて直前と色が変わったところだけを拾う。
+    """
+    rows, cols = colors.shape[:2]
+    rows = min(rows, len(lines))
+    colors = colors[:rows].astype(np.int32)
+    keys = ((colors[..., 0] << 16) | (colors[..., 1] << 8) | colors[..., 2]).ravel()
+    chars = np.array(lines[:rows], dtype=f"<U{max(cols, 1)}").view("<U1").reshape(rows, cols)
+    visible = np.flatnonzero((chars != " ") & (chars != ""))
+    visible_keys = keys[visible]
+    change = np.ones(visible.size, dtype=bool)
+    change[1:] = visible_keys[1:] != visible_keys[:-1]
+    return visible[change], visible_keys[change]
+
+
+def compact_bounds(line: str) -> tuple[int, int]:
+    """空白を詰めても見た目が変わらない範囲 ``line[start:end]``.
+
+    ``\\an5`` では行ごとに中央揃えされるので、両端から同じ数の空白を削っても
+    文字の位置は変わらない。空白だけの行は、空行として高さが変わらないよう
+    1文字だけ残す。
+    """
+    body = line.strip(" ")
+    if not body:
+        return 0, min(1, len(line))
+    lead = len(line) - len(line.lstrip(" "))
+    trail = len(line) - len(line.rstrip(" "))
+    trim = min(lead, trail)
+    return trim, len(line) - trim
+
+
+def compact_rows(lines: list[str]) -> tuple[int, int]:
+    """上下から同じ数だけ空白行を除いた範囲 ``lines[start:end]``.
+
+    ブロックは縦にも中央揃えで、行の高さはどれも同じなので、上下から同数の
+    空白行を削っても残りの行の位置は変わらない。全部空白なら1行だけ残す。
+    """
+    blank = [not line.strip(" ") for line in lines]
+    n = len(lines)
+    if all(blank):
+        return 0, min(1, n)
+    top = blank.index(False)
+    bottom = blank[::-1].index(False)
+    trim = min(top, bottom)
+    return trim, n - trim
+
+
+def lines_to_ass_text(lines: list[str], colors: np.ndarray | None = None, compact: bool = False) -> str:
+    """1イベント分の本文。``compact`` なら上下と両端の空白を表示が変わらない範囲で詰める."""
+    if compact:
+        start, end = compact_rows(lines)
+        lines = lines[start:end]
+        if colors is not None:
+            colors = colors[start:end]
+    if colors is None:
+        if compact:
+            lines = [line[slice(*compact_bounds(line))] for line in lines]
+        return "\\N".join(escape_ass_text(line) for line in lines)
+    cols = colors.shape[1]
+    positions, keys = color_change_points(lines, colors)
+    bounds = np.searchsorted(positions, np.arange(len(lines) + 1) * cols).tolist()
+    positions = positions.tolist()
+    keys = keys.tolist()
+    out: list[str] = []
+    for r, line in enumerate(lines):
+        # 色を変える位置は空白以外のセルなので、詰めた範囲の外には来ない
+        start, end = compact_bounds(line) if compact else (0, len(line))
+        parts: list[str] = []
+        prev = start
+        for j in range(bounds[r], bounds[r + 1]):
+            c = positions[j] - r * cols
+            if c > prev:
+                parts.append(escape_ass_text(line[prev:c]))
+            parts.append(ass_color_tag(keys[j]))
+            prev = c
+        parts.append(escape_ass_text(line[prev:end]))
+        out.append("".join(parts))
+    return "\\N".join(out)
+
+
+@dataclass
+class ExportTarget:
+    """``export_ass_targets`` の書き出し先1つ分。座標とフォントサイズはPlayRes座標."""
+
+    out_path: Path
+    params: AsciiParams
+    pos_x: float
+    pos_y: float
+    fontsize: int
+    mask_lookup: Callable[[int], np.ndarray | None] | None = None
+    stabilizer: TemporalStabilizer | None = None
+
+
+def region_target(base: ExportTarget, roi: tuple[float, float, float, float],
+                  out_path: Path | None = None) -> ExportTarget:
+    """``base`` のブロックのうち ``roi`` に当たる部分を、同じ位置・同じ文字の大きさで書き出すターゲット.
+
+    ``roi`` はフレーム全体に対する割合。グリッドは ``base`` と同じセル密度にする。
+    ``out_path`` を省くと ``base`` と同じファイルにイベントを足す。
+    """
+    params = base.params
+    bx, by, bw, bh = params.roi or (0.0, 0.0, 1.0, 1.0)
+    x, y, w, h = roi
+    cell_w = bw / params.cols
+    cell_h = bh / params.rows
+    dx = ((x + w / 2) - (bx + bw / 2)) / cell_w * base.fontsize * CELL_WIDTH_RATIO
+    dy = ((y + h / 2) - (by + bh / 2)) / cell_h * base.fontsize
+    region = replace(
+        params,
+        cols=max(1, int(round(w / cell_w))),
+        rows=max(1, int(round(h / cell_h))),
+        roi=(float(x), float(y), float(w), float(h)),
+    )
+    return ExportTarget(out_path or base.out_path, region, base.pos_x + dx, base.pos_y + dy, base.fontsize)
+
+
+class _TargetWriter:
+    """書き出し先ごとの進行状況 (次のフレーム番号・キャッシュ・出力ファイル)."""
+
+    def __init__(self, target: ExportTarget, f, entry, stabilizer: TemporalStabilizer | None,
+                 start_sec: float, dur_sec: float | None, detector: ChangeDetector | None = None):
+        self.target = target
+        self.f = f
+        self.entry = entry
+        self.stabilizer = stabilizer
+        self.detector = detector
+        self.start_sec = start_sec
+        self.dt = 1.0 / max(target.params.fps, 0.1)
+        self.limit: int | None = None
+        if dur_sec is not None:
+            self.limit = int(math.ceil(max(dur_sec, 0.0) / self.dt))
+        self.fs_value = max(1, int(round(target.fontsize)))
+        self.i = 0
+
+    @property
+    def done(self) -> bool:
+        return self.limit is not None and self.i >= self.limit
+
+    @property
+    def t0(self) -> float:
+        return self.start_sec + self.i * self.dt
+
+
+def export_ass_targets(
+    video_path: Path | FrameSource,
+    targets: list[ExportTarget],
     start_sec: float,
     dur_sec: float | None,
-    pos_x: float,
-    pos_y: float,
     fontname: str,
-    fontsize: int,
     play_res_x: int,
     play_res_y: int,
-    mask_lookup: Callable[[int], np.ndarray | None] | None = None,
-) -> None:
-    cap = cv2.VideoCapture(str(video_path))
-    if not cap.isOpened():
-        raise RuntimeError("Could not open video for export.")
-
-    fps = max(params.fps, 0.1)
-    dt = 1.0 / fps
-    target_frames: int | None = None
-    if dur_sec is not None:
-        target_frames = int(math.ceil(max(dur_sec, 0.0) / dt))
+    stats: StatsCallback | None = None,
+    cache: ConversionCache | None = None,
+    compact: bool = False,
+    skip_unchanged: bool = False,
+) -> dict:
+    """1回のデコードで複数のASSを書き出す (グリッドサイズ・文字セット違いなど).
 
+    各ターゲットの表示時刻を時刻順に並べて処理し、同じソースフレームを
+    指すターゲットには1度デコードした画素を使い回す。キャッシュはターゲット
+    ごとに引き、全員が当たったフレームはデコードしない。戻り値はデコードした
+    フレーム数とターゲットごとの書き出しフレーム数。``compact`` は ``export_ass`` と同じ。
+    ``out_path`` が同じターゲットは1つのファイルに書き、それぞれが別の位置の
+    イベント列になる (``region_target`` で作った領域ごとのブロックなど)。
+    ``skip_unchanged`` ならターゲットごとに ``ChangeDetector`` を通し、ほぼ変わらない
+    フレームは前の変換結果を使い回す (使い回した結果はキャッシュに書かない)。
+    戻り値の ``skipped`` はターゲットごとの使い回した回数、``stabilizers`` は
+    実際に使った ``TemporalStabilizer`` (使わないターゲットはNone)。
+    """
+    owns_source = not isinstance(video_path, FrameSource)
+    source = open_source(video_path)
+    video_fps = source.fps
+    video_frames = source.frame_count
+    luma_only = not any(uses_color(t.params) for t in targets)
+    convert_stats = with_prefix(stats, "convert.")
     header = ASS_HEADER.format(
         play_res_x=play_res_x,
         play_res_y=play_res_y,
         fontname=fontname,
     )
 
-    with open(out_path, "w", encoding="utf-8") as f:
-        f.write(header)
+    decoded = 0
+    with ExitStack() as stack:
+        writers: list[_TargetWriter] = []
+        files: dict[Path, object] = {}
+        for target in targets:
+            entry = None
+            if cache is not None and source.path is not None:
+                entry = cache.open(source.path, target.params, source.cache_tag)
+                if entry is not None:
+                    stack.callback(entry.close)
+            stabilizer = target.stabilizer
+            if stabilizer is None and target.params.hysteresis > 0:
+                stabilizer = TemporalStabilizer(target.params.hysteresis)
+            key = Path(target.out_path).resolve()
+            f = files.get(key)
+            if f is None:
+                f = stack.enter_context(open(target.out_path, "w", encoding="utf-8"))
+                f.write(header)
+                files[key] = f
+            detector = ChangeDetector() if skip_unchanged else None
+            writers.append(_TargetWriter(target, f, entry, stabilizer, start_sec, dur_sec, detector))
 
-        i = 0
-        while True:
-            if target_frames is not None and i >= target_frames:
-                break
-            t0 = start_sec + i * dt
-            t1 = start_sec + (i + 1) * dt
+        # (表示時刻, ターゲット番号) の小さい順に処理する
+        queue = [(w.t0, k) for k, w in enumerate(writers) if not w.done]
+        heapq.heapify(queue)
+        last = None
+        while queue:
+            t0, k = heapq.heappop(queue)
+            w = writers[k]
+            params = w.target.params
+            t1 = w.start_sec + (w.i + 1) * w.dt
 
-            cap.set(cv2.CAP_PROP_POS_MSEC, t0 * 1000.0)
-            ok, frame = cap.read()
-            if not ok:
-                break
+            watch = Stopwatch(stats)
             frame_idx = None
-            try:
-                pos = cap.get(cv2.CAP_PROP_POS_FRAMES)
-            except Exception:
-                pos = None
-            if pos is not None and not math.isnan(float(pos)):
-                frame_idx = max(0, int(pos) - 1)
-
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            lines = frame_to_ascii(gray, params)
-            if mask_lookup is not None and frame_idx is not None:
-                mask = mask_lookup(frame_idx)
+            ascii_frame: AsciiFrame | None = None
+            predicted = source.frame_at(t0) if video_fps > 0 else None
+            if w.entry is not None and predicted is not None and predicted < video_frames:
+                ascii_frame = w.entry.get(predicted)
+                if ascii_frame is not None:
+                    frame_idx = predicted
+                    watch.lap("cache")
+
+            if ascii_frame is None:
+                if last is None or predicted is None or last.index != predicted:
+                    if not source.seek_time(t0):
+                        break
+                    last = source.read(luma_only=luma_only)
+                    if last is None:
+                        break
+                    decoded += 1
+                    watch.lap("decode")
+                frame_idx = last.index
+
+                gray = last.luma()
+                watch.lap("gray")
+                reused = False
+                if w.detector is not None:
+                    ascii_frame, reused = w.detector.convert(gray, params, stats=convert_stats, bgr=last.bgr)
+                else:
+                    ascii_frame = convert_frame(gray, params, stats=convert_stats, bgr=last.bgr)
+                if w.entry is not None and frame_idx is not None and not reused:
+                    w.entry.put(frame_idx, ascii_frame)
+                watch.lap("convert")
+
+            if w.stabilizer is not None:
+                ascii_frame = w.stabilizer.apply(ascii_frame, frame_idx)
+                watch.lap("stabilize")
+
+            lines = ascii_frame.lines
+            if w.target.mask_lookup is not None and frame_idx is not None:
+                mask = w.target.mask_lookup(frame_idx)
                 if mask is not None and mask.shape == (params.rows, params.cols):
                     lines = apply_mask_to_ascii_lines(lines, mask)
-            txt = lines_to_ass_text(lines)
+            watch.lap("mask")
+            txt = lines_to_ass_text(lines, ascii_frame.colors, compact=compact)
+            watch.lap("encode")
 
-            fs_value = max(1, int(round(fontsize)))
-            ass_line = (
+            w.f.write(
                 f"Dialogue: 0,{sec_to_ass_time(t0)},{sec_to_ass_time(t1)},"
-                f"Default,,0,0,0,,{{\\an5\\fs{fs_value}\\pos({pos_x:.3f},{pos_y:.3f})}}{txt}\n"
+                f"Default,,0,0,0,,{{\\an5\\fs{w.fs_value}\\pos({w.target.pos_x:.3f},{w.target.pos_y:.3f})}}{txt}\n"
             )
-            f.write(ass_line)
-            i += 1
+            watch.lap("write")
+            w.i += 1
+            if not w.done:
+                heapq.heappush(queue, (w.t0, k))
+
+    if owns_source:
+        source.close()
+    return {
+        "decoded": decoded,
+        "frames": [w.i for w in writers],
+        "skipped": [w.detector.skipped if w.detector is not None else 0 for w in writers],
+        "stabilizers": [w.stabilizer for w in writers],
+    }
+
+
+def export_ass(
+    video_path: Path | FrameSource,
+    out_path: Path,
+    params: AsciiParams,
+    start_sec: float,
+    dur_sec: float | None,
+    pos_x: float,
+    pos_y: float,
+    fontname: str,
+    fontsize: int,
+    play_res_x: int,
+    play_res_y: int,
+    mask_lookup: Callable[[int], np.ndarray | None] | None = None,
+    stats: StatsCallback | None = None,
+    cache: ConversionCache | None = None,
+    stabilizer: TemporalStabilizer | None = None,
+    compact: bool = False,
+    skip_unchanged: bool = False,
+) -> dict:
+    """動画をASCII化してASSに書き出す.
+
+    video_pathには動画ファイルのほか、連番画像のディレクトリ・Y4Mファイルや
+    ``FrameSource`` をそのまま渡せる (渡したソースは呼び出し側で閉じる)。statsには ``(stage, seconds)`` が渡される。cacheを渡すと変換済みフレームを
+    ディスクから読み、当たったフレームはデコード自体を省略する。
+    ``params.hysteresis`` が正なら時間方向に安定化する。変化率を見たい場合は
+    stabilizerを渡し、書き出し後に ``summary()`` を読む。``compact`` なら各行の
+    両端の空白を、表示が変わらない範囲で詰める (``compact_bounds``)。
+    ``skip_unchanged`` と戻り値は ``export_ass_targets`` と同じ。
+    """
+    target = ExportTarget(out_path, params, pos_x, pos_y, fontsize, mask_lookup, stabilizer)
+    return export_ass_targets(video_path, [target], start_sec, dur_sec, fontname, play_res_x, play_res_y,
+                              stats=stats, cache=cache, compact=compact, skip_unchanged=skip_unchanged)
+
+
+def add_param_arguments(parser: argparse.ArgumentParser):
+    """変換パラメータ (``AsciiParams``) を上書きするオプション群を追加する."""
+    parser.add_argument("--cols", type=int)
+    parser.add_argument("--rows", type=int)
+    parser.add_argument("--fps", type=float)
+    parser.add_argument("--charset", choices=list(CHARSETS) + ["Custom"])
+    parser.add_argument("--custom-charset")
+    parser.add_argument("--invert", action=argparse.BooleanOptionalAction)
+    parser.add_argument("--binarize", action=argparse.BooleanOptionalAction)
+    parser.add_argument("--threshold", type=int)
+    parser.add_argument("--binarize-mode", choices=["gradient", "pattern"])
+    parser.add_argument("--gamma", type=float)
+    parser.add_argument("--contrast", type=float)
+    parser.add_argument("--brightness", type=float)
+    parser.add_argument("--dither", choices=DITHER_MODES)
+    parser.add_argument("--match", choices=MATCH_MODES, help="pick glyphs by tone or by shape")
+    parser.add_argument("--ramp", choices=RAMP_MODES,
+                        help="order glyphs by measured ink coverage (sorted) and map tone by coverage (even)")
+    parser.add_argument("--glyph-font", help="font file rasterized for --match shape and --ramp")
+    parser.add_argument("--edges", action=argparse.BooleanOptionalAction,
+                        help="replace strong-edge cells with directional glyphs (| / - \\)")
+    parser.add_argument("--edge-threshold", type=int, help="gradient strength that counts as an edge (0-255)")
+    parser.add_argument("--hysteresis", type=int,
+                        help="keep a cell's glyph until its tone moves more than this (0-255)")
+    parser.add_argument("--color", action=argparse.BooleanOptionalAction,
+                        help="per-cell colors quantized to a palette")
+    parser.add_argument("--color-levels", type=int, choices=COLOR_LEVELS,
+                        help="palette levels per channel (levels^3 colors)")
+    parser.add_argument("--roi", type=parse_roi, metavar="X,Y,W,H",
+                        help="convert only this part of the frame (fractions 0-1 of its width and height)")
+
+
+def parse_roi(text: str) -> tuple[float, float, float, float]:
+    """``X,Y,W,H`` (フレームに対する0..1の割合) を ``AsciiParams.roi`` にする."""
+    try:
+        x, y, w, h = (float(v) for v in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"region must look like 0.25,0.1,0.5,0.5, got {text!r}") from None
+    if w <= 0 or h <= 0 or x < 0 or y < 0 or x + w > 1.0 + 1e-6 or y + h > 1.0 + 1e-6:
+        raise argparse.ArgumentTypeError(f"region {text!r} must lie inside the frame (0-1)")
+    return x, y, w, h
+
+
+def params_from_args(args: argparse.Namespace, params: AsciiParams) -> AsciiParams:
+    """``add_param_arguments`` で明示された値だけを ``params`` に上書きする."""
+    overrides = {
+        "cols": args.cols,
+        "rows": args.rows,
+        "fps": args.fps,
+        "charset_name": args.charset,
+        "custom_charset": args.custom_charset,
+        "invert": args.invert,
+        "binarize": args.binarize,
+        "binarize_threshold": args.threshold,
+        "binarize_custom_mode": args.binarize_mode,
+        "gamma": args.gamma,
+        "contrast": args.contrast,
+        "brightness": args.brightness,
+        "hysteresis": args.hysteresis,
+        "dither": args.dither,
+        "match_mode": args.match,
+        "ramp": args.ramp,
+        "edges": args.edges,
+        "edge_threshold": args.edge_threshold,
+        "glyph_font": args.glyph_font,
+        "color_mode": None if args.color is None else ("color" if args.color else "mono"),
+        "color_levels": args.color_levels,
+        "roi": args.roi,
+    }
+    params = replace(params, **{k: v for k, v in overrides.items() if v is not None})
+    params.cols = max(1, params.cols)
+    params.rows = max(1, params.rows)
+    params.fps = max(0.1, params.fps)
+    return params
+
+
+def add_source_arguments(parser: argparse.ArgumentParser):
+    """連番画像・rawvideo入力用のオプションを追加する."""
+    parser.add_argument("--input-fps", type=float, help="frame rate of image sequences and raw input (default 30)")
+    parser.add_argument("--raw-size", metavar="WxH", help="read headerless rawvideo of this size instead of Y4M")
+    parser.add_argument("--raw-format", choices=RAW_FORMATS, default="bgr24", help="pixel format for --raw-size")
+    parser.add_argument("--index", action=argparse.BooleanOptionalAction, default=True,
+                        help="scan the video once for frame timestamps and keyframes (saved beside it) "
+                             "for exact time-to-frame mapping and seeking")
+
+
+def source_from_args(parser: argparse.ArgumentParser, args: argparse.Namespace,
+                     spec: Path | str) -> FrameSource:
+    raw = None
+    if args.raw_size:
+        try:
+            width, height = (int(v) for v in args.raw_size.lower().split("x"))
+        except ValueError:
+            parser.error("--raw-size must look like 1280x720")
+        raw = (width, height, args.raw_format)
+    try:
+        return open_source(spec, fps=args.input_fps, raw=raw, index=args.index)
+    except (OSError, RuntimeError, ValueError) as e:
+        parser.error(str(e))
+
+
+def resolve_input(args: argparse.Namespace, parser: argparse.ArgumentParser) -> tuple[
+        Path | str, AsciiParams, dict, Callable[[int], np.ndarray | None] | None]:
+    """``args.input`` を ``(動画, パラメータ, 書き出し設定, 消去マスクの参照)`` にする.
+
+    プロジェクトファイルなら保存された動画・パラメータ・書き出し設定とマスクを使い、
+    コマンドラインの変換オプションはそれより優先する。グリッドの大きさか範囲が
+    プロジェクトと変わったらマスクは合わないので使わない (``--no-masks`` でも使わない)。
+    """
+    params = AsciiParams()
+    layout: dict = {}
+    mask_lookup: Callable[[int], np.ndarray | None] | None = None
+    video_path = args.input
+    project = None
+    if str(args.input) != "-" and is_project_file(Path(args.input)):
+        project = load_project(Path(args.input))
+        if project.video_path is None:
+            parser.error(f"{args.input} does not reference a video")
+        video_path = project.video_path
+        params = project.params
+        layout = dict(project.export.get("resolved") or {})
+        if project.masks and not args.no_masks:
+            mask_lookup = project.masks.get
+
+    params = params_from_args(args, params)
+    if mask_lookup is not None and (project.masks.shape != (params.rows, params.cols)
+                                    or params.roi != project.params.roi):
+        print("warning: grid size or region differs from the project; erase masks are ignored", file=sys.stderr)
+        mask_lookup = None
+    return video_path, params, layout, mask_lookup
+
+
+def main(argv: list[str] | None = None) -> int:
+    """GUIなしでASSを書き出すCLI。座標とフォントサイズはPlayRes座標で指定する.
+
+    入力にプロジェクトファイル(.asscii)を渡すと、保存された動画・パラメータ・
+    マスク・書き出し設定を使う。コマンドラインで明示した値はそれより優先される。
+    """
+    parser = argparse.ArgumentParser(description="Convert a video (or an .asscii project) to ASCII-art ASS subtitles.")
+    parser.add_argument("input", type=Path,
+                        help="video file, .asscii project, image directory or glob, .y4m file, or - for stdin")
+    parser.add_argument("output", type=Path)
+    add_param_arguments(parser)
+    parser.add_argument("--start", type=float, help="start time in seconds")
+    parser.add_argument("--duration", type=float, help="seconds (default: until the end)")
+    parser.add_argument("--pos-x", type=float, help="block center X (PlayRes)")
+    parser.add_argument("--pos-y", type=float, help="block center Y (PlayRes)")
+    parser.add_argument("--fontname")
+    parser.add_argument("--fontsize", type=int, help="\\fs value (PlayRes units)")
+    parser.add_argument("--play-res-x", type=int)
+    parser.add_argument("--play-res-y", type=int)
+    parser.add_argument("--compact", action=argparse.BooleanOptionalAction, default=None,
+                        help="trim blank cells at both ends of each row where centering keeps the layout")
+    parser.add_argument("--skip-unchanged", action=argparse.BooleanOptionalAction, default=None,
+                        help="reuse the previous conversion when a frame's cell-grid luma has barely changed")
+    add_source_arguments(parser)
+    parser.add_argument("--variant", action="append", default=[], metavar="OUT:COLSxROWS",
+                        help="also write OUT at another grid size from the same decode (repeatable); "
+                             "the font size is scaled so the block keeps its height")
+    parser.add_argument("--region", action="append", default=[], metavar="[OUT:]X,Y,W,H",
+                        help="also convert this part of the frame (fractions 0-1) as its own block, placed "
+                             "where it sits in the full block (repeatable; default OUT is the output file)")
+    parser.add_argument("--regions-only", action="store_true", help="write only the --region blocks")
+    parser.add_argument("--no-masks", action="store_true", help="ignore erase masks stored in the project")
+    parser.add_argument("--stats", type=Path, help="write per-stage timings to this CSV")
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=True,
+                        help="reuse converted frames from the on-disk cache")
+    parser.add_argument("--cache-dir", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    video_path, params, layout, mask_lookup = resolve_input(args, parser)
+    if args.regions_only and not args.region:
+        parser.error("--regions-only needs at least one --region")
+
+    def pick(value, key: str, default):
+        if value is not None:
+            return value
+        stored = layout.get(key)
+        return default if stored is None else stored
+
+    perf = None
+    if args.stats is not None:
+        from perf_stats import PerfStats
+
+        perf = PerfStats(window=100_000)
+    pos_x = float(pick(args.pos_x, "pos_x", YT_PLAY_RES_X / 2))
+    pos_y = float(pick(args.pos_y, "pos_y", YT_PLAY_RES_Y / 2))
+    fontsize = int(pick(args.fontsize, "fontsize", 4))
+    targets = [ExportTarget(args.output, params, pos_x, pos_y, fontsize, mask_lookup)]
+    for spec in args.variant:
+        out, _, grid = spec.rpartition(":")
+        try:
+            cols, rows = (max(1, int(v)) for v in grid.lower().split("x"))
+        except ValueError:
+            parser.error(f"--variant must look like out.ass:120x54, got {spec!r}")
+        variant = replace(params, cols=cols, rows=rows)
+        targets.append(ExportTarget(
+            Path(out), variant, pos_x, pos_y, max(1, int(round(fontsize * params.rows / rows))),
+            # 消去マスクはグリッドが同じターゲットにだけ効く
+            mask_lookup,
+        ))
+    for spec in args.region:
+        out, _, rect = spec.rpartition(":")
+        try:
+            roi = parse_roi(rect)
+        except argparse.ArgumentTypeError as e:
+            parser.error(f"--region: {e}")
+        targets.append(region_target(targets[0], roi, Path(out) if out else None))
+    if args.regions_only:
+        del targets[:1 + len(args.variant)]
+    source = source_from_args(parser, args, video_path)
+    skip_unchanged = bool(pick(args.skip_unchanged, "skip_unchanged", False))
+    result = export_ass_targets(
+        video_path=source,
+        targets=targets,
+        start_sec=max(0.0, float(pick(args.start, "start_sec", 0.0))),
+        dur_sec=args.duration if args.duration is not None else layout.get("dur_sec"),
+        fontname=str(pick(args.fontname, "fontname", "Courier New")),
+        play_res_x=int(pick(args.play_res_x, "play_res_x", YT_PLAY_RES_X)),
+        play_res_y=int(pick(args.play_res_y, "play_res_y", YT_PLAY_RES_Y)),
+        stats=perf,
+        cache=ConversionCache(args.cache_dir) if args.cache else None,
+        compact=bool(pick(args.compact, "compact", False)),
+        skip_unchanged=skip_unchanged,
+    )
+    source.close()
+    if skip_unchanged:
+        for target, frames, skipped in zip(targets, result["frames"], result["skipped"]):
+            print(f"{target.out_path}: {skipped} of {frames} frames reused unchanged", file=sys.stderr)
+    if perf is not None:
+        perf.to_csv(args.stats)
+    # --regions-only では基準のターゲットを書かないので、実際に走ったものだけを出す
+    for target, used in zip(targets, result["stabilizers"]):
+        if used is None:
+            continue
+        churn = used.summary()
+        label = f"{target.out_path}: " if len(targets) > 1 else ""
+        print(
+            f"{label}changed cells per frame: {churn['raw_changed_ratio']:.1%} -> {churn['changed_ratio']:.1%}"
+            f" (hysteresis {target.params.hysteresis})",
+            file=sys.stderr,
+        )
+    return 0
+
 
-    cap.release()
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,16 +18,31 @@ from PIL import Image, ImageTk, ImageFont
 
 from ascii_core import (
     CHARSETS,
+    COLOR_LEVELS,
+    DITHER_MODES,
+    MATCH_MODES,
+    RAMP_MODES,
+    AsciiFrame,
     AsciiParams,
+    ChangeDetector,
+    TemporalStabilizer,
     apply_mask_to_ascii_lines,
-    frame_to_ascii,
-    render_ascii_image,
+    convert_frame,
 )
-from ass_exporter import export_ass
+from ascii_render import redraw_ascii_rows, render_ascii_image
+from ass_exporter import YT_PLAY_RES_X, YT_PLAY_RES_Y, export_ass
+from conversion_cache import CacheEntry, ConversionCache
+from frame_index import FrameIndex, build_index
+from frame_source import IMAGE_SUFFIXES, FrameSource, VideoFileSource, open_source
+from mask_store import MaskStore
+from perf_stats import PerfStats, Stopwatch
+from preview_governor import PreviewGovernor
+from project_file import PROJECT_SUFFIX, Project, is_project_file, load_project, save_project
+from timeline_strip import TimelineStrip
 
 
-YT_PLAY_RES_X = 384
-YT_PLAY_RES_Y = 288
+# スライダーのドラッグがこの時間止まったら実際にシークする
+SCRUB_SETTLE_MS = 150
 
 
 # ---------- UI App ----------
@@ -39,7 +54,7 @@ class App:
         self.root.geometry("1920x1080")
         self.root.resizable(False, False)
 
-        self.cap = None
+        self.source: FrameSource | None = None
         self.video_path: Path | None = None
         self.video_fps = 30.0
         self.video_w = 1280
@@ -50,33 +65,78 @@ class App:
         self.last_tick = time.time()
 
         self.params = AsciiParams()
-        self.erase_masks: dict[int, np.ndarray] = {}
+        self.erase_masks = MaskStore((self.params.rows, self.params.cols))
+        self._edit_mask: np.ndarray | None = None
+        self._edit_mask_index: int | None = None
         self._last_frame_bgr: np.ndarray | None = None
         self._last_frame_index: int | None = None
         self._ascii_render_size = (1, 1)
         self._ascii_display_size = (1, 1)
         self._ascii_render_grid_size = (1, 1)
         self._ascii_pad = 10
+        self._ascii_base_img: Image.Image | None = None
+        self._ascii_display_img: Image.Image | None = None
+        self._ascii_shown_lines: list[str] | None = None
+        self._ascii_shown_index: int | None = None
+        self._erase_dirty_cells: set[tuple[int, int]] = set()
+        self._erase_flush_id: str | None = None
         self._rows_updating = False
         self._suppress_frame_var = False
-        self.ascii_cache: dict[int, list[str]] = {}
+        self.ascii_cache: dict[int, AsciiFrame] = {}
+        # 再生順に掛ける時間方向の安定化。キャッシュには安定化前のフレームを置く
+        self.stabilizer = TemporalStabilizer(self.params.hysteresis, max_gap=1)
+        self._ascii_shown_frame: AsciiFrame | None = None
+        # 表示中の画像を描いたときの (フォント, 表示枠)。同じ表示になるフレームは描き直さない
+        self._ascii_render_key: tuple | None = None
+        # ほぼ静止したフレームでは前の変換結果を使い回す (先読みはワーカーごとに別に持つ)
+        self.change_detector = ChangeDetector()
+        # 表示と書き出しの結果がずれないよう初期はOFF (書き出しの Skip unchanged と揃える)
+        self._skip_static = False
         self._cache_lock = threading.Lock()
         self._prefetch_pending: set[int] = set()
         self._prefetch_radius = 8
-        self._preload_queue: queue.Queue[int | None] | None = None
+        # 先読みジョブは (世代, フレーム番号, パラメータ)。パラメータが変わると世代が進み、古い世代のジョブと結果は捨てる
+        self._params_generation = 0
+        self._prefetch_params: AsciiParams | None = None
+        self._preload_queue: queue.Queue[tuple[int, int, AsciiParams] | None] | None = None
         self._preload_thread: threading.Thread | None = None
         self._preload_stop: threading.Event | None = None
+        # バックグラウンドで作ったフレーム索引 (動画パス, 索引)。_loopで取り込む
+        self._built_index: tuple[Path, FrameIndex | None] | None = None
+        self._index_building = False
+        # スクラブ用のサムネイル列。ドラッグ中はこれを見せ、止まってから1回だけシークする
+        self.timeline: TimelineStrip | None = None
+        self._timeline_stop: threading.Event | None = None
+        self._scrub_target: int | None = None
+        self._scrub_draw_id: str | None = None
+        self._scrub_seek_id: str | None = None
+        self.perf = PerfStats()
+        # 再生が間に合わないときにプレビューだけ画質を落とす。書き出しのparamsには触れない
+        self.governor = PreviewGovernor()
+        self._ascii_preview_degraded = False
+        self.conversion_cache = ConversionCache()
+        self._disk_entry: CacheEntry | None = None
+        self.export_settings: dict = {}
+        self.project_path: Path | None = None
+        self._params_sync_suspended = False
+        self._perf_hud_visible = False
+        self._perf_hud_tick = 0.0
 
         # Try load a monospace font; fallbackを順に試す
         self.fontname = "lucida-console.ttf"
         self._font_display_name = "Lucida Console"
         self.fontsize = 18
         self._font = self._load_font(self.fontsize)
+        # 形状マッチもプレビューと同じフォントの字形で比べる
+        self.params.glyph_font = str(getattr(self._font, "path", "") or "")
 
         self._build_ui()
 
         if video_path:
-            self.open_video(video_path)
+            if is_project_file(video_path):
+                self.open_project(video_path)
+            else:
+                self.open_video(video_path)
 
 
 
@@ -146,6 +206,10 @@ class App:
         self.ascii_label.bind("<B2-Motion>", self._on_ascii_restore)
         self.ascii_label.bind("<Control-Button-1>", self._on_ascii_restore)
         self.ascii_label.bind("<Control-B1-Motion>", self._on_ascii_restore)
+        self._perf_hud = tk.Label(
+            self.ascii_label.master, text="", justify="left", anchor="nw",
+            font=("Courier", 10), bg="#000000", fg="#7cfc00", bd=0, padx=6, pady=4,
+        )
 
         transport = ctk.CTkFrame(main, corner_radius=12)
         transport.pack(fill="x", pady=(8, 0))
@@ -154,7 +218,7 @@ class App:
 
         transport_buttons = ctk.CTkFrame(transport, fg_color="transparent")
         transport_buttons.pack(fill="x", padx=8, pady=(8, 4))
-        transport_buttons.grid_columnconfigure((0, 1, 2), weight=1)
+        transport_buttons.grid_columnconfigure((0, 1, 2, 3), weight=1)
 
         ctk.CTkButton(transport_buttons, text="Open", command=self.ask_open).grid(
             row=0, column=0, padx=4, pady=4, sticky="ew"
@@ -165,6 +229,9 @@ class App:
         ctk.CTkButton(transport_buttons, text="Rewind", command=self.rewind).grid(
             row=0, column=2, padx=4, pady=4, sticky="ew"
         )
+        ctk.CTkButton(transport_buttons, text="Save Project", command=self.ask_save_project).grid(
+            row=0, column=3, padx=4, pady=4, sticky="ew"
+        )
 
         frame_ctrl = ctk.CTkFrame(transport)
         frame_ctrl.pack(fill="x", padx=8, pady=(0, 8))
@@ -173,6 +240,7 @@ class App:
         ctk.CTkLabel(frame_ctrl, text="Frame").grid(row=0, column=0, sticky="w", padx=(0, 10))
         self.frame_slider = ctk.CTkSlider(frame_ctrl, from_=0, to=1, command=self._on_frame_slider)
         self.frame_slider.grid(row=0, column=1, sticky="ew")
+        self.frame_slider.bind("<ButtonRelease-1>", self._finish_scrub)
 
         self.frame_entry = ctk.CTkEntry(frame_ctrl, textvariable=self.frame_entry_var, width=80, justify="center")
         self.frame_entry.grid(row=0, column=2, padx=(12, 0))
@@ -196,7 +264,7 @@ class App:
 
         actions = ctk.CTkFrame(controls, fg_color="transparent")
         actions.pack(fill="x", padx=8, pady=(8, 4))
-        actions.grid_columnconfigure((0, 1, 2), weight=1)
+        actions.grid_columnconfigure((0, 1, 2, 3, 4, 5), weight=1)
         ctk.CTkButton(actions, text="Export ASS", command=self.ask_export).grid(
             row=0, column=0, padx=4, pady=4, sticky="ew"
         )
@@ -206,6 +274,15 @@ class App:
         ctk.CTkButton(actions, text="Clear Eraser", command=self._clear_erase_mask).grid(
             row=0, column=2, padx=4, pady=4, sticky="ew"
         )
+        ctk.CTkButton(actions, text="Eraser → Range", command=self.ask_mask_range).grid(
+            row=0, column=3, padx=4, pady=4, sticky="ew"
+        )
+        ctk.CTkButton(actions, text="Perf HUD", command=self.toggle_perf_hud).grid(
+            row=0, column=4, padx=4, pady=4, sticky="ew"
+        )
+        ctk.CTkButton(actions, text="Perf CSV", command=self.ask_export_perf_csv).grid(
+            row=0, column=5, padx=4, pady=4, sticky="ew"
+        )
 
         opts = ctk.CTkFrame(controls)
         opts.pack(fill="x", padx=8, pady=(4, 0))
@@ -223,6 +300,14 @@ class App:
         self.binarize_threshold_var = tk.IntVar(value=self.params.binarize_threshold)
         self.binarize_mode_var = tk.StringVar(value=self.params.binarize_custom_mode)
         self.charset_var = tk.StringVar(value=self.params.charset_name)
+        self.color_var = tk.BooleanVar(value=self.params.color_mode == "color")
+        self.color_levels_var = tk.StringVar(value=str(self.params.color_levels))
+        self.hysteresis_var = tk.IntVar(value=self.params.hysteresis)
+        self.dither_var = tk.StringVar(value=self.params.dither)
+        self.match_var = tk.StringVar(value=self.params.match_mode)
+        self.ramp_var = tk.StringVar(value=self.params.ramp)
+        self.edges_var = tk.BooleanVar(value=self.params.edges)
+        self.edge_threshold_var = tk.IntVar(value=self.params.edge_threshold)
         self.fontsize_var = tk.StringVar(value="auto")
         self.lock_aspect_var = tk.BooleanVar(value=True)
         self.frame_var = tk.IntVar(value=0)
@@ -278,6 +363,8 @@ class App:
         add_slider(1, 0, "Gamma", self.gamma_var, 0.3, 3.0)
         add_slider(1, 1, "Contrast", self.contrast_var, 0.3, 3.0)
         add_slider(1, 2, "Brightness", self.brightness_var, -100, 100)
+        add_slider(2, 0, "Hysteresis", self.hysteresis_var, 0, 48, step=1.0)
+        add_slider(2, 1, "Edge thr", self.edge_threshold_var, 8, 160, step=1.0)
 
         charset_row = ctk.CTkFrame(controls)
         charset_row.pack(fill="x", padx=8, pady=(8, 0))
@@ -294,9 +381,25 @@ class App:
             placeholder_text="Custom chars",
         )
 
+        ctk.CTkSwitch(charset_row, text="Color", variable=self.color_var).pack(side="right")
+        ctk.CTkOptionMenu(
+            charset_row,
+            variable=self.color_levels_var,
+            values=[str(v) for v in COLOR_LEVELS],
+            width=60,
+        ).pack(side="right", padx=(6, 12))
+        ctk.CTkLabel(charset_row, text="Levels/ch").pack(side="right")
+        ctk.CTkSwitch(charset_row, text="Edges", variable=self.edges_var).pack(side="right", padx=(0, 12))
+
         tone_row = ctk.CTkFrame(controls)
         tone_row.pack(fill="x", padx=8, pady=(6, 0))
         ctk.CTkSwitch(tone_row, text="Invert", variable=self.invert_var).pack(side="left")
+        ctk.CTkLabel(tone_row, text="Dither").pack(side="left", padx=(12, 6))
+        ctk.CTkOptionMenu(tone_row, variable=self.dither_var, values=list(DITHER_MODES), width=130).pack(side="left")
+        ctk.CTkLabel(tone_row, text="Match").pack(side="left", padx=(12, 6))
+        ctk.CTkOptionMenu(tone_row, variable=self.match_var, values=list(MATCH_MODES), width=90).pack(side="left")
+        ctk.CTkLabel(tone_row, text="Ramp").pack(side="left", padx=(12, 6))
+        ctk.CTkOptionMenu(tone_row, variable=self.ramp_var, values=list(RAMP_MODES), width=100).pack(side="left")
         ctk.CTkSwitch(tone_row, text="Binarize", variable=self.binarize_var).pack(side="left", padx=(12, 0))
         ctk.CTkLabel(tone_row, text="Threshold").pack(side="left", padx=(12, 6))
         self._binarize_slider = ctk.CTkSlider(tone_row, from_=0, to=255)
@@ -338,6 +441,14 @@ class App:
         font_entry.bind("<Return>", lambda *_: self._on_fontsize())
         font_entry.bind("<FocusOut>", lambda *_: self._on_fontsize())
         ctk.CTkSwitch(font_row, text="Lock aspect", variable=self.lock_aspect_var).pack(side="left", padx=(12, 0))
+        self.adaptive_preview_var = tk.BooleanVar(value=self.governor.enabled)
+        ctk.CTkSwitch(font_row, text="Adaptive preview", variable=self.adaptive_preview_var,
+                      command=self._on_adaptive_preview_toggle).pack(side="left", padx=(12, 0))
+        self.skip_static_var = tk.BooleanVar(value=self._skip_static)
+        ctk.CTkSwitch(font_row, text="Skip static frames", variable=self.skip_static_var,
+                      command=self._on_skip_static_toggle).pack(side="left", padx=(12, 0))
+        self.preview_quality_var = tk.StringVar(value=self.governor.describe(self.params))
+        ctk.CTkLabel(font_row, textvariable=self.preview_quality_var).pack(side="left", padx=(12, 0))
 
         # transport frame already includes playback info and frame controls
 
@@ -354,6 +465,14 @@ class App:
             self.binarize_mode_var,
             self.charset_var,
             self.custom_charset_var,
+            self.color_var,
+            self.color_levels_var,
+            self.hysteresis_var,
+            self.dither_var,
+            self.match_var,
+            self.ramp_var,
+            self.edges_var,
+            self.edge_threshold_var,
         ]:
             var.trace_add("write", lambda *args: self._sync_params())
 
@@ -409,6 +528,8 @@ class App:
         self._on_fontsize()
 
     def _sync_params(self):
+        if self._params_sync_suspended:
+            return
         prev = AsciiParams(**vars(self.params))
         self.params.cols = max(10, int(self.cols_var.get()))
         self.params.rows = max(5, int(self.rows_var.get()))
@@ -422,6 +543,17 @@ class App:
         self.params.binarize_custom_mode = self.binarize_mode_var.get()
         self.params.charset_name = self.charset_var.get()
         self.params.custom_charset = self.custom_charset_var.get()
+        self.params.color_mode = "color" if self.color_var.get() else "mono"
+        try:
+            self.params.color_levels = int(self.color_levels_var.get())
+        except ValueError:
+            pass
+        self.params.hysteresis = max(0, int(self.hysteresis_var.get()))
+        self.params.dither = self.dither_var.get()
+        self.params.match_mode = self.match_var.get()
+        self.params.ramp = self.ramp_var.get()
+        self.params.edges = bool(self.edges_var.get())
+        self.params.edge_threshold = int(self.edge_threshold_var.get())
 
         dims_changed = self.params.cols != prev.cols or self.params.rows != prev.rows
         tone_changed = (
@@ -433,13 +565,28 @@ class App:
             self.params.binarize_threshold != prev.binarize_threshold or
             self.params.binarize_custom_mode != prev.binarize_custom_mode or
             self.params.charset_name != prev.charset_name or
-            self.params.custom_charset != prev.custom_charset
+            self.params.custom_charset != prev.custom_charset or
+            self.params.color_mode != prev.color_mode or
+            self.params.color_levels != prev.color_levels or
+            self.params.dither != prev.dither or
+            self.params.match_mode != prev.match_mode or
+            self.params.ramp != prev.ramp or
+            self.params.edges != prev.edges or
+            self.params.edge_threshold != prev.edge_threshold
         )
 
         if dims_changed:
             self._reset_all_masks()
+            self._reset_preview_quality()
+        if dims_changed or tone_changed or self.params.hysteresis != prev.hysteresis:
+            self.stabilizer.band = self.params.hysteresis
+            self.stabilizer.reset()
+            self.stabilizer.reset_metrics()
         if dims_changed or tone_changed:
             self._clear_ascii_cache()
+            self._open_disk_cache()
+            self._refresh_ascii_preview()
+        elif self.params.hysteresis != prev.hysteresis:
             self._refresh_ascii_preview()
 
     def _set_frame_index(self, idx: int, update_slider: bool = True):
@@ -483,7 +630,66 @@ class App:
     def _on_frame_slider(self, value):
         if self._suppress_frame_var:
             return
-        self.frame_var.set(int(round(float(value))))
+        idx = int(round(float(value)))
+        if self.timeline is None or not len(self.timeline):
+            self.frame_var.set(idx)
+            return
+        # ドラッグ中はサムネイルだけを見せ、途中の位置へのシークは行わない
+        self.paused = True
+        self._scrub_target = idx
+        self._suppress_frame_var = True
+        try:
+            self.frame_var.set(idx)
+        finally:
+            self._suppress_frame_var = False
+        if self._scrub_draw_id is None:
+            self._scrub_draw_id = self.root.after_idle(self._draw_scrub)
+        if self._scrub_seek_id is not None:
+            self.root.after_cancel(self._scrub_seek_id)
+        self._scrub_seek_id = self.root.after(SCRUB_SETTLE_MS, self._finish_scrub)
+
+    def _draw_scrub(self):
+        self._scrub_draw_id = None
+        idx = self._scrub_target
+        strip = self.timeline
+        if idx is None or strip is None:
+            return
+        found = strip.ascii_frame(idx, self.params)
+        if found is None:
+            return
+        watch = Stopwatch(self.perf, "scrub.")
+        thumb_idx, frame = found
+        _, luma = strip.nearest(thumb_idx)
+        max_w, max_h = self._get_preview_target_size(self.orig_label)
+        self._orig_tk = ImageTk.PhotoImage(self._fit_image(Image.fromarray(luma), max_w, max_h))
+        self.orig_label.configure(image=self._orig_tk)
+
+        lines = self._apply_erase_mask_to_lines(frame.lines, thumb_idx)
+        ascii_img = render_ascii_image(lines, font=self._font, pad=self._ascii_pad)
+        max_w, max_h = self._get_preview_target_size(self.ascii_label)
+        self._ascii_tk = ImageTk.PhotoImage(self._fit_image(ascii_img, max_w, max_h))
+        self.ascii_label.configure(image=self._ascii_tk)
+        # サムネイルの表示は消去の部分描き直しやテキスト書き出しに使わせない
+        self._ascii_shown_index = None
+        self._ascii_render_key = None
+        max_idx = max(0, self.video_frames - 1)
+        self.frame_label_var.set(f"Frame {idx} / {max_idx}  (preview from {thumb_idx})")
+        watch.lap("thumbnail")
+
+    def _finish_scrub(self, *_):
+        """ドラッグが止まったか離されたら、最後の位置へ1回だけシークする."""
+        target = self._scrub_target
+        self._cancel_scrub()
+        if target is not None:
+            self._seek_to_frame(target)
+
+    def _cancel_scrub(self):
+        self._scrub_target = None
+        for after_id in (self._scrub_draw_id, self._scrub_seek_id):
+            if after_id is not None:
+                self.root.after_cancel(after_id)
+        self._scrub_draw_id = None
+        self._scrub_seek_id = None
 
     def _on_frame_entry_commit(self, *_):
         try:
@@ -498,7 +704,7 @@ class App:
         self.frame_var.set(idx)
 
     def _on_frame_var_changed(self, *args):
-        if self._suppress_frame_var or self.cap is None or self.video_frames <= 0:
+        if self._suppress_frame_var or self.source is None or self.video_frames <= 0:
             return
         try:
             idx = int(self.frame_var.get())
@@ -508,7 +714,7 @@ class App:
         self._seek_to_frame(idx)
 
     def _seek_to_frame(self, idx: int, pause: bool = True):
-        if self.cap is None:
+        if self.source is None:
             return
         if self.video_frames > 0:
             idx = max(0, min(idx, self.video_frames - 1))
@@ -516,12 +722,15 @@ class App:
             idx = max(0, idx)
         if pause:
             self.paused = True
-        self.cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-        ok, frame = self.cap.read()
-        if not ok:
+        watch = Stopwatch(self.perf)
+        if not self.source.seek(idx):
             return
-        self._set_frame_index(idx)
-        self._update_previews(frame)
+        frame = self.source.read()
+        if frame is None:
+            return
+        watch.lap("seek")
+        self._set_frame_index(frame.index)
+        self._update_previews(frame.bgr)
         self.last_tick = time.time()
 
     def _get_font_cell_size(self) -> tuple[int, int]:
@@ -553,7 +762,8 @@ class App:
 
     def _get_ascii_grid_pixel_size(self) -> tuple[int, int]:
         cached = getattr(self, "_ascii_render_grid_size", None)
-        if cached and cached[0] > 0 and cached[1] > 0:
+        # 画質を落としたプレビューの寸法は書き出しのフォントサイズ計算に使わない
+        if cached and cached[0] > 0 and cached[1] > 0 and not self._ascii_preview_degraded:
             return cached
         cell_w, cell_h = self._get_font_cell_size()
         return max(1, cell_w * max(1, self.params.cols)), max(1, cell_h * max(1, self.params.rows))
@@ -565,60 +775,186 @@ class App:
         with self._cache_lock:
             self.ascii_cache.clear()
             self._prefetch_pending.clear()
+            self._params_generation += 1
+            self._prefetch_params = None
+        self.change_detector.reset()
+        # 待ち行列に残った古い世代のジョブは実行前に取り除く
+        dropped = 0
+        pending = self._preload_queue
+        while pending is not None:
+            try:
+                job = pending.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                pending.put_nowait(None)
+                break
+            dropped += 1
+        if dropped:
+            self.perf.count("prefetch.cancelled_queued", dropped)
+
+    def _open_disk_cache(self):
+        if self._disk_entry is not None:
+            self._disk_entry.close()
+            self._disk_entry = None
+        if self.video_path is None:
+            return
+        self._disk_entry = self.conversion_cache.open(self.video_path, self._clone_params())
 
-    def _store_ascii_lines(self, frame_idx: int | None, lines: list[str]):
+    def _store_ascii_frame(self, frame_idx: int | None, frame: AsciiFrame, generation: int | None = None) -> bool:
+        """``generation`` が今の世代と違えば (変換中にパラメータが変わった) 置かずにFalse."""
         if frame_idx is None:
-            return
+            return False
         with self._cache_lock:
-            self.ascii_cache[frame_idx] = lines
+            if generation is not None and generation != self._params_generation:
+                return False
+            self.ascii_cache[frame_idx] = frame
             self._prefetch_pending.discard(frame_idx)
+        return True
 
-    def _get_cached_ascii_lines(self, frame_idx: int | None) -> list[str] | None:
+    def _get_cached_ascii_frame(self, frame_idx: int | None) -> AsciiFrame | None:
         if frame_idx is None:
             return None
         with self._cache_lock:
             return self.ascii_cache.get(frame_idx)
 
-    def _ensure_ascii_lines(self, frame_idx: int | None, frame_bgr: np.ndarray | None,
-                            params: AsciiParams | None = None) -> list[str] | None:
-        cached = self._get_cached_ascii_lines(frame_idx)
+    def _ensure_ascii_frame(self, frame_idx: int | None, frame_bgr: np.ndarray | None,
+                            params: AsciiParams | None = None,
+                            stats_prefix: str = "convert.",
+                            generation: int | None = None,
+                            detector: ChangeDetector | None = None) -> AsciiFrame | None:
+        """``generation`` は先読みジョブの世代。今の世代と違う結果はメモリキャッシュに置かない.
+
+        ``detector`` を渡すと、前に変換したフレームとほぼ同じなら変換せずにその結果を使う。
+        """
+        cached = self._get_cached_ascii_frame(frame_idx)
         if cached is not None:
             return cached
+        use_params = params or self.params
+        entry = self._disk_entry
+        if entry is not None and frame_idx is not None and not entry.matches(use_params):
+            entry = None
+        if entry is not None:
+            stored = entry.get(frame_idx)
+            if stored is not None:
+                self._store_ascii_frame(frame_idx, stored, generation)
+                return stored
         if frame_bgr is None:
             return None
-        use_params = params or self.params
         gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
-        lines = frame_to_ascii(gray, use_params)
-        self._store_ascii_lines(frame_idx, lines)
-        return lines
+        stats = self.perf.prefixed(stats_prefix)
+        reused = False
+        if detector is not None:
+            frame, reused = detector.convert(gray, use_params, stats=stats, bgr=frame_bgr)
+            if reused:
+                self.perf.count(stats_prefix + "skipped_static")
+                # 使い回した結果は別のフレームの近似なので、この番号ではどちらのキャッシュにも置かない
+                with self._cache_lock:
+                    self._prefetch_pending.discard(frame_idx)
+                return frame
+        else:
+            frame = convert_frame(gray, use_params, stats=stats, bgr=frame_bgr)
+        # ディスクのエントリはパラメータごとなので、古い世代の結果でも正しい場所に入る
+        if entry is not None and frame_idx is not None:
+            entry.put(frame_idx, frame)
+        if not self._store_ascii_frame(frame_idx, frame, generation):
+            self.perf.count("prefetch.discarded_results")
+        return frame
 
     def _reset_all_masks(self):
-        self.erase_masks.clear()
+        self._edit_mask = None
+        self._edit_mask_index = None
+        self.erase_masks.clear((self.params.rows, self.params.cols))
 
     def _get_mask_for_frame(self, frame_idx: int | None, create: bool = False) -> np.ndarray | None:
         if frame_idx is None or frame_idx < 0:
             return None
         expected_shape = (self.params.rows, self.params.cols)
-        mask = self.erase_masks.get(frame_idx)
-        if mask is None and create:
-            mask = np.zeros(expected_shape, dtype=bool)
-            self.erase_masks[frame_idx] = mask
-        elif mask is not None and mask.shape != expected_shape:
-            if create:
-                mask = np.zeros(expected_shape, dtype=bool)
-                self.erase_masks[frame_idx] = mask
-            else:
+        if self.erase_masks.shape != expected_shape:
+            if not create:
                 return None
-        return mask
+            self._reset_all_masks()
+        if create:
+            # 編集用には書き込み可能な作業コピーを持ち、描画時にストアへ反映する
+            if self._edit_mask_index != frame_idx or self._edit_mask is None:
+                stored = self.erase_masks.get(frame_idx)
+                self._edit_mask = stored.copy() if stored is not None else np.zeros(expected_shape, dtype=bool)
+                self._edit_mask_index = frame_idx
+            return self._edit_mask
+        if self._edit_mask_index == frame_idx and self._edit_mask is not None:
+            return self._edit_mask
+        return self.erase_masks.get(frame_idx)
+
+    def _commit_edit_mask(self):
+        if self._edit_mask is None or self._edit_mask_index is None:
+            return
+        if self._edit_mask.shape == self.erase_masks.shape:
+            self.erase_masks.set(self._edit_mask_index, self._edit_mask)
+
+    def _drop_edit_mask(self):
+        self._commit_edit_mask()
+        self._edit_mask = None
+        self._edit_mask_index = None
 
     def _clear_erase_mask(self):
         idx = self.frame_index if self.frame_index is not None else None
         if idx is None:
             return
-        if idx in self.erase_masks:
-            del self.erase_masks[idx]
+        self._drop_edit_mask()
+        if self.erase_masks.get(idx) is not None:
+            self.erase_masks.clear_range(idx, idx + 1)
             self._refresh_ascii_preview()
 
+    def _copy_erase_mask_to_range(self, first: int, last: int):
+        """現在フレームのマスクを [first, last] の全フレームで共有させる."""
+        self._drop_edit_mask()
+        mask = self.erase_masks.get(self.frame_index)
+        if last < first:
+            first, last = last, first
+        if self.video_frames > 0:
+            last = min(last, self.video_frames - 1)
+        first = max(0, first)
+        if mask is None:
+            self.erase_masks.clear_range(first, last + 1)
+        else:
+            self.erase_masks.set_range(first, last + 1, mask)
+        self._refresh_ascii_preview()
+
+    def ask_mask_range(self):
+        if self._last_frame_bgr is None:
+            messagebox.showinfo("Eraser", "Render a frame first.")
+            return
+        dlg = ctk.CTkToplevel(self.root)
+        dlg.title("Eraser range")
+        dlg.geometry("420x200")
+
+        first_var = tk.IntVar(value=self.frame_index)
+        last_var = tk.IntVar(value=max(self.frame_index, self.video_frames - 1))
+
+        frm = ctk.CTkFrame(dlg, corner_radius=12)
+        frm.pack(fill="both", expand=True, padx=12, pady=12)
+        frm.columnconfigure(1, weight=1)
+        ctk.CTkLabel(frm, text="First frame").grid(row=0, column=0, sticky="w", pady=4)
+        ctk.CTkEntry(frm, textvariable=first_var).grid(row=0, column=1, sticky="ew", pady=4)
+        ctk.CTkLabel(frm, text="Last frame").grid(row=1, column=0, sticky="w", pady=4)
+        ctk.CTkEntry(frm, textvariable=last_var).grid(row=1, column=1, sticky="ew", pady=4)
+        ctk.CTkLabel(frm, text="Copies the current frame's eraser mask (empty mask clears the range).").grid(
+            row=2, column=0, columnspan=2, sticky="w", pady=(8, 0)
+        )
+
+        def apply():
+            try:
+                first = int(first_var.get())
+                last = int(last_var.get())
+            except Exception:
+                messagebox.showerror("Eraser", "Frame numbers must be integers.")
+                return
+            self._copy_erase_mask_to_range(first, last)
+            dlg.destroy()
+
+        ctk.CTkButton(frm, text="Apply", command=apply).grid(row=3, column=0, pady=12)
+        ctk.CTkButton(frm, text="Cancel", command=dlg.destroy).grid(row=3, column=1, pady=12, sticky="w")
+
     def _refresh_ascii_preview(self):
         if self._last_frame_bgr is None:
             return
@@ -642,19 +978,25 @@ class App:
             if idx in self.ascii_cache or idx in self._prefetch_pending:
                 return
             self._prefetch_pending.add(idx)
+            generation = self._params_generation
+        # パラメータは積んだ時点のものを渡す (世代ごとに1回だけ複製する)
+        if self._prefetch_params is None:
+            self._prefetch_params = self._clone_params()
         try:
-            self._preload_queue.put_nowait(idx)
+            self._preload_queue.put_nowait((generation, idx, self._prefetch_params))
         except Exception:
             with self._cache_lock:
                 self._prefetch_pending.discard(idx)
 
     def _start_preload_worker(self):
         self._stop_preload_worker()
-        if self.video_path is None:
+        # 先読みは独立したリーダーで行うので、開き直せないストリームでは行わない
+        reader = self.source.reopen() if self.source is not None else None
+        if reader is None:
             return
         self._preload_stop = threading.Event()
         self._preload_queue = queue.Queue()
-        self._preload_thread = threading.Thread(target=self._prefetch_worker, daemon=True)
+        self._preload_thread = threading.Thread(target=self._prefetch_worker, args=(reader,), daemon=True)
         self._preload_thread.start()
 
     def _stop_preload_worker(self):
@@ -673,64 +1015,105 @@ class App:
         with self._cache_lock:
             self._prefetch_pending.clear()
 
-    def _prefetch_worker(self):
-        path = self.video_path
-        if path is None:
-            return
-        cap = cv2.VideoCapture(str(path))
-        if not cap.isOpened():
-            return
+    def _prefetch_worker(self, reader: FrameSource):
+        detector = ChangeDetector()
         while self._preload_stop is not None and not self._preload_stop.is_set():
             try:
-                idx = self._preload_queue.get(timeout=0.2)
+                job = self._preload_queue.get(timeout=0.2)
             except queue.Empty:
                 continue
-            if idx is None:
+            if job is None:
                 break
+            generation, idx, params = job
             with self._cache_lock:
-                if idx in self.ascii_cache:
+                stale = generation != self._params_generation
+                done = stale or idx in self.ascii_cache
+                if done:
                     self._prefetch_pending.discard(idx)
-                    continue
-            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-            ok, frame = cap.read()
-            if not ok:
+            if stale:
+                self.perf.count("prefetch.cancelled_queued")
+            if done:
+                continue
+            watch = Stopwatch(self.perf, "prefetch.")
+            # ディスクキャッシュに当たればデコード自体を省略する
+            if self._ensure_ascii_frame(idx, None, params=params, generation=generation) is not None:
+                watch.lap("disk_hit")
+                continue
+            frame = reader.read() if reader.seek(idx) else None
+            if frame is None:
                 with self._cache_lock:
                     self._prefetch_pending.discard(idx)
                 continue
-            params = self._clone_params()
-            self._ensure_ascii_lines(idx, frame, params=params)
-        cap.release()
+            watch.lap("decode")
+            if generation != self._params_generation:
+                # デコード中にパラメータが変わった。変換はせずに捨てる
+                self.perf.count("prefetch.cancelled_in_flight")
+                continue
+            self._ensure_ascii_frame(idx, frame.bgr, params=params, stats_prefix="prefetch.", generation=generation,
+                                     detector=detector if self._skip_static else None)
+            watch.lap("convert")
+        reader.close()
 
     def _render_ascii_frame(self, frame_bgr: np.ndarray | None, frame_idx: int | None,
-                            max_w: int, max_h: int):
-        base_lines = self._ensure_ascii_lines(frame_idx, frame_bgr)
-        if base_lines is None:
+                            max_w: int, max_h: int, preview_params: AsciiParams | None = None):
+        """``preview_params`` は画質を落としたプレビュー用。その変換結果はキャッシュに置かない."""
+        watch = Stopwatch(self.perf)
+        if preview_params is None:
+            base_frame = self._ensure_ascii_frame(frame_idx, frame_bgr,
+                                                  detector=self.change_detector if self._skip_static else None)
+        elif frame_bgr is not None:
+            gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+            base_frame = convert_frame(gray, preview_params, stats=self.perf.prefixed("convert."), bgr=frame_bgr)
+        else:
+            base_frame = None
+        if base_frame is None:
+            return
+        watch.lap("convert")
+        base_frame = self.stabilizer.apply(base_frame, frame_idx)
+        watch.lap("stabilize")
+        if preview_params is None:
+            lines = self._apply_erase_mask_to_lines(base_frame.lines, frame_idx)
+        else:
+            mask = self._get_mask_for_frame(frame_idx, create=False)
+            if mask is not None:
+                # 消去マスクは粗いグリッドへ最近傍で縮めて当てる
+                mask = cv2.resize(mask.astype(np.uint8), (preview_params.cols, preview_params.rows),
+                                  interpolation=cv2.INTER_NEAREST).astype(bool)
+            lines = apply_mask_to_ascii_lines(base_frame.lines, mask)
+        watch.lap("mask")
+
+        render_key = (self._font, max_w, max_h)
+        shown = self._ascii_shown_frame
+        if (
+            render_key == self._ascii_render_key and shown is not None
+            and base_frame.colors is shown.colors and lines == self._ascii_shown_lines
+        ):
+            # 表示中の画像と同じになるので、描画・縮小・転送を省く
+            self._ascii_shown_index = frame_idx if preview_params is None else None
+            self._ascii_shown_frame = base_frame
+            self._ascii_preview_degraded = preview_params is not None
+            self.perf.count("render.reused")
             return
-        lines = self._apply_erase_mask_to_lines(base_lines, frame_idx)
 
         pad = 10
-        ascii_img = render_ascii_image(lines, font=self._font, pad=pad)
+        ascii_img = render_ascii_image(lines, font=self._font, pad=pad, colors=base_frame.colors)
+        base_img = ascii_img
+        watch.lap("render")
         render_size = ascii_img.size
         grid_render_w = max(render_size[0] - pad * 2, 1)
         grid_render_h = max(render_size[1] - pad * 2, 1)
 
-        target_w = max(1, max_w)
-        target_h = max(1, max_h)
-        src_w = max(1, render_size[0])
-        src_h = max(1, render_size[1])
-        scale_w = target_w / src_w
-        scale_h = target_h / src_h
-        scale = min(scale_w, scale_h)
-        if not math.isfinite(scale) or scale <= 0:
-            scale = 1.0
-        display_w = max(1, int(round(src_w * scale)))
-        display_h = max(1, int(round(src_h * scale)))
-
-        if display_w != src_w or display_h != src_h:
-            resample = Image.NEAREST if scale >= 1.0 else Image.BICUBIC
-            ascii_img = ascii_img.resize((display_w, display_h), resample=resample)
+        ascii_img = self._fit_image(ascii_img, max_w, max_h)
         display_size = ascii_img.size
-
+        watch.lap("pil_resize")
+
+        self._ascii_base_img = base_img
+        self._ascii_display_img = ascii_img
+        self._ascii_shown_lines = list(lines)
+        # 画質を落としたフレームは消去の部分描き直しやテキスト書き出しに使わせない
+        self._ascii_shown_index = frame_idx if preview_params is None else None
+        self._ascii_shown_frame = base_frame
+        self._ascii_preview_degraded = preview_params is not None
         self._ascii_pad = pad
         self._ascii_render_size = render_size
         self._ascii_display_size = display_size
@@ -738,6 +1121,23 @@ class App:
 
         self._ascii_tk = ImageTk.PhotoImage(ascii_img)
         self.ascii_label.configure(image=self._ascii_tk)
+        self._ascii_render_key = render_key
+        watch.lap("tk_blit")
+
+    @staticmethod
+    def _fit_image(img: Image.Image, max_w: int, max_h: int) -> Image.Image:
+        """縦横比を保って ``max_w`` x ``max_h`` に収まるよう拡大縮小する."""
+        src_w = max(1, img.size[0])
+        src_h = max(1, img.size[1])
+        scale = min(max(1, max_w) / src_w, max(1, max_h) / src_h)
+        if not math.isfinite(scale) or scale <= 0:
+            scale = 1.0
+        display_w = max(1, int(round(src_w * scale)))
+        display_h = max(1, int(round(src_h * scale)))
+        if display_w == src_w and display_h == src_h:
+            return img
+        resample = Image.NEAREST if scale >= 1.0 else Image.BICUBIC
+        return img.resize((display_w, display_h), resample=resample)
 
     def _get_preview_target_size(self, label, min_w: int = 320, min_h: int = 240) -> tuple[int, int]:
         try:
@@ -817,7 +1217,67 @@ class App:
         if mask[row, col] == erase:
             return
         mask[row, col] = erase
-        self._refresh_ascii_preview()
+        # ストローク中は変更セルを溜めてアイドル時にまとめて描き直す
+        self._erase_dirty_cells.add((row, col))
+        if self._erase_flush_id is None:
+            self._erase_flush_id = self.root.after_idle(self._flush_erase_redraw)
+
+    def _flush_erase_redraw(self):
+        self._erase_flush_id = None
+        dirty = self._erase_dirty_cells
+        self._erase_dirty_cells = set()
+        self._commit_edit_mask()
+        if not dirty:
+            return
+        if not self._redraw_dirty_ascii_rows({row for row, _ in dirty}):
+            self._refresh_ascii_preview()
+
+    def _redraw_dirty_ascii_rows(self, rows: set[int]) -> bool:
+        base_img = self._ascii_base_img
+        display_img = self._ascii_display_img
+        shown = self._ascii_shown_lines
+        if base_img is None or display_img is None or shown is None:
+            return False
+        if self._ascii_shown_index != self.frame_index or getattr(self, "_ascii_tk", None) is None:
+            return False
+        base_frame = self._ascii_shown_frame
+        if base_frame is None or base_frame.shape[0] != len(shown):
+            return False
+        lines = self._apply_erase_mask_to_lines(base_frame.lines, self.frame_index)
+        changed = {r for r in rows if 0 <= r < len(lines) and lines[r] != shown[r]}
+        if not changed:
+            return True
+        span = redraw_ascii_rows(
+            base_img, lines, changed, font=self._font, pad=self._ascii_pad,
+            colors=base_frame.colors,
+        )
+        self._ascii_shown_lines = list(lines)
+        if span is None:
+            return True
+        if display_img is not base_img:
+            # 変更した帯だけを表示サイズへ縮小して貼り戻す。縮小のBICUBICは表示の上下2行先まで
+            # 元の画素を混ぜるので、その分 (と丸めの1行) 広げないと帯の外に古い画素が残る。
+            # 帯の中は全体の縮小と係数の丸めで1階調ずれることがある
+            scale_y = display_img.height / max(1, base_img.height)
+            reach = 1 if scale_y >= 1.0 else 3
+            y0 = max(0, int(math.floor(span[0] * scale_y)) - reach)
+            y1 = min(display_img.height, int(math.ceil(span[1] * scale_y)) + reach)
+            if y1 <= y0:
+                return True
+            resample = Image.NEAREST if scale_y >= 1.0 else Image.BICUBIC
+            band = base_img.resize(
+                (display_img.width, y1 - y0),
+                resample=resample,
+                box=(0, y0 / scale_y, base_img.width, y1 / scale_y),
+            )
+            display_img.paste(band, (0, y0))
+        else:
+            y0 = span[0]
+            band = base_img.crop((0, span[0], base_img.width, span[1]))
+        # PhotoImage.paste は画像全体を転送し直すので、帯だけのPhotoImageを作ってTk側で写す
+        band_tk = ImageTk.PhotoImage(band)
+        self.ascii_label.tk.call(str(self._ascii_tk), "copy", str(band_tk), "-to", 0, y0)
+        return True
 
     def _on_ascii_erase(self, event):
         self._apply_erase_event(event, True)
@@ -862,71 +1322,247 @@ class App:
 
     def ask_open(self):
         p = filedialog.askopenfilename(
-            title="Open video",
-            filetypes=[("Video files", "*.mp4 *.mov *.mkv *.avi *.webm"), ("All files", "*.*")]
+            title="Open video or project",
+            filetypes=[
+                ("Video files", "*.mp4 *.mov *.mkv *.avi *.webm *.y4m"),
+                ("ASScii project", f"*{PROJECT_SUFFIX}"),
+                ("Image sequence (any frame)", " ".join(f"*{s}" for s in IMAGE_SUFFIXES)),
+                ("All files", "*.*"),
+            ]
         )
-        if p:
+        if not p:
+            return
+        if is_project_file(Path(p)):
+            self.open_project(Path(p))
+        elif Path(p).suffix.lower() in IMAGE_SUFFIXES:
+            # 1枚選ぶと同じフォルダの画像を連番として開く
+            self.open_video(Path(p).parent)
+        else:
             self.open_video(Path(p))
 
+    def ask_save_project(self):
+        if self.video_path is None:
+            messagebox.showinfo("Project", "Open a video first.")
+            return
+        initial = self.project_path.name if self.project_path else f"{self.video_path.stem}{PROJECT_SUFFIX}"
+        out = filedialog.asksaveasfilename(
+            title="Save project",
+            defaultextension=PROJECT_SUFFIX,
+            initialfile=initial,
+            filetypes=[("ASScii project", f"*{PROJECT_SUFFIX}")]
+        )
+        if not out:
+            return
+        try:
+            self._sync_params()
+            self._commit_edit_mask()
+            project = Project(
+                video_path=self.video_path,
+                params=self._clone_params(),
+                masks=self.erase_masks,
+                font={
+                    "size": int(self.fontsize),
+                    "name": self._font_display_name,
+                    "lock_aspect": bool(self.lock_aspect_var.get()),
+                },
+                export=dict(self.export_settings),
+            )
+            save_project(Path(out), project)
+            self.project_path = Path(out)
+            self.info_var.set(f"Saved project: {self.project_path.name}")
+        except Exception as exc:
+            messagebox.showerror("Project", str(exc))
+
+    def open_project(self, path: Path):
+        try:
+            project = load_project(path)
+        except Exception as exc:
+            messagebox.showerror("Project", str(exc))
+            return
+        if project.video_path is None or not project.video_path.exists():
+            messagebox.showerror("Project", f"Video not found:\n{project.video_path}")
+            return
+        self.open_video(project.video_path)
+        if self.source is None or self.video_path is None:
+            return
+
+        params = project.params
+        # 変数をまとめて書き換え、パラメータの同期は最後に1回だけ行う
+        self._params_sync_suspended = True
+        self._rows_updating = True
+        try:
+            self.lock_aspect_var.set(False)
+            font_size = project.font.get("size")
+            if font_size:
+                self.fontsize_var.set(str(int(font_size)))
+            self.cols_var.set(params.cols)
+            self.rows_var.set(params.rows)
+            self.fps_var.set(int(round(params.fps)))
+            self.gamma_var.set(params.gamma)
+            self.contrast_var.set(params.contrast)
+            self.brightness_var.set(params.brightness)
+            self.invert_var.set(params.invert)
+            self.binarize_var.set(params.binarize)
+            self.binarize_threshold_var.set(params.binarize_threshold)
+            self.binarize_mode_var.set(params.binarize_custom_mode)
+            self.charset_var.set(params.charset_name)
+            self.custom_charset_var.set(params.custom_charset)
+            self.color_var.set(params.color_mode == "color")
+            self.color_levels_var.set(str(params.color_levels))
+            self.hysteresis_var.set(int(params.hysteresis))
+            self.dither_var.set(params.dither if params.dither in DITHER_MODES else "none")
+            self.match_var.set(params.match_mode if params.match_mode in MATCH_MODES else "tone")
+            self.ramp_var.set(params.ramp if params.ramp in RAMP_MODES else "charset")
+            self.edges_var.set(bool(params.edges))
+            self.edge_threshold_var.set(int(params.edge_threshold))
+            self.lock_aspect_var.set(bool(project.font.get("lock_aspect", True)))
+        finally:
+            self._rows_updating = False
+            self._params_sync_suspended = False
+        self._sync_params()
+
+        self._reset_all_masks()
+        if project.masks.shape == (self.params.rows, self.params.cols):
+            self.erase_masks = project.masks
+        self.export_settings = dict(project.export)
+        self.project_path = Path(path)
+        self.info_var.set(f"Loaded project: {self.project_path.name}  |  {self.video_path.name}")
+        self._refresh_ascii_preview()
+
     def open_video(self, path: Path):
         self._stop_preload_worker()
-        if self.cap is not None:
-            self.cap.release()
-            self.cap = None
+        self._stop_timeline_worker()
+        self._cancel_scrub()
+        if self.source is not None:
+            self.source.close()
+            self.source = None
 
         self._clear_ascii_cache()
         self._reset_all_masks()
+        self.stabilizer.reset()
+        self.stabilizer.reset_metrics()
         self._last_frame_bgr = None
         self._last_frame_index = None
+        self._ascii_shown_index = None
 
-        self.cap = cv2.VideoCapture(str(path))
-        if not self.cap.isOpened():
+        try:
+            self.source = open_source(path)
+        except (OSError, RuntimeError, ValueError):
             messagebox.showerror("Error", "Could not open video. Try converting it to H.264 MP4.")
             return
 
         self.video_path = path
-        self.video_fps = float(self.cap.get(cv2.CAP_PROP_FPS) or 30.0)
-        self.video_w = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 1280)
-        self.video_h = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 720)
-        self.video_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        self._open_disk_cache()
+        self.video_fps = float(self.source.fps or 30.0)
+        self.video_w = int(self.source.width or 1280)
+        self.video_h = int(self.source.height or 720)
+        self.video_frames = int(self.source.frame_count or 0)
         if self.video_frames < 0:
             self.video_frames = 0
         self._set_frame_index(0)
         self.paused = True
-        self.erase_masks.clear()
         self._update_frame_controls()
 
         frames_text = f" | {self.video_frames} frames" if self.video_frames else ""
         self.info_var.set(f"Loaded: {path.name}  |  {self.video_w}x{self.video_h} @ {self.video_fps:.2f}fps{frames_text}")
         self._apply_aspect_lock()
         self._start_preload_worker()
+        self._start_index_worker()
+        self._start_timeline_worker()
         self._seek_to_frame(0, pause=False)
 
+    def _start_index_worker(self):
+        """保存済みの索引が無い動画は、裏でパケットを走査して索引を作る."""
+        source = self.source
+        self._index_building = False
+        if not isinstance(source, VideoFileSource) or source.frame_index is not None:
+            return
+        path = source.path
+        self._index_building = True
+
+        def work():
+            self._built_index = (path, build_index(path))
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def _attach_built_index(self):
+        built, self._built_index = self._built_index, None
+        if built is None:
+            return
+        path, index = built
+        source = self.source
+        if not isinstance(source, VideoFileSource) or source.path != path:
+            return
+        self._index_building = False
+        if index is not None:
+            source.attach_index(index)
+            self.video_frames = int(source.frame_count or self.video_frames)
+            self._update_frame_controls()
+            # 先読み用のリーダーも索引付きで開き直す
+            self._start_preload_worker()
+        self._start_timeline_worker()
+
+    def _start_timeline_worker(self):
+        """スクラブ用のサムネイル列を裏で作る。索引を作っている間は、できてから始める."""
+        self._stop_timeline_worker()
+        if self._index_building or self.source is None or self.video_frames <= 0:
+            return
+        reader = self.source.reopen()
+        if reader is None:
+            return
+        strip = TimelineStrip(self.video_frames)
+        stop = threading.Event()
+        self.timeline = strip
+        self._timeline_stop = stop
+
+        def work():
+            try:
+                strip.fill(reader, stop)
+            finally:
+                reader.close()
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def _stop_timeline_worker(self):
+        if self._timeline_stop is not None:
+            self._timeline_stop.set()
+        self._timeline_stop = None
+        self.timeline = None
+
     def toggle_pause(self, event=None):
         self.paused = not self.paused
 
     def rewind(self):
-        if self.cap is None:
+        if self.source is None:
             return
         self._seek_to_frame(0)
 
-    def _read_next_frame(self):
-        if self.cap is None:
+    def _read_next_frame(self, step: int = 1):
+        if self.source is None:
             return None
-        ok, frame = self.cap.read()
-        if not ok:
+        watch = Stopwatch(self.perf)
+        if step > 1:
+            # 間引いて表示する間は、飛ばすフレームをデコーダ側で読み捨てる
+            target = self.frame_index + step
+            if self.video_frames > 0 and target >= self.video_frames:
+                target = 0
+            frame = self.source.read() if self.source.seek(target) else None
+        else:
+            frame = self.source.read()
+        if frame is None:
             # loop
-            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-            ok, frame = self.cap.read()
-            if not ok:
+            if not self.source.seek(0):
                 return None
-        pos = int(self.cap.get(cv2.CAP_PROP_POS_FRAMES) or 1) - 1
-        if pos < 0:
-            pos = 0
-        self._set_frame_index(pos)
-        return frame
+            frame = self.source.read()
+            if frame is None:
+                return None
+        watch.lap("decode")
+        self._set_frame_index(frame.index)
+        return frame.bgr
 
-    def _update_previews(self, frame_bgr: np.ndarray):
+    def _update_previews(self, frame_bgr: np.ndarray, preview_params: AsciiParams | None = None):
+        frame_watch = Stopwatch(self.perf)
+        watch = Stopwatch(self.perf)
         # Original preview: resize to fit label area (approx)
         frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
         orig = Image.fromarray(frame_rgb)
@@ -938,11 +1574,15 @@ class App:
 
         self._orig_tk = ImageTk.PhotoImage(orig)
         self.orig_label.configure(image=self._orig_tk)
+        watch.lap("orig_preview")
 
         # ASCII preview
         ascii_w, ascii_h = self._get_preview_target_size(self.ascii_label)
-        self._render_ascii_frame(frame_bgr, self.frame_index, ascii_w, ascii_h)
-        self._schedule_prefetch(self.frame_index)
+        self._render_ascii_frame(frame_bgr, self.frame_index, ascii_w, ascii_h, preview_params)
+        if preview_params is None:
+            # 画質を落としている間は等倍の先読みが使われないので止めておく
+            self._schedule_prefetch(self.frame_index)
+        frame_watch.lap("frame_total")
 
     def ask_export(self):
         if self.video_path is None:
@@ -951,17 +1591,20 @@ class App:
 
         dlg = ctk.CTkToplevel(self.root)
         dlg.title("Export ASS (frame-by-frame)")
-        dlg.geometry("560x420")
-
-        start_frames_var = tk.IntVar(value=0)
-        frame_count_var = tk.IntVar(value=max(int(self.params.fps * 5), 1))
-        x_var = tk.IntVar(value=0)
-        y_var = tk.IntVar(value=0)
-        fontsize_var = tk.StringVar(value="auto")
-        playx_var = tk.IntVar(value=int(self.video_w) if self.video_w else 1920)
-        playy_var = tk.IntVar(value=int(self.video_h) if self.video_h else 1080)
-        fontname_var = tk.StringVar(value=getattr(self, "_font_display_name", "Lucida Console"))
-        mode_var = tk.StringVar(value="range")
+        dlg.geometry("560x500")
+
+        saved = self.export_settings
+        start_frames_var = tk.IntVar(value=int(saved.get("start_frame", 0)))
+        frame_count_var = tk.IntVar(value=int(saved.get("frame_count", max(int(self.params.fps * 5), 1))))
+        x_var = tk.IntVar(value=int(saved.get("x", 0)))
+        y_var = tk.IntVar(value=int(saved.get("y", 0)))
+        fontsize_var = tk.StringVar(value=str(saved.get("fontsize", "auto")))
+        playx_var = tk.IntVar(value=int(saved.get("play_res_x", int(self.video_w) if self.video_w else 1920)))
+        playy_var = tk.IntVar(value=int(saved.get("play_res_y", int(self.video_h) if self.video_h else 1080)))
+        fontname_var = tk.StringVar(value=saved.get("fontname", getattr(self, "_font_display_name", "Lucida Console")))
+        mode_var = tk.StringVar(value=saved.get("mode", "range"))
+        compact_var = tk.BooleanVar(value=bool(saved.get("compact", False)))
+        skip_var = tk.BooleanVar(value=bool(saved.get("skip_unchanged", False)))
 
         frm = ctk.CTkFrame(dlg, corner_radius=12)
         frm.pack(fill="both", expand=True, padx=12, pady=12)
@@ -1003,6 +1646,11 @@ class App:
 
         update_range_state()
 
+        ctk.CTkSwitch(frm, text="Compact blanks", variable=compact_var).grid(row=9, column=1, sticky="w", pady=(8, 0))
+        ctk.CTkLabel(frm, text="trim row ends").grid(row=9, column=2, sticky="w", padx=8, pady=(8, 0))
+        ctk.CTkSwitch(frm, text="Skip unchanged", variable=skip_var).grid(row=10, column=1, sticky="w", pady=(8, 0))
+        ctk.CTkLabel(frm, text="reuse static frames").grid(row=10, column=2, sticky="w", padx=8, pady=(8, 0))
+
         def do_export():
             out = filedialog.asksaveasfilename(
                 title="Save .ass",
@@ -1035,15 +1683,8 @@ class App:
                         raise ValueError("Frame count must be positive.")
                     dur_sec = frame_count / max(self.params.fps, 1e-6)
 
-                expected_shape = (self.params.rows, self.params.cols)
-
-                def mask_lookup(idx: int) -> np.ndarray | None:
-                    if idx is None:
-                        return None
-                    mask = self.erase_masks.get(int(idx))
-                    if mask is None or mask.shape != expected_shape:
-                        return None
-                    return mask
+                self._commit_edit_mask()
+                mask_lookup = self.erase_masks.get if self.erase_masks else None
 
                 grid_pixel_w, grid_pixel_h = self._get_ascii_grid_pixel_size()
                 grid_pixel_w = max(1, grid_pixel_w)
@@ -1119,25 +1760,57 @@ class App:
                     play_res_x=script_play_res_x,
                     play_res_y=script_play_res_y,
                     mask_lookup=mask_lookup,
+                    cache=self.conversion_cache,
+                    compact=bool(compact_var.get()),
+                    skip_unchanged=bool(skip_var.get()),
                 )
+                # ダイアログの入力と、ヘッドレス書き出しで再現するための確定値を保存する
+                self.export_settings = {
+                    "mode": mode,
+                    "start_frame": int(start_frames_var.get()),
+                    "frame_count": int(frame_count_var.get()),
+                    "x": int(x_var.get()),
+                    "y": int(y_var.get()),
+                    "fontsize": fontsize_value_raw or "auto",
+                    "play_res_x": user_play_res_x,
+                    "play_res_y": user_play_res_y,
+                    "fontname": str(fontname_var.get()),
+                    "compact": bool(compact_var.get()),
+                    "skip_unchanged": bool(skip_var.get()),
+                    "resolved": {
+                        "start_sec": start_sec,
+                        "dur_sec": dur_sec,
+                        "pos_x": pos_x_script,
+                        "pos_y": pos_y_script,
+                        "fontname": str(fontname_var.get()),
+                        "fontsize": script_fontsize,
+                        "play_res_x": script_play_res_x,
+                        "play_res_y": script_play_res_y,
+                        "compact": bool(compact_var.get()),
+                        "skip_unchanged": bool(skip_var.get()),
+                    },
+                }
                 messagebox.showinfo("Export", f"Saved:\n{out}\n\nTip: run through Aegisub → YTSubConverter → YouTube.")
                 dlg.destroy()
             except Exception as e:
                 messagebox.showerror("Export error", str(e))
 
-        ctk.CTkButton(frm, text="Export", command=do_export).grid(row=9, column=0, pady=12)
-        ctk.CTkButton(frm, text="Cancel", command=dlg.destroy).grid(row=9, column=1, pady=12, sticky="w")
+        ctk.CTkButton(frm, text="Export", command=do_export).grid(row=11, column=0, pady=12)
+        ctk.CTkButton(frm, text="Cancel", command=dlg.destroy).grid(row=11, column=1, pady=12, sticky="w")
 
     def ask_export_text(self):
         if self._last_frame_bgr is None:
             messagebox.showinfo("Export", "Render a frame first.")
             return
         self._sync_params()
-        lines = self._ensure_ascii_lines(self.frame_index, self._last_frame_bgr)
-        if lines is None:
+        # 安定化を掛けている場合は表示中のフレームをそのまま書き出す
+        frame = self._ascii_shown_frame if self._ascii_shown_index == self.frame_index else None
+        if frame is None:
+            frame = self._ensure_ascii_frame(self.frame_index, self._last_frame_bgr)
+        if frame is None:
             messagebox.showerror("Export", "Could not convert current frame to ASCII.")
             return
-        lines = self._apply_erase_mask_to_lines(lines, self.frame_index)
+        lines = self._apply_erase_mask_to_lines(frame.lines, self.frame_index)
         out = filedialog.asksaveasfilename(
             title="Save ASCII text",
             defaultextension=".txt",
@@ -1152,6 +1825,64 @@ class App:
         except Exception as exc:
             messagebox.showerror("Export error", str(exc))
 
+    def toggle_perf_hud(self):
+        self._perf_hud_visible = not self._perf_hud_visible
+        if self._perf_hud_visible:
+            self._perf_hud.place(x=8, y=8)
+            self._perf_hud.lift()
+            self._update_perf_hud(force=True)
+        else:
+            self._perf_hud.place_forget()
+
+    def _update_perf_hud(self, force: bool = False):
+        if not self._perf_hud_visible:
+            return
+        now = time.time()
+        if not force and now - self._perf_hud_tick < 0.5:
+            return
+        self._perf_hud_tick = now
+        lines = self.perf.format_lines()
+        if self.governor.enabled and self.governor.load is not None:
+            lines.append(f"preview load: {self.governor.load:.2f} (level {self.governor.level})")
+        if self.stabilizer.band > 0 and self.stabilizer.frames:
+            churn = self.stabilizer.summary()
+            lines.append(
+                f"changed cells: {churn['raw_changed_ratio']:.1%} -> {churn['changed_ratio']:.1%}"
+            )
+        self._perf_hud.configure(text="\n".join(lines))
+
+    def ask_export_perf_csv(self):
+        out = filedialog.asksaveasfilename(
+            title="Save performance CSV",
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("All files", "*.*")]
+        )
+        if not out:
+            return
+        try:
+            self.perf.to_csv(out)
+            messagebox.showinfo("Performance", f"Saved:\n{out}")
+        except Exception as exc:
+            messagebox.showerror("Performance", str(exc))
+
+    def _on_adaptive_preview_toggle(self):
+        self.governor.enabled = bool(self.adaptive_preview_var.get())
+        self._reset_preview_quality()
+
+    def _on_skip_static_toggle(self):
+        self._skip_static = bool(self.skip_static_var.get())
+        # 使い回したフレームはキャッシュに無いので、比べる相手を捨てて描き直すだけでよい
+        self.change_detector.reset()
+        self._refresh_ascii_preview()
+
+    def _reset_preview_quality(self):
+        """プレビューを等倍に戻し、落とした画質で表示中なら描き直す."""
+        self.governor.reset()
+        self.preview_quality_var.set(self.governor.describe(self.params))
+        # スクラブ中はサムネイルを上書きしない (シーク後の描画で戻る)
+        if self._ascii_preview_degraded and self._scrub_target is None:
+            self._refresh_ascii_preview()
+
     def _loop(self):
         # target tick
         target_dt = 1.0 / max(self.params.fps, 0.1)
@@ -1159,12 +1890,20 @@ class App:
         now = time.time()
         elapsed = now - self.last_tick
 
-        if not self.paused and elapsed >= target_dt:
+        if self.paused and (self.governor.degraded or self._ascii_preview_degraded):
+            self._reset_preview_quality()
+        elif not self.paused and elapsed >= target_dt * self.governor.frame_step:
             self.last_tick = now
-            frame = self._read_next_frame()
+            t0 = time.perf_counter()
+            frame = self._read_next_frame(self.governor.frame_step)
             if frame is not None:
-                self._update_previews(frame)
+                self._update_previews(frame, self.governor.preview_params(self.params))
+                if self.governor.record(time.perf_counter() - t0, target_dt):
+                    self.preview_quality_var.set(self.governor.describe(self.params))
 
+        if self._built_index is not None:
+            self._attach_built_index()
+        self._update_perf_hud()
         self.root.after(10, self._loop)
 
 
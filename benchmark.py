@@ -0,0 +1,1059 @@
+"""合成動画を使った変換・描画・ASS書き出しのベンチマーク.
+
+使い方::
+
+    python benchmark.py --output bench.json
+    python benchmark.py --quick --filter frame_to_ascii
+    python benchmark.py --compare old.json new.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from dataclasses import asdict, replace
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from ascii_core import (
+    COLOR_MODES,
+    DITHER_MODES,
+    MATCH_MODES,
+    RAMP_MODES,
+    AsciiParams,
+    ChangeDetector,
+    TemporalStabilizer,
+    apply_mask_to_ascii_lines,
+    convert_frame,
+    frame_to_ascii,
+)
+from ascii_render import load_font, render_ascii_image
+from ass_exporter import (
+    ExportTarget,
+    escape_ass_text,
+    export_ass,
+    export_ass_targets,
+    lines_to_ass_text,
+    region_target,
+)
+from frame_index import FrameIndex
+from frame_source import ArraySource, open_source
+from frame_stream import iter_ascii_frames, write_jsonl_frames, write_text_frames
+from mask_store import MaskStore
+from preview_governor import LEVELS, PreviewGovernor
+from terminal_player import TerminalRenderer
+from timeline_strip import TimelineStrip
+from video_render import LAYOUTS as VIDEO_LAYOUTS, render_video
+
+
+CLIP_SIZE = (640, 360)
+CLIP_FPS = 24.0
+CLIP_FRAMES = 48
+
+GRID_SIZES = [(60, 27), (100, 45), (200, 90)]
+CHARSET_CASES = ["Blocks (5)", "Classic (10)", "Dense (16)"]
+MODE_CASES = {
+    "gradient": {},
+    "no-invert": {"invert": False},
+    "binarize": {"binarize": True, "binarize_threshold": 110},
+    "pattern": {
+        "binarize": True,
+        "binarize_threshold": 110,
+        "charset_name": "Custom",
+        "custom_charset": "ASSCII",
+        "binarize_custom_mode": "pattern",
+    },
+}
+
+# 形状マッチで目標にするプレビュー更新レート
+INTERACTIVE_FPS = 30.0
+
+# ディザなしに対して許容する書き出し(変換+ASSエンコード)の処理時間の倍率
+DITHER_BUDGET = {"bayer": 1.25, "blue_noise": 1.25, "error_diffusion": 1.6}
+
+
+# ---------- synthetic clips ----------
+
+def _clip_gradient(i: int, w: int, h: int, rng: np.random.Generator) -> np.ndarray:
+    x = np.linspace(0, 255, w, dtype=np.float32)
+    y = np.linspace(0, 255, h, dtype=np.float32)[:, None]
+    base = (x[None, :] * 0.6 + y * 0.4 + i * 6.0) % 256.0
+    frame = np.repeat(base.astype(np.uint8)[:, :, None], 3, axis=2)
+    cv2.circle(frame, ((i * 11) % w, h // 2), h // 5, (255, 255, 255), -1)
+    return frame
+
+
+def _clip_noise(i: int, w: int, h: int, rng: np.random.Generator) -> np.ndarray:
+    return rng.integers(0, 256, size=(h, w, 3), dtype=np.uint8)
+
+
+def _clip_static(i: int, w: int, h: int, rng: np.random.Generator) -> np.ndarray:
+    return _clip_gradient(0, w, h, rng)
+
+
+def _clip_scene_cuts(i: int, w: int, h: int, rng: np.random.Generator) -> np.ndarray:
+    scene = i // 8
+    if scene % 3 == 0:
+        return _clip_gradient(i, w, h, rng)
+    if scene % 3 == 1:
+        frame = np.full((h, w, 3), 40 + scene * 20 % 200, dtype=np.uint8)
+        cv2.rectangle(frame, (w // 4, h // 4), (w * 3 // 4, h * 3 // 4), (230, 230, 230), 3)
+        cv2.line(frame, (0, 0), (w - 1, h - 1), (255, 255, 255), 2)
+        return frame
+    return _clip_noise(i, w, h, rng)
+
+
+def _clip_color(i: int, w: int, h: int, rng: np.random.Generator) -> np.ndarray:
+    # 色相が横方向に流れ、縦方向で彩度が変わるカラーバー
+    hue = ((np.arange(w, dtype=np.float32) / w * 180.0 + i * 4.0) % 180.0).astype(np.uint8)
+    sat = np.linspace(60, 255, h, dtype=np.float32).astype(np.uint8)
+    hsv = np.empty((h, w, 3), dtype=np.uint8)
+    hsv[..., 0] = hue[None, :]
+    hsv[..., 1] = sat[:, None]
+    hsv[..., 2] = 220
+    frame = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+    cv2.circle(frame, ((i * 11) % w, h // 2), h // 5, (255, 255, 255), -1)
+    return frame
+
+
+CLIP_GENERATORS: dict[str, Callable[[int, int, int, np.random.Generator], np.ndarray]] = {
+    "gradient": _clip_gradient,
+    "noise": _clip_noise,
+    "static": _clip_static,
+    "scene_cuts": _clip_scene_cuts,
+    "color": _clip_color,
+}
+
+
+def write_clip(path: Path, kind: str, frames: int = CLIP_FRAMES,
+               size: tuple[int, int] = CLIP_SIZE, fps: float = CLIP_FPS, fourcc: str = "MJPG") -> Path:
+    """決定的な合成クリップを書き出す (既定は全フレームがキーフレームのMJPEG)."""
+    gen = CLIP_GENERATORS[kind]
+    rng = np.random.default_rng(1234)
+    w, h = size
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*fourcc), fps, (w, h))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open VideoWriter for {path}")
+    try:
+        for i in range(frames):
+            writer.write(gen(i, w, h, rng))
+    finally:
+        writer.release()
+    return path
+
+
+def read_frames(path: Path) -> list[np.ndarray]:
+    cap = cv2.VideoCapture(str(path))
+    frames: list[np.ndarray] = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def write_y4m(path: Path, frames: list[np.ndarray], fps: float = CLIP_FPS) -> Path:
+    """BGRフレームを4:2:0のY4Mとして書き出す (パイプ入力の代わり)."""
+    h, w = frames[0].shape[:2]
+    with open(path, "wb") as f:
+        f.write(f"YUV4MPEG2 W{w} H{h} F{int(round(fps * 1000))}:1000 Ip A1:1 C420jpeg\n".encode("ascii"))
+        for frame in frames:
+            f.write(b"FRAME\n")
+            f.write(cv2.cvtColor(frame, cv2.COLOR_BGR2YUV_I420).tobytes())
+    return path
+
+
+def read_gray_frames(path: Path) -> list[np.ndarray]:
+    return [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in read_frames(path)]
+
+
+def make_mask_store(params: AsciiParams, frames: int) -> MaskStore:
+    """左上1/4を消す区間マスクと、フレームごとに動く帯マスクを混ぜる."""
+    store = MaskStore((params.rows, params.cols))
+    block = np.zeros((params.rows, params.cols), dtype=bool)
+    block[: params.rows // 2, : params.cols // 2] = True
+    store.set_range(0, frames // 2, block)
+    for i in range(frames // 2, frames):
+        band = np.zeros_like(block)
+        band[:, (i * 3) % params.cols] = True
+        store.set(i, band)
+    return store
+
+
+# ---------- measurement ----------
+
+class Context:
+    def __init__(self, workdir: Path, quick: bool, repeat: int):
+        self.workdir = workdir
+        self.quick = quick
+        self.repeat = repeat
+        self.clips: dict[str, Path] = {}
+        self._gray: dict[str, list[np.ndarray]] = {}
+        self._bgr: dict[str, list[np.ndarray]] = {}
+        self._font = None
+
+    def clip(self, kind: str) -> Path:
+        path = self.clips.get(kind)
+        if path is None:
+            frames = CLIP_FRAMES // 2 if self.quick else CLIP_FRAMES
+            path = write_clip(self.workdir / f"{kind}.avi", kind, frames=frames)
+            self.clips[kind] = path
+        return path
+
+    def gray_frames(self, kind: str) -> list[np.ndarray]:
+        frames = self._gray.get(kind)
+        if frames is None:
+            frames = read_gray_frames(self.clip(kind))
+            self._gray[kind] = frames
+        return frames
+
+    def bgr_frames(self, kind: str) -> list[np.ndarray]:
+        frames = self._bgr.get(kind)
+        if frames is None:
+            frames = read_frames(self.clip(kind))
+            self._bgr[kind] = frames
+        return frames
+
+    @property
+    def font(self):
+        if self._font is None:
+            self._font = load_font()
+        return self._font
+
+    def grid_sizes(self) -> list[tuple[int, int]]:
+        return GRID_SIZES[:2] if self.quick else GRID_SIZES
+
+
+def measure(run: Callable[[], int], repeat: int) -> dict[str, float]:
+    """run() は処理したフレーム数を返す。最良時間からfps、別実行でピークメモリを測る."""
+    run()  # warm-up
+    best = float("inf")
+    frames = 0
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        frames = run()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    frames = max(1, frames)
+    return {
+        "frames": frames,
+        "seconds": best,
+        "fps": frames / best if best > 0 else float("inf"),
+        "ms_per_frame": best * 1000.0 / frames,
+        "peak_kib": peak / 1024.0,
+    }
+
+
+BENCHMARKS: dict[str, Callable[[Context], Iterator[dict]]] = {}
+
+
+def benchmark(name: str):
+    def register(fn: Callable[[Context], Iterator[dict]]):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def _params_for(cols: int, rows: int, charset: str, mode: str) -> AsciiParams:
+    params = AsciiParams(cols=cols, rows=rows, charset_name=charset)
+    return replace(params, **MODE_CASES[mode])
+
+
+@benchmark("frame_to_ascii")
+def bench_frame_to_ascii(ctx: Context) -> Iterator[dict]:
+    frames = ctx.gray_frames("gradient")
+    for cols, rows in ctx.grid_sizes():
+        for charset in CHARSET_CASES:
+            for mode in MODE_CASES:
+                if mode == "pattern" and charset != CHARSET_CASES[0]:
+                    continue  # pattern mode ignores the preset charset
+                params = _params_for(cols, rows, charset, mode)
+
+                def run(params=params):
+                    for gray in frames:
+                        frame_to_ascii(gray, params)
+                    return len(frames)
+
+                yield {"grid": f"{cols}x{rows}", "charset": params.charset_name, "mode": mode,
+                       **measure(run, ctx.repeat)}
+
+
+@benchmark("mask")
+def bench_mask(ctx: Context) -> Iterator[dict]:
+    frames = ctx.gray_frames("gradient")
+    for cols, rows in ctx.grid_sizes():
+        params = AsciiParams(cols=cols, rows=rows, charset_name="Classic (10)")
+        store = make_mask_store(params, len(frames))
+        converted = [frame_to_ascii(gray, params) for gray in frames]
+
+        def run(converted=converted, store=store):
+            for i, lines in enumerate(converted):
+                apply_mask_to_ascii_lines(lines, store.get(i))
+            return len(converted)
+
+        yield {"grid": f"{cols}x{rows}", "mask_bytes": store.nbytes(), **measure(run, ctx.repeat)}
+
+
+@benchmark("render_ascii_image")
+def bench_render(ctx: Context) -> Iterator[dict]:
+    frames = ctx.gray_frames("gradient")[:12]
+    for cols, rows in ctx.grid_sizes():
+        for charset in CHARSET_CASES:
+            params = AsciiParams(cols=cols, rows=rows, charset_name=charset)
+            converted = [frame_to_ascii(gray, params) for gray in frames]
+
+            def run(converted=converted):
+                for lines in converted:
+                    render_ascii_image(lines, font=ctx.font, pad=10)
+                return len(converted)
+
+            yield {"grid": f"{cols}x{rows}", "charset": charset, **measure(run, ctx.repeat)}
+
+
+@benchmark("escape_ass_text")
+def bench_escape(ctx: Context) -> Iterator[dict]:
+    frames = ctx.gray_frames("scene_cuts")
+    for cols, rows in ctx.grid_sizes():
+        params = AsciiParams(cols=cols, rows=rows, charset_name="Dense (16)")
+        converted = [frame_to_ascii(gray, params) for gray in frames]
+
+        def run(converted=converted):
+            for lines in converted:
+                lines_to_ass_text(lines)
+            return len(converted)
+
+        escaped = sum(len(escape_ass_text("\n".join(lines)).encode("utf-8")) for lines in converted)
+        yield {"grid": f"{cols}x{rows}", "bytes_per_frame": escaped / max(1, len(converted)),
+               **measure(run, ctx.repeat)}
+
+
+@benchmark("ass_color")
+def bench_ass_color(ctx: Context) -> Iterator[dict]:
+    """カラーモードのイベントサイズをモノクロと比べる (変換+エンコード)."""
+    for kind in ("color", "gradient", "noise"):
+        frames = ctx.bgr_frames(kind)
+        grays = ctx.gray_frames(kind)
+        for cols, rows in ctx.grid_sizes():
+            mono_bytes: float | None = None
+            for levels in (None, 2, 4, 6):
+                params = AsciiParams(cols=cols, rows=rows, charset_name="Classic (10)")
+                if levels is not None:
+                    params = replace(params, color_mode="color", color_levels=levels)
+                sizes: list[int] = []
+
+                def run(params=params, sizes=sizes):
+                    sizes.clear()
+                    for gray, bgr in zip(grays, frames):
+                        frame = convert_frame(gray, params, bgr=bgr)
+                        sizes.append(len(lines_to_ass_text(frame.lines, frame.colors).encode("utf-8")))
+                    return len(sizes)
+
+                result = measure(run, ctx.repeat)
+                bytes_per_frame = sum(sizes) / max(1, len(sizes))
+                if levels is None:
+                    mono_bytes = bytes_per_frame
+                yield {"clip": kind, "grid": f"{cols}x{rows}", "palette": f"{levels}^3" if levels else "mono",
+                       "bytes_per_frame": bytes_per_frame,
+                       "vs_mono": bytes_per_frame / mono_bytes if mono_bytes else 1.0, **result}
+
+
+@benchmark("compact")
+def bench_compact(ctx: Context) -> Iterator[dict]:
+    """空白を詰めたときのイベントサイズ (変換済みフレームのエンコードだけ).
+
+    消去マスク付きと、上下を黒帯にしたレターボックスの場合も比べる。
+    """
+    for kind in ("gradient", "scene_cuts"):
+        for cols, rows in ctx.grid_sizes():
+            for charset, invert in (("Blocks (5)", True), ("Blocks (5)", False), ("Classic (10)", True)):
+                for color_mode in ("mono", "color"):
+                    for variant in ("full", "masked", "letterbox"):
+                        params = AsciiParams(cols=cols, rows=rows, charset_name=charset, invert=invert,
+                                             color_mode=color_mode)
+                        frames = ctx.bgr_frames(kind)
+                        if variant == "letterbox":
+                            frames = [bgr.copy() for bgr in frames]
+                            for bgr in frames:
+                                bar = bgr.shape[0] // 8
+                                bgr[:bar] = 0
+                                bgr[-bar:] = 0
+                        store = make_mask_store(params, len(frames)) if variant == "masked" else None
+                        events = []
+                        for i, bgr in enumerate(frames):
+                            frame = convert_frame(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY), params, bgr=bgr)
+                            mask = store.get(i) if store is not None else None
+                            lines = apply_mask_to_ascii_lines(frame.lines, mask) if mask is not None else frame.lines
+                            events.append((lines, frame.colors))
+                        plain = sum(len(lines_to_ass_text(*event).encode("utf-8")) for event in events)
+
+                        def run(events=events):
+                            for lines, colors in events:
+                                lines_to_ass_text(lines, colors, compact=True)
+                            return len(events)
+
+                        result = measure(run, ctx.repeat)
+                        compact = sum(len(lines_to_ass_text(*event, compact=True).encode("utf-8")) for event in events)
+                        yield {"clip": kind, "grid": f"{cols}x{rows}", "charset": charset, "invert": invert,
+                               "color": color_mode, "variant": variant,
+                               "bytes_per_frame": compact / len(events), "plain_bytes_per_frame": plain / len(events),
+                               "compact_ratio": compact / plain if plain else 1.0, **result}
+
+
+@benchmark("roi")
+def bench_roi(ctx: Context) -> Iterator[dict]:
+    """画面中央の一部だけを全体と同じセル密度で変換したとき (``region_target``) の速度を全体と比べる."""
+    frames = ctx.bgr_frames("color")
+    grays = [cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY) for bgr in frames]
+    for cols, rows in ctx.grid_sizes():
+        for color_mode in COLOR_MODES:
+            base = ExportTarget(Path("roi.ass"), AsciiParams(cols=cols, rows=rows, color_mode=color_mode), 0.0, 0.0, 4)
+            full: float | None = None
+            for side in (1.0, 0.5, 0.25):
+                params = base.params
+                if side < 1.0:
+                    params = region_target(base, ((1.0 - side) / 2, (1.0 - side) / 2, side, side)).params
+
+                def run(params=params):
+                    for gray, bgr in zip(grays, frames):
+                        convert_frame(gray, params, bgr=bgr)
+                    return len(grays)
+
+                result = measure(run, ctx.repeat)
+                if full is None:
+                    full = result["ms_per_frame"]
+                yield {"grid": f"{cols}x{rows}", "color": color_mode, "region": f"{side:.0%}",
+                       "region_grid": f"{params.cols}x{params.rows}",
+                       "vs_full": result["ms_per_frame"] / full if full else 1.0, **result}
+
+
+@benchmark("governor")
+def bench_governor(ctx: Context) -> Iterator[dict]:
+    """プレビュー (変換+描画) の各画質段階の処理時間と、ガバナーが24fpsに落ち着く段階."""
+    frames = ctx.bgr_frames("gradient")[:12]
+    grays = [cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY) for bgr in frames]
+    target_fps = float(CLIP_FPS)
+    for cols, rows in ctx.grid_sizes():
+        params = AsciiParams(cols=cols, rows=rows, fps=target_fps, charset_name="Classic (10)")
+
+        def preview(gray, bgr, p):
+            frame = convert_frame(gray, p, bgr=bgr)
+            render_ascii_image(frame.lines, font=ctx.font, pad=10, colors=frame.colors)
+
+        full: float | None = None
+        for level, quality in enumerate(LEVELS):
+            governor = PreviewGovernor()
+            governor.level = level
+            p = governor.preview_params(params) or params
+
+            def run(p=p):
+                for gray, bgr in zip(grays, frames):
+                    preview(gray, bgr, p)
+                return len(grays)
+
+            result = measure(run, ctx.repeat)
+            if full is None:
+                full = result["ms_per_frame"]
+            # 間引く段階では1フレームに使える時間が段数倍になる
+            budget_ms = 1000.0 / target_fps * quality.frame_step
+            yield {"grid": f"{cols}x{rows}", "level": level, "preview": f"{p.cols}x{p.rows}",
+                   "frame_step": quality.frame_step, "vs_full": result["ms_per_frame"] / full if full else 1.0,
+                   "within_budget": result["ms_per_frame"] <= budget_ms, **result}
+
+        governor = PreviewGovernor()
+        for k in range(12 * 8):
+            t0 = time.perf_counter()
+            preview(grays[k % len(grays)], frames[k % len(frames)], governor.preview_params(params) or params)
+            governor.record(time.perf_counter() - t0, 1.0 / target_fps)
+        yield {"grid": f"{cols}x{rows}", "governed": True, "settled_level": governor.level,
+               "frame_step": governor.frame_step, "within_budget": (governor.load or 0.0) <= 1.0}
+
+
+@benchmark("shape_match")
+def bench_shape_match(ctx: Context) -> Iterator[dict]:
+    """形状マッチ (文字ビットマップとの行列積) の変換速度。100x45でプレビューに足りるかを見る."""
+    frames = ctx.gray_frames("scene_cuts")
+    for cols, rows in ctx.grid_sizes():
+        for charset in CHARSET_CASES:
+            for match in MATCH_MODES:
+                params = AsciiParams(cols=cols, rows=rows, charset_name=charset, match_mode=match)
+
+                def run(params=params):
+                    for gray in frames:
+                        frame_to_ascii(gray, params)
+                    return len(frames)
+
+                result = measure(run, ctx.repeat)
+                yield {"grid": f"{cols}x{rows}", "charset": charset, "match": match,
+                       "interactive": result["fps"] >= INTERACTIVE_FPS, **result}
+
+
+@benchmark("ramp")
+def bench_ramp(ctx: Context) -> Iterator[dict]:
+    """実測の濃度順ランプ。並べ替えは設定ごとに1度なので、フレームあたりの時間は並びのままと同じはず."""
+    frames = ctx.gray_frames("gradient")
+    for cols, rows in ctx.grid_sizes():
+        for charset in CHARSET_CASES:
+            baseline: float | None = None
+            for mode in RAMP_MODES:
+                params = AsciiParams(cols=cols, rows=rows, charset_name=charset, ramp=mode)
+                convert_frame(frames[0], params)  # 初回のラスタライズは計測に含めない
+
+                def run(params=params):
+                    for gray in frames:
+                        convert_frame(gray, params)
+                    return len(frames)
+
+                result = measure(run, ctx.repeat)
+                used = set(np.unique(np.stack([convert_frame(gray, params).indices for gray in frames])).tolist())
+                if baseline is None:
+                    baseline = result["ms_per_frame"]
+                yield {"grid": f"{cols}x{rows}", "charset": charset, "ramp": mode, "glyphs_used": len(used),
+                       "vs_charset": result["ms_per_frame"] / baseline if baseline else 1.0, **result}
+
+
+@benchmark("edges")
+def bench_edges(ctx: Context) -> Iterator[dict]:
+    """輪郭文字モードの追加コスト (構造テンソルの計測と置き換え) を、なしとの倍率で見る."""
+    frames = ctx.gray_frames("scene_cuts")
+    for cols, rows in ctx.grid_sizes():
+        for match in MATCH_MODES:
+            baseline: float | None = None
+            for edges in (False, True):
+                params = AsciiParams(cols=cols, rows=rows, charset_name="Classic (10)", match_mode=match, edges=edges)
+
+                def run(params=params):
+                    for gray in frames:
+                        convert_frame(gray, params)
+                    return len(frames)
+
+                result = measure(run, ctx.repeat)
+                if baseline is None:
+                    baseline = result["ms_per_frame"]
+                yield {"grid": f"{cols}x{rows}", "match": match, "edges": edges,
+                       "vs_off": result["ms_per_frame"] / baseline if baseline else 1.0, **result}
+
+
+@benchmark("frame_source")
+def bench_frame_source(ctx: Context) -> Iterator[dict]:
+    """各フレームソースの読み出し速度。輝度だけ読む場合の短縮を ``vs_full`` で見る."""
+    frames = ctx.bgr_frames("gradient")
+    y4m = write_y4m(ctx.workdir / "gradient.y4m", frames)
+    makers: dict[str, Callable[[], object]] = {
+        "video_file": lambda: open_source(ctx.clip("gradient")),
+        "y4m": lambda: open_source(y4m),
+        "array": lambda: ArraySource(frames),
+    }
+    for name, make in makers.items():
+        full: float | None = None
+        for luma_only in (False, True):
+
+            def run(make=make, luma_only=luma_only):
+                count = 0
+                with make() as source:
+                    while (frame := source.read(luma_only=luma_only)) is not None:
+                        frame.luma()
+                        count += 1
+                return count
+
+            result = measure(run, ctx.repeat)
+            if full is None:
+                full = result["ms_per_frame"]
+            yield {"source": name, "luma_only": luma_only,
+                   "vs_full": result["ms_per_frame"] / full if full else 1.0, **result}
+
+
+@benchmark("terminal")
+def bench_terminal(ctx: Context) -> Iterator[dict]:
+    """ターミナル描画の1フレームあたり出力量。毎フレーム全面描き直す場合との比を ``vs_redraw`` で見る."""
+    for kind in ("static", "gradient", "noise"):
+        frames = ctx.bgr_frames(kind)
+        for cols, rows in ctx.grid_sizes():
+            for color_mode in ("mono", "color"):
+                params = AsciiParams(cols=cols, rows=rows, color_mode=color_mode)
+                converted = [
+                    convert_frame(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY), params, bgr=bgr) for bgr in frames
+                ]
+                redraw: float | None = None
+                for diff in (False, True):
+                    totals = {"bytes": 0, "changed": 0}
+
+                    def run(converted=converted, diff=diff, totals=totals):
+                        renderer = TerminalRenderer()
+                        totals.update(bytes=0, changed=0)
+                        for frame in converted:
+                            if not diff:
+                                renderer.reset()
+                            totals["bytes"] += len(renderer.render(frame).encode("utf-8"))
+                            totals["changed"] += renderer.last_changed
+                        return len(converted)
+
+                    result = measure(run, ctx.repeat)
+                    per_frame = totals["bytes"] / len(converted)
+                    if redraw is None:
+                        redraw = per_frame
+                    yield {"clip": kind, "grid": f"{cols}x{rows}", "color": color_mode, "diff": diff,
+                           "bytes_per_frame": per_frame,
+                           "changed_ratio": totals["changed"] / len(converted) / (cols * rows),
+                           "vs_redraw": per_frame / redraw if redraw else 1.0, **result}
+
+
+@benchmark("frame_index")
+def bench_frame_index(ctx: Context) -> Iterator[dict]:
+    """長いGOPの動画で、フレーム索引の走査時間と、索引の有無によるシーク速度を比べる."""
+    frames = 120 if ctx.quick else 480
+    try:
+        clip = write_clip(ctx.workdir / "long_gop.mp4", "gradient", frames=frames, fourcc="mp4v")
+    except RuntimeError as exc:
+        yield {"error": str(exc)}
+        return
+    result = measure(lambda: len(FrameIndex.scan(clip)), ctx.repeat)
+    yield {"case": "scan", **result}
+
+    rng = np.random.default_rng(7)
+    patterns = {
+        "random": rng.integers(0, frames, 60).tolist(),
+        "stride_10": list(range(0, frames, 10)),
+        "scrub": np.clip(np.cumsum(rng.integers(-6, 14, 60)), 0, frames - 1).tolist(),
+    }
+    for name, targets in patterns.items():
+        plain: float | None = None
+        for indexed in (False, True):
+            source = open_source(clip, index=indexed)
+            missed = [0]
+
+            def run(source=source, targets=targets, missed=missed):
+                missed[0] = 0
+                for k in targets:
+                    frame = source.read() if source.seek(k) else None
+                    missed[0] += frame is None or frame.index != k
+                return len(targets)
+
+            result = measure(run, ctx.repeat)
+            source.close()
+            if plain is None:
+                plain = result["ms_per_frame"]
+            yield {"case": name, "indexed": indexed, "missed": missed[0],
+                   "vs_plain": result["ms_per_frame"] / plain if plain else 1.0, **result}
+
+
+@benchmark("timeline")
+def bench_timeline(ctx: Context) -> Iterator[dict]:
+    """スクラブ用サムネイル列の作成時間と、ドラッグ中の1位置あたりの表示準備をシークと比べる."""
+    frames = 120 if ctx.quick else 480
+    try:
+        clip = write_clip(ctx.workdir / "long_gop.mp4", "gradient", frames=frames, fourcc="mp4v")
+    except RuntimeError as exc:
+        yield {"error": str(exc)}
+        return
+    rng = np.random.default_rng(11)
+    drag = np.clip(np.cumsum(rng.integers(-6, 14, 60)), 0, frames - 1).tolist()
+    for indexed in (False, True):
+        strips: list[TimelineStrip] = []
+
+        def build(indexed=indexed):
+            with open_source(clip, index=indexed) as source:
+                strip = TimelineStrip(source.frame_count, max_thumbs=frames // 4)
+                strip.fill(source)
+            strips.append(strip)
+            return len(strip)
+
+        result = measure(build, ctx.repeat)
+        strip = strips[-1]
+        yield {"case": "build", "indexed": indexed, "thumbs": len(strip),
+               "thumb_bytes": strip.nbytes, **result}
+
+        for cols, rows in ctx.grid_sizes():
+            params = AsciiParams(cols=cols, rows=rows, charset_name="Classic (10)")
+            source = open_source(clip, index=indexed)
+
+            def seek(source=source, params=params):
+                for k in drag:
+                    frame = source.read() if source.seek(k) else None
+                    if frame is not None:
+                        convert_frame(frame.luma(), params)
+                return len(drag)
+
+            def scrub(strip=strip, params=params):
+                # 位置ごとに変換し直す場合 (同じサムネイルの使い回しは含めない)
+                for k in drag:
+                    strip.ascii_frame(k, replace(params, gamma=params.gamma + k * 1e-6))
+                return len(drag)
+
+            base = measure(seek, ctx.repeat)
+            source.close()
+            result = measure(scrub, ctx.repeat)
+            yield {"case": "drag", "indexed": indexed, "grid": f"{cols}x{rows}",
+                   "vs_seek": result["ms_per_frame"] / base["ms_per_frame"] if base["ms_per_frame"] else 1.0,
+                   **result}
+
+
+@benchmark("dither")
+def bench_dither(ctx: Context) -> Iterator[dict]:
+    """ディザ各モードの変換+エンコード時間を、ディザなしとの倍率で予算と比べる."""
+    frames = ctx.gray_frames("gradient")
+    for cols, rows in ctx.grid_sizes():
+        for charset in CHARSET_CASES[:2]:
+            baseline: float | None = None
+            for mode in DITHER_MODES:
+                params = AsciiParams(cols=cols, rows=rows, charset_name=charset, dither=mode)
+
+                def run(params=params):
+                    for gray in frames:
+                        lines_to_ass_text(frame_to_ascii(gray, params))
+                    return len(frames)
+
+                result = measure(run, ctx.repeat)
+                if baseline is None:
+                    baseline = result["ms_per_frame"]
+                row = {"grid": f"{cols}x{rows}", "charset": charset, "dither": mode, **result}
+                if mode in DITHER_BUDGET:
+                    slowdown = result["ms_per_frame"] / baseline if baseline else 1.0
+                    row.update(vs_none=slowdown, budget=DITHER_BUDGET[mode],
+                               within_budget=slowdown <= DITHER_BUDGET[mode])
+                yield row
+
+
+@benchmark("stabilizer")
+def bench_stabilizer(ctx: Context) -> Iterator[dict]:
+    """時間方向の安定化前後で、前フレームから文字が変わったセルの割合を比べる."""
+    for kind in ("noise", "gradient", "scene_cuts"):
+        grays = ctx.gray_frames(kind)
+        for cols, rows in ctx.grid_sizes():
+            params = AsciiParams(cols=cols, rows=rows, charset_name="Dense (16)")
+            converted = [convert_frame(gray, params) for gray in grays]
+            for band in (4, 8, 16, 32):
+                stabilizer = TemporalStabilizer(band)
+
+                def run(converted=converted, stabilizer=stabilizer):
+                    stabilizer.reset()
+                    stabilizer.reset_metrics()
+                    for i, frame in enumerate(converted):
+                        stabilizer.apply(frame, i)
+                    return len(converted)
+
+                result = measure(run, ctx.repeat)
+                yield {"clip": kind, "grid": f"{cols}x{rows}", "hysteresis": band,
+                       **stabilizer.summary(), **result}
+
+
+@benchmark("export_ass")
+def bench_export(ctx: Context) -> Iterator[dict]:
+    grids = ctx.grid_sizes()
+    for kind in CLIP_GENERATORS:
+        clip = ctx.clip(kind)
+        for cols, rows in grids:
+            for masked in (False, True):
+                params = AsciiParams(cols=cols, rows=rows, fps=CLIP_FPS, charset_name="Classic (10)")
+                out = ctx.workdir / f"{kind}_{cols}x{rows}.ass"
+                store = make_mask_store(params, CLIP_FRAMES) if masked else None
+
+                def run(params=params, out=out, store=store, clip=clip):
+                    export_ass(
+                        video_path=clip, out_path=out, params=params,
+                        start_sec=0.0, dur_sec=None, pos_x=192.0, pos_y=144.0,
+                        fontname="Courier New", fontsize=4, play_res_x=384, play_res_y=288,
+                        mask_lookup=store.get if store is not None else None,
+                    )
+                    return sum(1 for line in out.open(encoding="utf-8") if line.startswith("Dialogue:"))
+
+                result = measure(run, ctx.repeat)
+                yield {"clip": kind, "grid": f"{cols}x{rows}", "masked": masked,
+                       "file_bytes": out.stat().st_size, **result}
+
+
+@benchmark("multi_export")
+def bench_multi_export(ctx: Context) -> Iterator[dict]:
+    """複数グリッドを別々に書き出す場合と、1回のデコードから全部書き出す場合を比べる."""
+    clip = ctx.clip("gradient")
+    variants = [
+        AsciiParams(cols=cols, rows=rows, fps=CLIP_FPS, charset_name=charset)
+        for cols, rows in ctx.grid_sizes() for charset in CHARSET_CASES[:2]
+    ]
+    for count in range(1, len(variants) + 1):
+        targets = [
+            ExportTarget(ctx.workdir / f"variant_{k}.ass", params, 192.0, 144.0, 4)
+            for k, params in enumerate(variants[:count])
+        ]
+        common = dict(start_sec=0.0, dur_sec=None, fontname="Courier New", play_res_x=384, play_res_y=288)
+
+        def separate(targets=targets):
+            for t in targets:
+                export_ass(video_path=clip, out_path=t.out_path, params=t.params,
+                           pos_x=t.pos_x, pos_y=t.pos_y, fontsize=t.fontsize, **common)
+            return sum(1 for line in targets[0].out_path.open(encoding="utf-8") if line.startswith("Dialogue:"))
+
+        decoded = []
+
+        def shared(targets=targets):
+            summary = export_ass_targets(clip, targets, **common)
+            decoded.append(summary["decoded"])
+            return summary["frames"][0]
+
+        base = measure(separate, ctx.repeat)
+        result = measure(shared, ctx.repeat)
+        yield {"targets": count, "decoded": decoded[-1], "separate_ms_per_frame": base["ms_per_frame"],
+               "vs_separate": result["ms_per_frame"] / base["ms_per_frame"] if base["ms_per_frame"] else 1.0,
+               **result}
+
+
+@benchmark("stream")
+def bench_stream(ctx: Context) -> Iterator[dict]:
+    """``iter_ascii_frames`` からの逐次書き出しと、全フレームを溜めてから書く場合のピークメモリ比較."""
+    clip = ctx.clip("gradient")
+    writers = {"text": write_text_frames, "jsonl": write_jsonl_frames}
+    for cols, rows in ctx.grid_sizes():
+        for color in (False, True):
+            params = AsciiParams(cols=cols, rows=rows, fps=CLIP_FPS, charset_name="Classic (10)",
+                                 color_mode="color" if color else "mono")
+            for fmt, write in writers.items():
+                out = ctx.workdir / f"stream_{cols}x{rows}.{fmt}"
+                base: dict | None = None
+                for mode in ("list", "stream"):
+
+                    def run(params=params, out=out, write=write, mode=mode):
+                        frames = iter_ascii_frames(clip, params)
+                        if mode == "list":
+                            frames = list(frames)
+                        with out.open("w", encoding="utf-8") as f:
+                            return write(frames, f)
+
+                    result = measure(run, ctx.repeat)
+                    if base is None:
+                        base = result
+                    yield {"grid": f"{cols}x{rows}", "color": color, "format": fmt, "mode": mode,
+                           "bytes_per_frame": out.stat().st_size / max(1, result["frames"]),
+                           "vs_list": result["peak_kib"] / base["peak_kib"] if base["peak_kib"] else 1.0,
+                           **result}
+
+
+@benchmark("skip_unchanged")
+def bench_skip_unchanged(ctx: Context) -> Iterator[dict]:
+    """変化の少ないフレームで前の変換結果 (プレビューでは描画も) を使い回したときの、書き出しとプレビューの速度."""
+    for kind in ("static", "gradient", "scene_cuts"):
+        clip = ctx.clip(kind)
+        grays = ctx.gray_frames(kind)
+        for cols, rows in ctx.grid_sizes():
+            params = AsciiParams(cols=cols, rows=rows, fps=CLIP_FPS, charset_name="Classic (10)")
+            out = ctx.workdir / f"skip_{kind}_{cols}x{rows}.ass"
+            base: dict[str, float] = {}
+            for stage in ("export", "preview"):
+                for skip in (False, True):
+                    skipped: list[int] = []
+
+                    def run(params=params, out=out, clip=clip, skip=skip, stage=stage):
+                        if stage == "export":
+                            summary = export_ass(
+                                video_path=clip, out_path=out, params=params,
+                                start_sec=0.0, dur_sec=None, pos_x=192.0, pos_y=144.0,
+                                fontname="Courier New", fontsize=4, play_res_x=384, play_res_y=288,
+                                skip_unchanged=skip,
+                            )
+                            skipped.append(summary["skipped"][0])
+                            return summary["frames"][0]
+                        # プレビューと同じく、使い回したフレームは描き直さない
+                        detector = ChangeDetector()
+                        for gray in grays:
+                            if skip:
+                                frame, reused = detector.convert(gray, params)
+                            else:
+                                frame, reused = convert_frame(gray, params), False
+                            if not reused:
+                                render_ascii_image(frame.lines, font=ctx.font, pad=10)
+                        skipped.append(detector.skipped)
+                        return len(grays)
+
+                    result = measure(run, ctx.repeat)
+                    base.setdefault(stage, result["ms_per_frame"])
+                    yield {"clip": kind, "grid": f"{cols}x{rows}", "stage": stage, "skip": skip,
+                           "skipped_ratio": skipped[-1] / max(1, result["frames"]),
+                           "vs_off": result["ms_per_frame"] / base[stage] if base[stage] else 1.0, **result}
+
+
+@benchmark("video_render")
+def bench_video_render(ctx: Context) -> Iterator[dict]:
+    """動画への描画書き出しを、呼び出し元で描く場合とワーカープロセスで描く場合で比べる."""
+    clip = ctx.clip("color")
+    for cols, rows in ctx.grid_sizes():
+        params = AsciiParams(cols=cols, rows=rows, fps=CLIP_FPS, charset_name="Classic (10)")
+        for layout in VIDEO_LAYOUTS:
+            base: float | None = None
+            for workers in (0, 2):
+                out = ctx.workdir / f"render_{cols}x{rows}_{layout}.avi"
+
+                def run(params=params, layout=layout, workers=workers, out=out):
+                    return render_video(clip, out, params, layout=layout, workers=workers)["frames"]
+
+                result = measure(run, ctx.repeat)
+                if base is None:
+                    base = result["ms_per_frame"]
+                yield {"grid": f"{cols}x{rows}", "layout": layout, "workers": workers,
+                       "vs_inprocess": result["ms_per_frame"] / base if base else 1.0, **result}
+
+
+HEADLESS_MODULES = ["ascii_core", "ass_exporter", "frame_stream"]
+GUI_MODULES = ("PIL", "tkinter", "customtkinter")
+
+_IMPORT_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+dt = time.perf_counter() - t0
+heavy = sorted({{m.split('.')[0] for m in sys.modules}} & set({gui!r}))
+print(json.dumps({{"seconds": dt, "heavy_modules": heavy}}))
+"""
+
+
+def _probe_import(module: str) -> dict:
+    code = _IMPORT_PROBE.format(module=module, gui=GUI_MODULES)
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).resolve().parent, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+@benchmark("import_time")
+def bench_import_time(ctx: Context) -> Iterator[dict]:
+    """ヘッドレス経路がGUI/描画系を読み込まないことを確認しつつ import 時間を測る."""
+    runs = 3 if ctx.quick else 7
+    for module in HEADLESS_MODULES + ["ascii_render", "asscii_app"]:
+        try:
+            probes = [_probe_import(module) for _ in range(runs)]
+        except subprocess.CalledProcessError as exc:
+            yield {"module": module, "error": (exc.stderr or "").strip().splitlines()[-1:]}
+            continue
+        times = sorted(p["seconds"] for p in probes)
+        heavy = probes[0]["heavy_modules"]
+        if module in HEADLESS_MODULES and heavy:
+            raise RuntimeError(f"headless module {module} imports GUI/imaging modules: {heavy}")
+        yield {"module": module, "headless": module in HEADLESS_MODULES, "heavy_modules": heavy,
+               "import_ms": times[len(times) // 2] * 1000.0, "import_min_ms": times[0] * 1000.0}
+
+
+# ---------- output ----------
+
+def _git_revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent, capture_output=True, text=True, timeout=10,
+        )
+    except Exception:
+        return None
+    return out.stdout.strip() or None
+
+
+def run_benchmarks(names: list[str], quick: bool, repeat: int) -> dict:
+    meta = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "quick": quick,
+        "repeat": repeat,
+        "default_params": asdict(AsciiParams()),
+    }
+    results: list[dict] = []
+    with tempfile.TemporaryDirectory(prefix="asscii-bench-") as tmp:
+        ctx = Context(Path(tmp), quick=quick, repeat=repeat)
+        for name in names:
+            for row in BENCHMARKS[name](ctx):
+                row = {"benchmark": name, **row}
+                results.append(row)
+                print(_format_row(row), file=sys.stderr)
+    return {"meta": meta, "results": results}
+
+
+METRIC_KEYS = {"frames", "seconds", "fps", "ms_per_frame", "peak_kib", "import_ms", "import_min_ms",
+               "heavy_modules", "bytes_per_frame", "vs_mono", "raw_changed_ratio", "changed_ratio",
+               "vs_none", "within_budget", "vs_charset", "glyphs_used", "vs_off", "vs_full",
+               "vs_redraw", "vs_separate", "separate_ms_per_frame", "decoded", "vs_plain", "missed", "compact_ratio",
+               "plain_bytes_per_frame", "vs_list", "frame_step", "settled_level",
+               "vs_seek", "thumbs", "interactive", "vs_inprocess", "skipped_ratio"}
+
+
+def _row_key(row: dict) -> tuple:
+    return tuple(
+        (k, str(v)) for k, v in sorted(row.items())
+        if k not in METRIC_KEYS and not k.endswith("_bytes")
+    )
+
+
+def _format_row(row: dict) -> str:
+    labels = " ".join(f"{k}={v}" for k, v in row.items()
+                      if k not in {"frames", "seconds", "fps", "ms_per_frame", "peak_kib"})
+    if "fps" not in row:
+        return labels
+    return f"{labels}: {row['fps']:.1f} fps, {row['ms_per_frame']:.2f} ms/frame, " \
+           f"peak {row.get('peak_kib', 0):.0f} KiB"
+
+
+def compare(old_path: Path, new_path: Path) -> int:
+    """2つの結果JSONを突き合わせ、fpsの変化率を表示する."""
+    old = {_row_key(r): r for r in json.loads(old_path.read_text(encoding="utf-8"))["results"]}
+    new = json.loads(new_path.read_text(encoding="utf-8"))["results"]
+    for row in new:
+        key = _row_key(row)
+        label = " ".join(f"{k}={v}" for k, v in key)
+        before = old.get(key)
+        if before is not None and "import_ms" in row and "import_ms" in before:
+            print(f"{label}: import {before['import_ms']:.1f} -> {row['import_ms']:.1f} ms")
+            continue
+        if before is None or "fps" not in before or "fps" not in row:
+            print(f"{label}: new")
+            continue
+        ratio = row["fps"] / before["fps"] if before["fps"] else float("inf")
+        mem = row.get("peak_kib", 0.0) - before.get("peak_kib", 0.0)
+        print(f"{label}: {before['fps']:.1f} -> {row['fps']:.1f} fps ({ratio:.2f}x), peak {mem:+.0f} KiB")
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="ASScii benchmark suite")
+    parser.add_argument("--output", "-o", type=Path, help="write JSON results here (default: stdout)")
+    parser.add_argument("--filter", "-k", action="append", default=[],
+                        help="run only benchmarks whose name contains this text")
+    parser.add_argument("--quick", action="store_true", help="fewer frames and grid sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="timed repetitions (best is kept)")
+    parser.add_argument("--list", action="store_true", help="list benchmark names and exit")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("OLD", "NEW"),
+                        help="compare two result files instead of running")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+    if args.compare:
+        return compare(*args.compare)
+
+    names = [n for n in BENCHMARKS if not args.filter or any(f in n for f in args.filter)]
+    if not names:
+        parser.error("no benchmark matches --filter")
+    report = run_benchmarks(names, quick=args.quick, repeat=args.repeat)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
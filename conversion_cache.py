@@ -0,0 +1,324 @@
+"""変換結果(文字インデックス格子と輝度格子)のディスクキャッシュ.
+
+キーは動画ファイル内容のフィンガープリントと、変換に影響する ``AsciiParams`` の
+ハッシュ。フレームは ``CHUNK_FRAMES`` 枚ずつメモリマップしたファイルに書き込み、
+キャッシュ全体の容量を超えたら最後に使われたのが古いエントリから削除する。
+容量はエントリを開くときと、書き込み中にチャンクを増やすときに確かめ、
+使用中のエントリ以外を消しても収まらなければそのエントリへの書き込みをやめる。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+
+from ascii_core import AsciiFrame, AsciiParams, glyph_table, uses_color, uses_glyph_font
+
+
+CACHE_VERSION = 2
+CHUNK_FRAMES = 256
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+_SAMPLE_BYTES = 1024 * 1024
+# フレーム単位の変換結果に影響しない項目はキーから外す (時間方向の安定化はキャッシュの後段)
+_PARAMS_IGNORED = {"fps", "hysteresis"}
+
+
+def default_cache_dir() -> Path:
+    env = os.environ.get("ASSCII_CACHE_DIR")
+    if env:
+        return Path(env).expanduser()
+    if sys.platform.startswith("win"):
+        base = Path(os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local")
+        return base / "asscii" / "cache"
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Caches" / "asscii"
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "asscii"
+
+
+def default_max_bytes() -> int:
+    env = os.environ.get("ASSCII_CACHE_MAX_MB")
+    if env:
+        try:
+            return max(0, int(float(env) * 1024 * 1024))
+        except ValueError:
+            pass
+    return DEFAULT_MAX_BYTES
+
+
+def video_fingerprint(path: Path) -> str:
+    """ファイルサイズと先頭・中央・末尾のサンプルから内容のハッシュを作る."""
+    path = Path(path)
+    size = path.stat().st_size
+    h = hashlib.sha1()
+    h.update(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        for offset in sorted({0, max(0, size // 2 - _SAMPLE_BYTES // 2), max(0, size - _SAMPLE_BYTES)}):
+            f.seek(offset)
+            h.update(f.read(_SAMPLE_BYTES))
+    return h.hexdigest()[:20]
+
+
+def params_fingerprint(params: AsciiParams) -> str:
+    data = {k: v for k, v in asdict(params).items() if k not in _PARAMS_IGNORED}
+    if not uses_glyph_font(params):
+        # フォントが効くのは形状マッチか濃度順の並べ替えのときだけ
+        data.pop("glyph_font", None)
+    if data.get("roi") is None:
+        # ROI導入前のキャッシュをそのまま使えるよう、フレーム全体のときはキーに含めない
+        data.pop("roi", None)
+    blob = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:20]
+
+
+class CacheEntry:
+    """1つの(動画, パラメータ)に対応するフレーム格子の保存先."""
+
+    def __init__(self, directory: Path, rows: int, cols: int, glyphs: str, params_key: str,
+                 meta: dict | None = None, color: bool = False,
+                 reserve: Callable[[int], bool] | None = None):
+        self.directory = directory
+        self._pending_meta = meta
+        self.rows = rows
+        self.cols = cols
+        self.glyphs = glyphs
+        self.params_key = params_key
+        self.color = color
+        self._cell_count = rows * cols
+        self._chunks: dict[int, np.memmap] = {}
+        self._lock = threading.Lock()
+        # チャンクを増やす前に容量を確保する。確保できなければ以降は書き込まない
+        self._reserve = reserve
+        self.full = False
+        self.hits = 0
+        self.misses = 0
+
+    def matches(self, params: AsciiParams) -> bool:
+        return params_fingerprint(params) == self.params_key
+
+    @property
+    def _chunk_bytes(self) -> int:
+        # [有効フラグ CHUNK][インデックス uint16][輝度 uint8][カラー時のみ BGR uint8 x3]
+        per_cell = 6 if self.color else 3
+        return CHUNK_FRAMES + CHUNK_FRAMES * self._cell_count * per_cell
+
+    def _chunk(self, chunk_idx: int, create: bool) -> np.memmap | None:
+        mm = self._chunks.get(chunk_idx)
+        if mm is not None:
+            return mm
+        path = self.directory / f"chunk_{chunk_idx:06d}.bin"
+        if not path.exists():
+            if not create or self.full:
+                return None
+            if self._reserve is not None and not self._reserve(self._chunk_bytes):
+                self.full = True
+                return None
+            self._ensure_directory()
+            with open(path, "wb") as f:
+                f.truncate(self._chunk_bytes)
+        elif path.stat().st_size != self._chunk_bytes:
+            return None
+        mm = np.memmap(path, dtype=np.uint8, mode="r+", shape=(self._chunk_bytes,))
+        self._chunks[chunk_idx] = mm
+        return mm
+
+    def _ensure_directory(self):
+        # 1フレームも書かれないエントリ(スライダー操作中など)はディスクに作らない
+        if self._pending_meta is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / "meta.json").write_text(
+            json.dumps(self._pending_meta, ensure_ascii=False, indent=1), encoding="utf-8"
+        )
+        ConversionCache._touch(self.directory)
+        self._pending_meta = None
+
+    def _views(self, mm: np.memmap, slot: int) -> tuple[np.ndarray, np.ndarray, np.ndarray | None]:
+        n = self._cell_count
+        idx_start = CHUNK_FRAMES + slot * n * 2
+        luma_start = CHUNK_FRAMES + CHUNK_FRAMES * n * 2 + slot * n
+        indices = mm[idx_start:idx_start + n * 2].view(np.uint16).reshape(self.rows, self.cols)
+        luma = mm[luma_start:luma_start + n].reshape(self.rows, self.cols)
+        colors = None
+        if self.color:
+            color_start = CHUNK_FRAMES + CHUNK_FRAMES * n * 3 + slot * n * 3
+            colors = mm[color_start:color_start + n * 3].reshape(self.rows, self.cols, 3)
+        return indices, luma, colors
+
+    def get(self, frame_idx: int) -> AsciiFrame | None:
+        if frame_idx is None or frame_idx < 0:
+            return None
+        chunk_idx, slot = divmod(int(frame_idx), CHUNK_FRAMES)
+        with self._lock:
+            mm = self._chunk(chunk_idx, create=False)
+            if mm is None or not mm[slot]:
+                self.misses += 1
+                return None
+            indices, luma, colors = self._views(mm, slot)
+            self.hits += 1
+            return AsciiFrame(
+                np.array(indices), self.glyphs, np.array(luma),
+                np.array(colors) if colors is not None else None,
+            )
+
+    def put(self, frame_idx: int, frame: AsciiFrame):
+        if frame_idx is None or frame_idx < 0:
+            return
+        if frame.shape != (self.rows, self.cols) or frame.glyphs != self.glyphs:
+            return
+        if self.color and frame.colors is None:
+            return
+        chunk_idx, slot = divmod(int(frame_idx), CHUNK_FRAMES)
+        with self._lock:
+            mm = self._chunk(chunk_idx, create=True)
+            if mm is None:
+                return
+            indices, luma, colors = self._views(mm, slot)
+            indices[...] = frame.indices
+            if frame.luma is not None:
+                luma[...] = frame.luma
+            if colors is not None:
+                colors[...] = frame.colors
+            # データを書いてから有効フラグを立てる
+            mm[slot] = 1
+
+    def flush(self):
+        with self._lock:
+            for mm in self._chunks.values():
+                mm.flush()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._chunks.clear()
+
+
+class ConversionCache:
+    """動画×パラメータごとのエントリをLRUで管理するディスクキャッシュ."""
+
+    def __init__(self, root: Path | None = None, max_bytes: int | None = None):
+        self.root = Path(root) if root is not None else default_cache_dir()
+        self.max_bytes = default_max_bytes() if max_bytes is None else max(0, int(max_bytes))
+        self._fingerprints: dict[tuple[str, int, int], str] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def fingerprint(self, video_path: Path) -> str:
+        path = Path(video_path)
+        st = path.stat()
+        key = (str(path.resolve()), st.st_size, st.st_mtime_ns)
+        fp = self._fingerprints.get(key)
+        if fp is None:
+            fp = video_fingerprint(path)
+            self._fingerprints[key] = fp
+        return fp
+
+    def open(self, video_path: Path, params: AsciiParams, source_tag: str = "") -> CacheEntry | None:
+        """エントリを開く(無ければ作る)。キャッシュが使えない場合はNone.
+
+        ``source_tag`` はファイルの読み方 (``FrameSource.cache_tag``)。同じファイルでも
+        読み方が違えば別のエントリになる。
+        """
+        if not self.enabled:
+            return None
+        try:
+            video_key = self.fingerprint(video_path)
+            if source_tag:
+                video_key = hashlib.sha1(f"{video_key}|{source_tag}".encode("utf-8")).hexdigest()[:20]
+            params_key = params_fingerprint(params)
+            glyphs = glyph_table(params)
+            color = uses_color(params)
+            directory = self.root / f"{video_key}-{params_key}"
+            meta = {
+                "version": CACHE_VERSION,
+                "video": str(video_path),
+                "source": source_tag,
+                "rows": int(params.rows),
+                "cols": int(params.cols),
+                "glyphs": glyphs,
+                "color": color,
+                "params": asdict(params),
+            }
+            meta_path = directory / "meta.json"
+            pending: dict | None = meta
+            if directory.exists():
+                try:
+                    stored = json.loads(meta_path.read_text(encoding="utf-8"))
+                except Exception:
+                    stored = None
+                if not stored or any(stored.get(k) != meta[k] for k in ("version", "rows", "cols", "glyphs", "color")):
+                    shutil.rmtree(directory, ignore_errors=True)
+                else:
+                    self._touch(directory)
+                    pending = None
+            self.evict(keep={directory})
+            return CacheEntry(directory, int(params.rows), int(params.cols), glyphs, params_key,
+                              meta=pending, color=color,
+                              reserve=lambda nbytes: self.evict(keep={directory}, incoming=nbytes))
+        except OSError:
+            return None
+
+    @staticmethod
+    def _touch(directory: Path):
+        stamp = directory / "last_used"
+        try:
+            stamp.write_text(str(time.time()), encoding="ascii")
+        except OSError:
+            pass
+
+    @staticmethod
+    def _last_used(directory: Path) -> float:
+        try:
+            return (directory / "last_used").stat().st_mtime
+        except OSError:
+            return 0.0
+
+    @staticmethod
+    def _size(directory: Path) -> int:
+        total = 0
+        for p in directory.iterdir():
+            try:
+                total += p.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def usage(self) -> int:
+        if not self.root.exists():
+            return 0
+        return sum(self._size(d) for d in self.root.iterdir() if d.is_dir())
+
+    def evict(self, keep: set[Path] | None = None, incoming: int = 0) -> bool:
+        """合計サイズが上限を超えていれば古いエントリから削除する.
+
+        ``incoming`` はこれから書き足すバイト数。それも含めて上限に収まればTrue。
+        """
+        if not self.root.exists():
+            return incoming <= self.max_bytes
+        keep = keep or set()
+        entries = [(self._last_used(d), self._size(d), d) for d in self.root.iterdir() if d.is_dir()]
+        total = sum(size for _, size, _ in entries) + incoming
+        for _, size, directory in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            if directory in keep:
+                continue
+            shutil.rmtree(directory, ignore_errors=True)
+            total -= size
+        return total <= self.max_bytes
+
+    def clear(self):
+        if self.root.exists():
+            shutil.rmtree(self.root, ignore_errors=True)
+
@@ -0,0 +1,163 @@
+"""動画ファイルの各フレームのタイムスタンプとキーフレーム位置の索引.
+
+一度だけコンテナのパケットを走査して作り (デコードはしない)、動画の隣に
+``<動画名>.asscii-index.npz`` として保存する。書き込めない場所の動画は
+キャッシュディレクトリの隣に置く。ファイルサイズか更新時刻が変わったら作り直す。
+時刻からフレームへの対応は可変フレームレートでも二分探索で正確に引ける。
+"""
+
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from conversion_cache import default_cache_dir
+
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".asscii-index.npz"
+
+
+class FrameIndex:
+    """表示順に並んだフレームのタイムスタンプ (秒) とキーフレームフラグ."""
+
+    def __init__(self, timestamps: np.ndarray, keyframes: np.ndarray):
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)
+        self.keyframes = np.asarray(keyframes, dtype=bool)
+        if not self.keyframes.any():
+            # キーフレームが分からないコンテナでは、どのフレームからでもシークし直す
+            self.keyframes = np.ones(len(self.timestamps), dtype=bool)
+        self._key_positions = np.flatnonzero(self.keyframes)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def frame_at(self, seconds: float) -> int:
+        """``seconds`` に最も近いタイムスタンプのフレーム (等距離なら前のフレーム).
+
+        最後のフレームの表示が終わった後の時刻ではフレーム数 (終端) を返す。
+        """
+        ts = self.timestamps
+        n = len(ts)
+        if n == 0:
+            return 0
+        i = int(np.searchsorted(ts, seconds, side="right")) - 1
+        if i < 0:
+            return 0
+        if i + 1 < n:
+            return i + 1 if ts[i + 1] - seconds < seconds - ts[i] else i
+        # 最後のフレームは直前の間隔と同じ長さだけ表示されるとみなす
+        last_span = ts[-1] - ts[-2] if n > 1 else 0.0
+        return n if seconds - ts[-1] >= last_span / 2 else n - 1
+
+    def keyframe_before(self, index: int) -> int:
+        """``index`` 以前で最後のキーフレーム."""
+        k = int(np.searchsorted(self._key_positions, index, side="right")) - 1
+        return int(self._key_positions[k]) if k >= 0 else 0
+
+    def next_keyframe(self, index: int) -> int:
+        """``index`` より後の最初のキーフレーム。無ければフレーム数."""
+        k = int(np.searchsorted(self._key_positions, index, side="right"))
+        return int(self._key_positions[k]) if k < len(self._key_positions) else len(self)
+
+    def timestamp(self, index: int) -> float:
+        return float(self.timestamps[min(max(0, index), len(self.timestamps) - 1)]) if len(self) else 0.0
+
+    @classmethod
+    def scan(cls, path: Path) -> FrameIndex | None:
+        """コンテナを走査して索引を作る。読めなければNone."""
+        # 生パケットのまま読めるバックエンドならデコードせずに済む
+        cap = cv2.VideoCapture(str(path), cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+        if not cap.isOpened():
+            cap = cv2.VideoCapture(str(path))
+        if not cap.isOpened():
+            return None
+        stamps: list[float] = []
+        keys: list[bool] = []
+        try:
+            while cap.grab():
+                stamps.append(float(cap.get(cv2.CAP_PROP_POS_MSEC)) / 1000.0)
+                keys.append(cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME) > 0)
+        finally:
+            cap.release()
+        if not stamps:
+            return None
+        # パケットはデコード順なので表示順に並べ直す
+        order = np.argsort(np.asarray(stamps), kind="stable")
+        return cls(np.asarray(stamps)[order], np.asarray(keys)[order])
+
+    def save(self, path: Path, stamp: tuple[int, int]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(
+                f, version=INDEX_VERSION, stamp=np.asarray(stamp, dtype=np.int64),
+                timestamps=self.timestamps, keyframes=np.packbits(self.keyframes),
+            )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path, stamp: tuple[int, int]) -> FrameIndex | None:
+        try:
+            with np.load(path) as data:
+                if int(data["version"]) != INDEX_VERSION or tuple(data["stamp"].tolist()) != stamp:
+                    return None
+                timestamps = data["timestamps"]
+                keyframes = np.unpackbits(data["keyframes"], count=len(timestamps)).astype(bool)
+        except (OSError, KeyError, ValueError):
+            return None
+        return cls(timestamps, keyframes)
+
+
+def _stamp(video_path: Path) -> tuple[int, int]:
+    st = Path(video_path).stat()
+    return st.st_size, st.st_mtime_ns
+
+
+def index_paths(video_path: Path) -> list[Path]:
+    """索引の保存先候補 (動画の隣、キャッシュディレクトリの順)."""
+    video_path = Path(video_path)
+    key = hashlib.sha1(str(video_path.resolve()).encode("utf-8")).hexdigest()[:20]
+    return [
+        video_path.with_name(video_path.name + INDEX_SUFFIX),
+        # 変換キャッシュのLRU削除に巻き込まれないよう、キャッシュの外に並べて置く
+        default_cache_dir().with_name(default_cache_dir().name + "-index") / f"{key}{INDEX_SUFFIX}",
+    ]
+
+
+def load_index(video_path: Path) -> FrameIndex | None:
+    """保存済みの索引。無いか動画が変わっていればNone."""
+    try:
+        stamp = _stamp(video_path)
+    except OSError:
+        return None
+    for path in index_paths(video_path):
+        if path.exists():
+            index = FrameIndex.load(path, stamp)
+            if index is not None:
+                return index
+    return None
+
+
+def build_index(video_path: Path) -> FrameIndex | None:
+    """保存済みの索引を読み、無ければ走査して保存する."""
+    index = load_index(video_path)
+    if index is not None:
+        return index
+    try:
+        stamp = _stamp(video_path)
+    except OSError:
+        return None
+    index = FrameIndex.scan(video_path)
+    if index is None:
+        return None
+    for path in index_paths(video_path):
+        try:
+            index.save(path, stamp)
+            break
+        except OSError:
+            continue
+    return index
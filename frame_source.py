@@ -0,0 +1,617 @@
+"""動画ファイル・連番画像・Y4M/rawvideoストリーム・numpy配列を同じ形で読むフレームソース.
+
+どのソースも ``read()`` でフレーム番号・タイムスタンプ付きの ``SourceFrame`` を
+順に返す。``luma_only=True`` を渡すと、色差を読み捨てられるソースは輝度だけを返す。
+パイプのように巻き戻せないソースは前方向にしか進めないが、直前に返した
+フレームはもう一度引ける (書き出しfpsが元より高いときに同じフレームを使い回すため)。
+"""
+
+from __future__ import annotations
+
+import glob
+import re
+import sys
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+import cv2
+import numpy as np
+
+from frame_index import FrameIndex, build_index, load_index
+
+
+DEFAULT_FPS = 30.0
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+RAW_FORMATS = ("gray", "bgr24", "rgb24", "yuv420p")
+# 直前に読んだ位置からこのフレーム数以内の前方シークは、デコーダをシークせず読み捨てる
+GRAB_AHEAD = 8
+Y4M_MAGIC = b"YUV4MPEG2"
+
+
+@dataclass
+class SourceFrame:
+    """1フレーム分の画素。``bgr`` と ``gray`` の少なくとも一方が入っている."""
+
+    index: int
+    timestamp: float
+    bgr: np.ndarray | None = None
+    gray: np.ndarray | None = None
+
+    def luma(self) -> np.ndarray:
+        if self.gray is None:
+            self.gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        return self.gray
+
+
+class FrameSource:
+    """フレーム列の共通インターフェース.
+
+    サブクラスは ``_decode`` (現在位置のフレームを読んで進む) を実装する。
+    任意の位置へ飛べるなら ``_random_access`` を立てて ``_seek`` を、先頭へ
+    戻れるだけなら ``_can_rewind`` / ``_rewind`` を上書きする。どちらも無い
+    ソースは前方向に読み飛ばしてシークする。``frame_count`` が0なら長さ不明。
+    """
+
+    fps: float = DEFAULT_FPS
+    width: int = 0
+    height: int = 0
+    frame_count: int = 0
+    # 単一ファイルとして内容のフィンガープリントが取れる場合だけ入る (変換キャッシュのキー)
+    path: Path | None = None
+    # ファイルの中身だけでは決まらない読み方 (生フレームの大きさ・画素形式など)。キャッシュのキーに足す
+    cache_tag: str = ""
+    _random_access = False
+
+    def __init__(self):
+        self.position = 0
+        self._last: SourceFrame | None = None
+        self._replay = False
+
+    @property
+    def seekable(self) -> bool:
+        return self._random_access or self._can_rewind()
+
+    def read(self, luma_only: bool = False) -> SourceFrame | None:
+        """次のフレーム。終端ならNone."""
+        if self._replay:
+            self._replay = False
+            last = self._last
+            if last is not None and (luma_only or last.bgr is not None):
+                return last
+            if last is not None and not self._reposition(last.index):
+                # 戻れないストリームでは色はもう無いので、同じフレームを輝度から作ったBGRで返す
+                last.bgr = cv2.cvtColor(last.gray, cv2.COLOR_GRAY2BGR)
+                return last
+        pixels = self._decode(luma_only)
+        if pixels is None:
+            return None
+        bgr, gray = pixels
+        frame = SourceFrame(self.position, self.position / self.fps if self.fps > 0 else 0.0, bgr, gray)
+        self.position += 1
+        self._last = frame
+        return frame
+
+    def seek(self, index: int) -> bool:
+        """次に読むフレームを ``index`` にする。戻れないソースで戻ろうとするとFalse."""
+        index = max(0, int(index))
+        self._replay = False
+        if self._last is not None and index == self._last.index and index == self.position - 1:
+            self._replay = True
+            return True
+        if index == self.position:
+            return True
+        return self._reposition(index)
+
+    def _reposition(self, index: int) -> bool:
+        # 直前に読んだフレームも含めて、次に読む位置を ``index`` に移す
+        if self._random_access:
+            self._seek(index)
+            self.position = index
+            self._last = None
+            return True
+        if index < self.position:
+            if not self._can_rewind():
+                return False
+            self._rewind()
+            self.position = 0
+            self._last = None
+        while self.position < index:
+            if not self._skip():
+                return False
+            self.position += 1
+        return True
+
+    def frame_at(self, seconds: float) -> int:
+        """時刻に対応するフレーム番号."""
+        # OpenCVのPOS_MSECシークと同じく時刻*fpsを丸めたフレームにする
+        return int(round(max(0.0, seconds) * self.fps)) if self.fps > 0 else 0
+
+    def seek_time(self, seconds: float) -> bool:
+        return self.seek(self.frame_at(seconds))
+
+    def reopen(self) -> FrameSource | None:
+        """別スレッドで使える独立したリーダー。作れないソースはNone."""
+        return None
+
+    def close(self):
+        pass
+
+    def __enter__(self) -> FrameSource:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _decode(self, luma_only: bool) -> tuple[np.ndarray | None, np.ndarray | None] | None:
+        raise NotImplementedError
+
+    def _seek(self, index: int):
+        raise NotImplementedError
+
+    def _can_rewind(self) -> bool:
+        return False
+
+    def _rewind(self):
+        raise NotImplementedError
+
+    def _skip(self) -> bool:
+        return self._decode(True) is not None
+
+
+class VideoFileSource(FrameSource):
+    """``cv2.VideoCapture`` で読む動画ファイル.
+
+    フレーム索引 (``frame_index.FrameIndex``) があれば、時刻とフレームの対応と
+    読んだフレームの番号をタイムスタンプから引き、同じGOP内の前方シークは
+    デコーダをシークせず読み捨てで進める。保存済みの索引は開くときに読む。
+    """
+
+    _random_access = True
+
+    def __init__(self, path: Path, index: FrameIndex | None = None, saved_index: bool = True):
+        super().__init__()
+        self.path = Path(path)
+        self.cap = cv2.VideoCapture(str(self.path))
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Could not open video: {self.path}")
+        self.fps = float(self.cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 0)
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 0)
+        self.frame_count = max(0, int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0))
+        self.frame_index: FrameIndex | None = None
+        # シークの確認で読んだまま、まだ画素を取り出していないフレームがある
+        self._grabbed = False
+        if index is None and saved_index:
+            index = load_index(self.path)
+        self.attach_index(index)
+
+    def attach_index(self, index: FrameIndex | None):
+        if index is None or len(index) == 0:
+            return
+        self.frame_index = index
+        self.frame_count = len(index)
+
+    def ensure_index(self) -> FrameIndex | None:
+        """索引が無ければ走査して作り、動画の隣に保存する."""
+        if self.frame_index is None:
+            self.attach_index(build_index(self.path))
+        return self.frame_index
+
+    def _decoded_index(self) -> int:
+        """直前にgrab/readしたフレームの番号."""
+        if self.frame_index is not None:
+            return self.frame_index.frame_at(float(self.cap.get(cv2.CAP_PROP_POS_MSEC)) / 1000.0)
+        try:
+            pos = float(self.cap.get(cv2.CAP_PROP_POS_FRAMES))
+        except Exception:
+            pos = float("nan")
+        return self.position if np.isnan(pos) else max(0, int(pos) - 1)
+
+    def read(self, luma_only: bool = False) -> SourceFrame | None:
+        # 件数が不正確なコンテナもあるので、終端はデコーダに任せる
+        if self._replay:
+            return super().read(luma_only)
+        if self._grabbed:
+            self._grabbed = False
+            ok, bgr = self.cap.retrieve()
+        else:
+            ok, bgr = self.cap.read()
+        if not ok:
+            return None
+        self.position = self._decoded_index()
+        if self.frame_index is not None:
+            timestamp = self.frame_index.timestamp(self.position)
+        else:
+            timestamp = self.position / self.fps if self.fps > 0 else 0.0
+        frame = SourceFrame(self.position, timestamp, bgr)
+        self.position += 1
+        self._last = frame
+        return frame
+
+    def frame_at(self, seconds: float) -> int:
+        if self.frame_index is not None:
+            return self.frame_index.frame_at(seconds)
+        return super().frame_at(seconds)
+
+    def _grab_forward(self, index: int) -> bool:
+        while self.position < index:
+            if not self.cap.grab():
+                return False
+            self.position += 1
+        return True
+
+    def seek(self, index: int) -> bool:
+        index = max(0, int(index))
+        self._replay = False
+        last = self._last
+        if last is not None and index == last.index and index == self.position - 1:
+            self._replay = True
+            return True
+        fi = self.frame_index
+        if last is not None and not self._grabbed and self.position <= index:
+            # キーフレームからデコードし直すより、同じGOPの先まで読み捨てるほうが速い
+            if index - self.position <= GRAB_AHEAD or (fi is not None and index < fi.next_keyframe(self.position)):
+                return self._grab_forward(index)
+        self._last = None
+        self._grabbed = False
+        if fi is None:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            self.position = index
+            return True
+        return self._seek_exact(index)
+
+    def _seek_exact(self, index: int) -> bool:
+        """索引のタイムスタンプで着地点を確かめながらシークする.
+
+        OpenCVはフレーム番号をfpsで時刻に換算してシークするため、可変フレーム
+        レートでは前後にずれる。1枚読んで実際の位置を確かめ、手前なら読み捨てて
+        進め、行き過ぎたらその分だけ手前を狙い直す。
+        """
+        target = index
+        for _ in range(4):
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            if not self.cap.grab():
+                return False
+            landed = self._decoded_index()
+            if landed <= index or target == 0:
+                break
+            target = max(0, target - (landed - index) - 1)
+        if landed >= index:
+            # 行き過ぎたまま戻れなかった場合は、着地したフレームから読む
+            self._grabbed = True
+            self.position = landed
+            return True
+        self.position = landed + 1
+        return self._grab_forward(index)
+
+    def seek_time(self, seconds: float) -> bool:
+        if self.frame_index is not None:
+            return self.seek(self.frame_index.frame_at(seconds))
+        self._replay = False
+        self._last = None
+        self._grabbed = False
+        self.cap.set(cv2.CAP_PROP_POS_MSEC, max(0.0, seconds) * 1000.0)
+        self.position = int(round(max(0.0, seconds) * self.fps)) if self.fps > 0 else 0
+        return True
+
+    def reopen(self) -> FrameSource | None:
+        try:
+            return VideoFileSource(self.path, self.frame_index)
+        except RuntimeError:
+            return None
+
+    def close(self):
+        self.cap.release()
+
+
+def _natural_key(path: Path) -> list:
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", path.name)]
+
+
+class ImageSequenceSource(FrameSource):
+    """ディレクトリ内の画像、またはglobパターンに一致する画像を番号順に読む."""
+
+    _random_access = True
+
+    def __init__(self, spec: Path | str | Sequence[Path], fps: float | None = None):
+        super().__init__()
+        if isinstance(spec, (str, Path)):
+            spec_path = Path(spec)
+            if spec_path.is_dir():
+                files = [p for p in spec_path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES]
+            else:
+                files = [Path(p) for p in glob.glob(str(spec_path))]
+        else:
+            files = [Path(p) for p in spec]
+        self.files = sorted(files, key=_natural_key)
+        if not self.files:
+            raise RuntimeError(f"No images found: {spec}")
+        first = cv2.imread(str(self.files[0]), cv2.IMREAD_GRAYSCALE)
+        if first is None:
+            raise RuntimeError(f"Could not read image: {self.files[0]}")
+        self.height, self.width = first.shape[:2]
+        self.fps = float(fps or DEFAULT_FPS)
+        self.frame_count = len(self.files)
+
+    def _decode(self, luma_only: bool):
+        if self.position >= len(self.files):
+            return None
+        path = str(self.files[self.position])
+        if luma_only:
+            gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+            return None if gray is None else (None, gray)
+        bgr = cv2.imread(path, cv2.IMREAD_COLOR)
+        return None if bgr is None else (bgr, None)
+
+    def _seek(self, index: int):
+        pass
+
+    def reopen(self) -> FrameSource | None:
+        return ImageSequenceSource(self.files, self.fps)
+
+
+class _StreamSource(FrameSource):
+    """固定長フレームが並ぶバイトストリーム (ファイルまたはパイプ)."""
+
+    def __init__(self, stream: BinaryIO, owns: bool, path: Path | None):
+        super().__init__()
+        self.stream = stream
+        self._owns = owns
+        self._source_path = path
+        self._data_start = 0
+
+    def _read_exact(self, size: int) -> bytes | None:
+        data = self.stream.read(size)
+        while data is not None and 0 < len(data) < size:
+            more = self.stream.read(size - len(data))
+            if not more:
+                break
+            data += more
+        return data if data is not None and len(data) == size else None
+
+    def _discard(self, size: int) -> bool:
+        if self._source_path is not None:
+            self.stream.seek(size, 1)
+            return True
+        return self._read_exact(size) is not None
+
+    def _can_rewind(self) -> bool:
+        return self._source_path is not None
+
+    def _rewind(self):
+        self.stream.seek(self._data_start)
+
+    def close(self):
+        if self._owns:
+            self.stream.close()
+
+
+# 映像レンジ (16..235) の輝度をフルレンジに広げる表。BGRからの ``COLOR_BGR2GRAY`` と揃える
+_LIMITED_TO_FULL = np.clip(np.round((np.arange(256) - 16) * (255.0 / 219.0)), 0, 255).astype(np.uint8)
+
+
+def _yuv420_to_bgr(y: np.ndarray, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    h, w = y.shape
+    planar = np.concatenate([y.ravel(), u.ravel(), v.ravel()]).reshape(h * 3 // 2, w)
+    return cv2.cvtColor(planar, cv2.COLOR_YUV2BGR_I420)
+
+
+class Y4MSource(_StreamSource):
+    """YUV4MPEG2 (``ffmpeg -f yuv4mpegpipe``) を読む。4:2:0 / 4:2:2 / 4:4:4 / mono に対応."""
+
+    def __init__(self, stream: BinaryIO | Path | str):
+        if isinstance(stream, (str, Path)):
+            path = Path(stream)
+            super().__init__(open(path, "rb"), True, path)
+            self.path = path
+        else:
+            super().__init__(stream, False, None)
+        header = self.stream.readline()
+        if not header.startswith(Y4M_MAGIC):
+            raise ValueError("Not a YUV4MPEG2 stream.")
+        tags = {tok[:1]: tok[1:] for tok in header[len(Y4M_MAGIC):].decode("ascii").split()}
+        self.width = int(tags["W"])
+        self.height = int(tags["H"])
+        num, _, den = tags.get("F", "30:1").partition(":")
+        self.fps = float(num) / float(den or 1) if float(num) > 0 else DEFAULT_FPS
+        chroma = tags.get("C", "420")
+        # ffmpegはレンジを X 拡張タグで書く。無ければYUVは映像レンジ、monoはフルレンジとみなす
+        color_range = tags.get("X", "").upper()
+        self._expand_luma = ("LIMITED" in color_range) if color_range.startswith("COLORRANGE") \
+            else not chroma.startswith("mono")
+        if chroma.startswith("mono"):
+            self._chroma_shape: tuple[int, int] | None = None
+        elif chroma.startswith("444"):
+            self._chroma_shape = (self.height, self.width)
+        elif chroma.startswith("422"):
+            self._chroma_shape = (self.height, (self.width + 1) // 2)
+        elif chroma.startswith("420"):
+            self._chroma_shape = ((self.height + 1) // 2, (self.width + 1) // 2)
+        else:
+            raise ValueError(f"Unsupported Y4M colorspace: C{chroma}")
+        self._luma_bytes = self.width * self.height
+        self._chroma_bytes = 0 if self._chroma_shape is None else 2 * self._chroma_shape[0] * self._chroma_shape[1]
+        self._data_start = self.stream.tell() if self._source_path is not None else 0
+        if self._source_path is not None:
+            # フレームヘッダに追加パラメータが無ければ長さはファイルサイズから決まる
+            frame_bytes = len(b"FRAME\n") + self._luma_bytes + self._chroma_bytes
+            size = self._source_path.stat().st_size
+            self.frame_count = max(0, (size - self._data_start) // frame_bytes)
+
+    def _frame_header(self) -> bool:
+        line = self.stream.readline()
+        return line.startswith(b"FRAME")
+
+    def _decode(self, luma_only: bool):
+        if not self._frame_header():
+            return None
+        data = self._read_exact(self._luma_bytes)
+        if data is None:
+            return None
+        raw_y = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width)
+        y = _LIMITED_TO_FULL[raw_y] if self._expand_luma else raw_y
+        if self._chroma_shape is None:
+            return (None, y) if luma_only else (cv2.cvtColor(y, cv2.COLOR_GRAY2BGR), y)
+        if luma_only:
+            return (None, y) if self._discard(self._chroma_bytes) else None
+        chroma = self._read_exact(self._chroma_bytes)
+        if chroma is None:
+            return None
+        ch, cw = self._chroma_shape
+        planes = np.frombuffer(chroma, dtype=np.uint8).reshape(2, ch, cw)
+        u, v = planes[0], planes[1]
+        # I420の変換式に揃えるため、4:2:0以外の色差は半分に縮めてから変換する
+        half = ((self.width + 1) // 2, (self.height + 1) // 2)
+        if (cw, ch) != half:
+            u = cv2.resize(u, half, interpolation=cv2.INTER_AREA)
+            v = cv2.resize(v, half, interpolation=cv2.INTER_AREA)
+        # 奇数サイズは輝度の端を1画素複製して偶数にし、変換後に元の大きさへ切り戻す (grayと形を揃える)
+        pad_h, pad_w = half[1] * 2 - self.height, half[0] * 2 - self.width
+        if pad_h or pad_w:
+            padded = cv2.copyMakeBorder(raw_y, 0, pad_h, 0, pad_w, cv2.BORDER_REPLICATE)
+            return _yuv420_to_bgr(padded, u, v)[:self.height, :self.width], y
+        return _yuv420_to_bgr(raw_y, u, v), y
+
+    def _skip(self) -> bool:
+        return self._frame_header() and self._discard(self._luma_bytes + self._chroma_bytes)
+
+    def reopen(self) -> FrameSource | None:
+        return Y4MSource(self._source_path) if self._source_path is not None else None
+
+
+class RawVideoSource(_StreamSource):
+    """ヘッダなしの生フレーム列 (``ffmpeg -f rawvideo -pix_fmt ...``)."""
+
+    def __init__(self, stream: BinaryIO | Path | str, width: int, height: int,
+                 pix_fmt: str = "bgr24", fps: float | None = None):
+        if pix_fmt not in RAW_FORMATS:
+            raise ValueError(f"Unsupported raw pixel format: {pix_fmt}")
+        if isinstance(stream, (str, Path)):
+            path = Path(stream)
+            super().__init__(open(path, "rb"), True, path)
+            self.path = path
+        else:
+            super().__init__(stream, False, None)
+        self.width = int(width)
+        self.height = int(height)
+        self.pix_fmt = pix_fmt
+        self.fps = float(fps or DEFAULT_FPS)
+        self.cache_tag = f"raw:{self.width}x{self.height}:{pix_fmt}"
+        n = self.width * self.height
+        self._luma_bytes = n
+        self._frame_bytes = {"gray": n, "bgr24": n * 3, "rgb24": n * 3, "yuv420p": n * 3 // 2}[pix_fmt]
+        if self._source_path is not None:
+            self.frame_count = self._source_path.stat().st_size // self._frame_bytes
+
+    def _decode(self, luma_only: bool):
+        if self.pix_fmt in ("gray", "yuv420p"):
+            data = self._read_exact(self._luma_bytes)
+            if data is None:
+                return None
+            y = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width)
+            rest = self._frame_bytes - self._luma_bytes
+            if self.pix_fmt == "gray":
+                return (None, y) if luma_only else (cv2.cvtColor(y, cv2.COLOR_GRAY2BGR), y)
+            y = _LIMITED_TO_FULL[y]
+            if luma_only:
+                return (None, y) if self._discard(rest) else None
+            chroma = self._read_exact(rest)
+            if chroma is None:
+                return None
+            planar = np.frombuffer(data + chroma, dtype=np.uint8).reshape(self.height * 3 // 2, self.width)
+            return cv2.cvtColor(planar, cv2.COLOR_YUV2BGR_I420), y
+        data = self._read_exact(self._frame_bytes)
+        if data is None:
+            return None
+        pixels = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)
+        if self.pix_fmt == "rgb24":
+            pixels = cv2.cvtColor(pixels, cv2.COLOR_RGB2BGR)
+        return pixels, None
+
+    def _skip(self) -> bool:
+        return self._discard(self._frame_bytes)
+
+    def reopen(self) -> FrameSource | None:
+        if self._source_path is None:
+            return None
+        return RawVideoSource(self._source_path, self.width, self.height, self.pix_fmt, self.fps)
+
+
+class ArraySource(FrameSource):
+    """numpy配列 (グレースケールまたはBGR) の列。リストなら任意位置に、イテレータなら前方向に進める."""
+
+    def __init__(self, frames: Iterable[np.ndarray], fps: float | None = None):
+        super().__init__()
+        self.fps = float(fps or DEFAULT_FPS)
+        if isinstance(frames, (Sequence, np.ndarray)):
+            self._frames: Sequence[np.ndarray] | None = frames
+            self._random_access = True
+            self._iter = None
+            self.frame_count = len(frames)
+            first = frames[0] if len(frames) else None
+        else:
+            self._frames = None
+            self._iter = iter(frames)
+            first = next(self._iter, None)
+        self._pending = first if self._frames is None else None
+        if first is not None:
+            self.height, self.width = first.shape[:2]
+
+    def _next_array(self) -> np.ndarray | None:
+        if self._frames is not None:
+            return self._frames[self.position] if self.position < len(self._frames) else None
+        if self._pending is not None:
+            frame, self._pending = self._pending, None
+            return frame
+        return next(self._iter, None)
+
+    def _decode(self, luma_only: bool):
+        frame = self._next_array()
+        if frame is None:
+            return None
+        frame = np.asarray(frame, dtype=np.uint8)
+        if frame.ndim == 2:
+            return (None, frame) if luma_only else (cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR), frame)
+        return frame, None
+
+    def _skip(self) -> bool:
+        return self._next_array() is not None
+
+    def _seek(self, index: int):
+        pass
+
+    def reopen(self) -> FrameSource | None:
+        return ArraySource(self._frames, self.fps) if self._frames is not None else None
+
+
+def open_source(spec: FrameSource | Path | str, fps: float | None = None,
+                raw: tuple[int, int, str] | None = None, index: bool | None = None) -> FrameSource:
+    """入力指定からソースを作る.
+
+    ``-`` は標準入力 (``raw`` が無ければY4M)、ディレクトリやglobパターンは連番画像、
+    ``.y4m`` はY4Mファイル、``raw=(width, height, pix_fmt)`` があればrawvideo、
+    それ以外はOpenCVで開ける動画ファイルとして扱う。``fps`` は自前でfpsを
+    持たない連番画像・rawvideo用。``index`` は動画ファイルのフレーム索引で、
+    Trueなら無ければ作る、Falseなら使わない、Noneなら保存済みのものだけ使う。
+    """
+    if isinstance(spec, FrameSource):
+        return spec
+    text = str(spec)
+    if text == "-":
+        stdin = sys.stdin.buffer
+        if raw is not None:
+            return RawVideoSource(stdin, *raw, fps=fps)
+        return Y4MSource(stdin)
+    path = Path(spec)
+    if raw is not None:
+        return RawVideoSource(path, *raw, fps=fps)
+    if path.is_dir() or any(ch in text for ch in "*?["):
+        return ImageSequenceSource(path, fps)
+    if path.suffix.lower() == ".y4m":
+        return Y4MSource(path)
+    source = VideoFileSource(path, saved_index=index is not False)
+    if index:
+        source.ensure_index()
+    return source
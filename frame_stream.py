@@ -0,0 +1,206 @@
+"""ASCII変換したフレームを1枚ずつ順に返すジェネレータと、テキスト・JSON Linesへの書き出し.
+
+``iter_ascii_frames`` はソースを必要な分だけデコードして ``(フレーム番号, 時刻,
+AsciiFrame)`` を返すので、動画全体をメモリに載せずに後段のツールへ流せる。
+マスク・安定化・変換キャッシュは ``export_ass`` と同じように効く。
+
+    python frame_stream.py in.mp4 frames.jsonl --cols 80 --rows 36 --fps 12
+    python frame_stream.py in.mp4 - --format text | less -R
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import sys
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+from typing import TextIO
+
+import numpy as np
+
+from ascii_core import AsciiFrame, AsciiParams, TemporalStabilizer, convert_frame, mask_ascii_frame, uses_color
+from ass_exporter import add_param_arguments, add_source_arguments, resolve_input, source_from_args
+from conversion_cache import ConversionCache
+from frame_source import FrameSource, open_source
+from perf_stats import StatsCallback, Stopwatch, with_prefix
+
+
+FORMATS = ("text", "jsonl")
+# テキスト形式のフレーム区切り (改ページ)。行は常にcols文字なので空白だけの行と紛れない
+TEXT_SEPARATOR = "\f"
+
+
+def iter_ascii_frames(
+    video_path: Path | FrameSource,
+    params: AsciiParams,
+    start_sec: float = 0.0,
+    dur_sec: float | None = None,
+    mask_lookup: Callable[[int], np.ndarray | None] | None = None,
+    stabilizer: TemporalStabilizer | None = None,
+    cache: ConversionCache | None = None,
+    stats: StatsCallback | None = None,
+    with_source: bool = False,
+) -> Iterator[tuple]:
+    """``params.fps`` 間隔の各時刻について ``(元フレーム番号, 時刻, AsciiFrame)`` を返す.
+
+    時刻とフレームの対応は ``export_ass`` と同じ。書き出しfpsが元より高く同じ
+    フレームが続く間は変換結果を使い回す (返したフレームは読み取り専用として扱う)。
+    保持するのは直前の1フレームだけなので、長い動画でもメモリは増えない。
+    ソースはジェネレータが閉じられたときに閉じる (渡された ``FrameSource`` を除く)。
+    ``with_source`` なら元のBGRフレームも付けた4要素を返す (キャッシュに当たっても
+    画素が要るので毎回デコードする)。
+    """
+    owns_source = not isinstance(video_path, FrameSource)
+    source = open_source(video_path)
+    entry = None
+    try:
+        if cache is not None and source.path is not None:
+            entry = cache.open(source.path, params, source.cache_tag)
+        if stabilizer is None and params.hysteresis > 0:
+            stabilizer = TemporalStabilizer(params.hysteresis)
+        luma_only = not uses_color(params) and not with_source
+        convert_stats = with_prefix(stats, "convert.")
+        dt = 1.0 / max(params.fps, 0.1)
+        limit = None if dur_sec is None else int(math.ceil(max(dur_sec, 0.0) / dt))
+        last_idx: int | None = None
+        last_frame: AsciiFrame | None = None
+        last_bgr: np.ndarray | None = None
+        i = 0
+        while limit is None or i < limit:
+            t = start_sec + i * dt
+            watch = Stopwatch(stats)
+            predicted = source.frame_at(t) if source.fps > 0 else None
+            if predicted is None or predicted != last_idx:
+                ascii_frame = None
+                if entry is not None and not with_source and predicted is not None and predicted < source.frame_count:
+                    ascii_frame = entry.get(predicted)
+                    if ascii_frame is not None:
+                        last_idx = predicted
+                        watch.lap("cache")
+                if ascii_frame is None:
+                    if not source.seek_time(t):
+                        break
+                    frame = source.read(luma_only=luma_only)
+                    if frame is None:
+                        break
+                    watch.lap("decode")
+                    ascii_frame = convert_frame(frame.luma(), params, stats=convert_stats, bgr=frame.bgr)
+                    last_idx = frame.index
+                    last_bgr = frame.bgr
+                    if entry is not None:
+                        entry.put(last_idx, ascii_frame)
+                    watch.lap("convert")
+                last_frame = ascii_frame
+
+            out = last_frame
+            if stabilizer is not None:
+                out = stabilizer.apply(out, last_idx)
+                watch.lap("stabilize")
+            if mask_lookup is not None:
+                out = mask_ascii_frame(out, mask_lookup(last_idx))
+                watch.lap("mask")
+            yield (last_idx, t, out, last_bgr) if with_source else (last_idx, t, out)
+            i += 1
+    finally:
+        if entry is not None:
+            entry.close()
+        if owns_source:
+            source.close()
+
+
+def write_text_frames(frames: Iterable[tuple[int, float, AsciiFrame]], out: TextIO,
+                      separator: str = TEXT_SEPARATOR, flush: bool = False) -> int:
+    """フレームをプレーンテキストで書き、書いたフレーム数を返す.
+
+    1フレームはrows行で、フレームの間に ``separator`` だけの行を挟む。
+    ``flush`` ならフレームごとに書き出す (パイプの先で逐次読む場合)。
+    """
+    count = 0
+    for _, _, frame in frames:
+        if count:
+            out.write(separator + "\n")
+        out.write("\n".join(frame.lines) + "\n")
+        if flush:
+            out.flush()
+        count += 1
+    return count
+
+
+def frame_record(frame_idx: int, t: float, frame: AsciiFrame, colors: bool = True) -> dict:
+    """JSON Linesの1行分。カラー時は各行を ``RRGGBB`` をcols個つなげた文字列で持つ."""
+    record = {"frame": int(frame_idx), "time": round(float(t), 6), "lines": frame.lines}
+    if colors and frame.colors is not None:
+        rgb = np.ascontiguousarray(frame.colors[..., ::-1])
+        record["colors"] = [row.tobytes().hex() for row in rgb]
+    return record
+
+
+def write_jsonl_frames(frames: Iterable[tuple[int, float, AsciiFrame]], out: TextIO,
+                       colors: bool = True, flush: bool = False) -> int:
+    """フレームを1行1オブジェクトのJSONで書き、書いたフレーム数を返す (``frame_record``)."""
+    count = 0
+    for frame_idx, t, frame in frames:
+        out.write(json.dumps(frame_record(frame_idx, t, frame, colors), ensure_ascii=False) + "\n")
+        if flush:
+            out.flush()
+        count += 1
+    return count
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Stream a video's ASCII frames as plain text or JSON Lines.")
+    parser.add_argument("input", help="video file, .asscii project, image directory or glob, .y4m file, or - for stdin")
+    parser.add_argument("output", help="output file, or - for stdout")
+    parser.add_argument("--format", choices=FORMATS,
+                        help="text (frames separated by a form feed line) or jsonl (default: from the output suffix)")
+    add_param_arguments(parser)
+    parser.add_argument("--start", type=float, help="start time in seconds")
+    parser.add_argument("--duration", type=float, help="seconds (default: until the end)")
+    parser.add_argument("--no-colors", action="store_true", help="leave per-cell colors out of JSON Lines")
+    parser.add_argument("--no-masks", action="store_true", help="ignore erase masks stored in the project")
+    add_source_arguments(parser)
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=True,
+                        help="reuse converted frames from the on-disk cache")
+    parser.add_argument("--cache-dir", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    video_path, params, layout, mask_lookup = resolve_input(args, parser)
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "jsonl" if Path(args.output).suffix.lower() in (".jsonl", ".ndjson", ".json") else "text"
+    start_sec = args.start if args.start is not None else layout.get("start_sec") or 0.0
+    dur_sec = args.duration if args.duration is not None else layout.get("dur_sec")
+
+    source = source_from_args(parser, args, video_path)
+    to_stdout = args.output == "-"
+    if to_stdout:
+        sys.stdout.reconfigure(encoding="utf-8", newline="\n")
+        out = sys.stdout
+    else:
+        out = open(args.output, "w", encoding="utf-8", newline="\n")
+    frames = iter_ascii_frames(
+        source, params, start_sec=max(0.0, float(start_sec)), dur_sec=dur_sec, mask_lookup=mask_lookup,
+        cache=ConversionCache(args.cache_dir) if args.cache else None,
+    )
+    try:
+        if fmt == "jsonl":
+            write_jsonl_frames(frames, out, colors=not args.no_colors, flush=to_stdout)
+        else:
+            write_text_frames(frames, out, flush=to_stdout)
+    except BrokenPipeError:
+        # 読み手 (head など) が先に終わった。終了時のflushで再び失敗しないよう捨て先に繋ぎ替える
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        frames.close()
+        source.close()
+        if not to_stdout:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""文字のラスタライズ結果から作る、形状マッチ用ビットマップ行列と濃度順の並び.
+
+文字ごとに1セル分をラスタライズし、``GLYPH_PATCH`` に縮小したインク被覆率を
+1行ずつ並べた行列や、被覆率で並べ替えた文字列を作る。どちらもフォント・
+ラスタライズサイズ・文字テーブルごとにキャッシュするので、同じ設定なら
+作り直さない。Pillowは実際にラスタライズするときに初めて読み込む。
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+import numpy as np
+import cv2
+
+
+GLYPH_PATCH = (6, 12)  # 1セルを比較する解像度 (w, h)
+RASTER_SIZE = 24
+
+
+def _rasterize(font_path: str, glyphs: str, size: int) -> list[np.ndarray]:
+    """文字ごとに1セル分 (uint8, 白がインク) を描く."""
+    from PIL import Image, ImageDraw
+
+    from ascii_render import font_cell_size, load_font
+
+    font = load_font(font_path, size)
+    cell_w, cell_h = font_cell_size(font)
+    bitmaps: list[np.ndarray] = []
+    for ch in glyphs:
+        img = Image.new("L", (cell_w, cell_h), color=0)
+        ImageDraw.Draw(img).text((0, 0), ch, font=font, fill=255)
+        bitmaps.append(np.asarray(img))
+    return bitmaps
+
+
+@lru_cache(maxsize=16)
+def glyph_matrix(font_path: str, glyphs: str, size: int = RASTER_SIZE,
+                 patch: tuple[int, int] = GLYPH_PATCH) -> np.ndarray:
+    """``(len(glyphs), patch_w * patch_h)`` のインク被覆率 (0..1, float32)."""
+    pw, ph = patch
+    rows = np.empty((len(glyphs), pw * ph), dtype=np.float32)
+    for i, bitmap in enumerate(_rasterize(font_path, glyphs, size)):
+        small = cv2.resize(bitmap, (pw, ph), interpolation=cv2.INTER_AREA)
+        rows[i] = small.ravel().astype(np.float32) / 255.0
+    rows.flags.writeable = False
+    return rows
+
+
+@lru_cache(maxsize=32)
+def charset_ramp(font_path: str, glyphs: str, size: int = RASTER_SIZE) -> tuple[str, tuple[float, ...]]:
+    """被覆率の薄い順に並べ替えた文字列と、各文字の被覆率 (最小0・最大1に正規化)."""
+    coverage = np.array([bitmap.mean() / 255.0 for bitmap in _rasterize(font_path, glyphs, size)])
+    if coverage.size == 0:
+        return "", ()
+    order = np.argsort(coverage, kind="stable")
+    lo, hi = float(coverage.min()), float(coverage.max())
+    span = hi - lo
+    normalized = (coverage[order] - lo) / span if span > 0 else np.linspace(0.0, 1.0, len(glyphs))
+    return "".join(glyphs[i] for i in order), tuple(float(v) for v in normalized)
@@ -0,0 +1,198 @@
+"""フレーム区間単位でビットパックした消去マスクを保持するストア."""
+
+from __future__ import annotations
+
+import os
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+import numpy as np
+
+
+class MaskStore:
+    """区間インデックスでマスクを共有し、フレーム番号からO(log n)で引く.
+
+    各区間 ``[start, end)`` は ``np.packbits`` で詰めたマスクを1つだけ持ち、
+    区間が分割されても同じ配列を参照し合うのでコピーは発生しない。
+    """
+
+    def __init__(self, shape: tuple[int, int] = (0, 0)):
+        self.shape = (int(shape[0]), int(shape[1]))
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        self._packed: list[np.ndarray] = []
+        self._last_packed: np.ndarray | None = None
+        self._last_mask: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __bool__(self) -> bool:
+        return bool(self._starts)
+
+    def clear(self, shape: tuple[int, int] | None = None):
+        """全マスクを破棄。shape指定時はグリッドサイズも更新する."""
+        if shape is not None:
+            self.shape = (int(shape[0]), int(shape[1]))
+        self._starts.clear()
+        self._ends.clear()
+        self._packed.clear()
+        self._drop_unpacked()
+
+    def pack(self, mask: np.ndarray) -> np.ndarray:
+        if mask.shape != self.shape:
+            raise ValueError(f"Mask shape {mask.shape} does not match {self.shape}.")
+        return np.packbits(np.asarray(mask, dtype=bool).ravel())
+
+    def unpack(self, packed: np.ndarray) -> np.ndarray:
+        count = self.shape[0] * self.shape[1]
+        return np.unpackbits(np.asarray(packed, dtype=np.uint8), count=count).reshape(self.shape).astype(bool)
+
+    def _find(self, frame_idx: int) -> int | None:
+        i = bisect_right(self._starts, frame_idx) - 1
+        if i >= 0 and frame_idx < self._ends[i]:
+            return i
+        return None
+
+    def get_packed(self, frame_idx: int) -> np.ndarray | None:
+        i = self._find(int(frame_idx))
+        return None if i is None else self._packed[i]
+
+    def get(self, frame_idx: int | None) -> np.ndarray | None:
+        """フレームのマスク(読み取り専用)を返す。未設定ならNone."""
+        if frame_idx is None or frame_idx < 0:
+            return None
+        packed = self.get_packed(frame_idx)
+        if packed is None:
+            return None
+        # 連続フレームは同じ区間を引くことが多いので直前の展開結果を使い回す
+        if packed is self._last_packed and self._last_mask is not None:
+            return self._last_mask
+        mask = self.unpack(packed)
+        mask.flags.writeable = False
+        self._last_packed = packed
+        self._last_mask = mask
+        return mask
+
+    def set(self, frame_idx: int, mask: np.ndarray | None):
+        self.set_range(frame_idx, frame_idx + 1, mask)
+
+    def set_range(self, start: int, end: int, mask: np.ndarray | None):
+        """``[start, end)`` に同じマスクを割り当てる。空マスクなら消去."""
+        start = max(0, int(start))
+        end = int(end)
+        if end <= start:
+            return
+        packed: np.ndarray | None = None
+        if mask is not None and np.any(mask):
+            packed = self.pack(mask)
+        self._remove_range(start, end)
+        if packed is None:
+            return
+        i = bisect_right(self._starts, start)
+        self._starts.insert(i, start)
+        self._ends.insert(i, end)
+        self._packed.insert(i, packed)
+        self._merge_neighbors(i)
+
+    def clear_range(self, start: int, end: int):
+        self.set_range(start, end, None)
+
+    def _remove_range(self, start: int, end: int):
+        self._drop_unpacked()
+        i = max(0, bisect_right(self._starts, start) - 1)
+        while i < len(self._starts) and self._starts[i] < end:
+            s, e, packed = self._starts[i], self._ends[i], self._packed[i]
+            if e <= start:
+                i += 1
+                continue
+            del self._starts[i], self._ends[i], self._packed[i]
+            # 区間外にはみ出た部分は同じパック配列を共有したまま残す
+            if s < start:
+                self._starts.insert(i, s)
+                self._ends.insert(i, start)
+                self._packed.insert(i, packed)
+                i += 1
+            if e > end:
+                self._starts.insert(i, end)
+                self._ends.insert(i, e)
+                self._packed.insert(i, packed)
+                i += 1
+
+    def _merge_neighbors(self, i: int):
+        if i + 1 < len(self._starts) and self._ends[i] == self._starts[i + 1]:
+            if self._same(self._packed[i], self._packed[i + 1]):
+                self._ends[i] = self._ends[i + 1]
+                del self._starts[i + 1], self._ends[i + 1], self._packed[i + 1]
+        if i > 0 and self._ends[i - 1] == self._starts[i]:
+            if self._same(self._packed[i - 1], self._packed[i]):
+                self._ends[i - 1] = self._ends[i]
+                del self._starts[i], self._ends[i], self._packed[i]
+
+    @staticmethod
+    def _same(a: np.ndarray, b: np.ndarray) -> bool:
+        return a is b or np.array_equal(a, b)
+
+    def _drop_unpacked(self):
+        self._last_packed = None
+        self._last_mask = None
+
+    @classmethod
+    def from_intervals(cls, shape: tuple[int, int],
+                       intervals: Iterable[tuple[int, int, np.ndarray]]) -> MaskStore:
+        """開始順に並んだ重なりのない区間から組み立てる。配列はコピーせず参照する."""
+        store = cls(shape)
+        for start, end, packed in intervals:
+            if end <= start:
+                continue
+            if store._starts and start < store._ends[-1]:
+                raise ValueError("Mask intervals must be sorted and non-overlapping.")
+            store._starts.append(int(start))
+            store._ends.append(int(end))
+            store._packed.append(packed)
+        return store
+
+    def detach(self, filename: str | os.PathLike | None = None) -> bool:
+        """memmap上のマスクをメモリへ複写する。``filename`` を渡すとそのファイルの分だけ.
+
+        区間どうしの共有は保ったまま複写する。元のファイルを置き換える前に呼ぶ
+        (Windowsでは写像中のファイルを置き換えられない)。複写したらTrue。
+        """
+        target = None if filename is None else Path(filename).resolve()
+        copies: dict[int, np.ndarray] = {}
+        for i, packed in enumerate(self._packed):
+            mapped = getattr(packed, "filename", None)
+            if mapped is None or (target is not None and Path(mapped).resolve() != target):
+                continue
+            copy = copies.get(id(packed))
+            if copy is None:
+                copy = copies[id(packed)] = np.array(packed, dtype=np.uint8)
+            self._packed[i] = copy
+        self._drop_unpacked()
+        return bool(copies)
+
+    def rebind(self, arrays: list[np.ndarray]):
+        """区間の並び順で初めて出てくるマスクから順に ``arrays`` の要素へ差し替える.
+
+        ``intervals`` の順に重複を除いて書き出したファイルを読み直したビューを渡す。
+        """
+        order: dict[int, int] = {}
+        for i, packed in enumerate(self._packed):
+            k = order.setdefault(id(packed), len(order))
+            self._packed[i] = arrays[k]
+        self._drop_unpacked()
+
+    def intervals(self) -> Iterator[tuple[int, int, np.ndarray]]:
+        """``(start, end, packed)`` を開始フレーム順に列挙."""
+        yield from zip(list(self._starts), list(self._ends), list(self._packed))
+
+    def nbytes(self) -> int:
+        seen: set[int] = set()
+        total = 0
+        for packed in self._packed:
+            if id(packed) in seen:
+                continue
+            seen.add(id(packed))
+            total += packed.nbytes
+        return total
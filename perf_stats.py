@@ -0,0 +1,148 @@
+"""処理ステージごとの計測ユーティリティ."""
+
+from __future__ import annotations
+
+import csv
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+
+StatsCallback = Callable[[str, float], None]
+"""``(stage, seconds)`` を受け取る計測コールバック."""
+
+
+def with_prefix(stats: StatsCallback | None, prefix: str) -> StatsCallback | None:
+    """ステージ名に接頭辞を付けて転送するコールバックを返す."""
+    if stats is None:
+        return None
+
+    def forward(stage: str, seconds: float):
+        stats(prefix + stage, seconds)
+
+    return forward
+
+
+class Stopwatch:
+    """直前のlapからの経過時間をステージ名付きでコールバックへ渡す.
+
+    ``stats`` がNoneなら何もしないので、計測なしの経路にほぼコストを足さない。
+    """
+
+    __slots__ = ("_stats", "_prefix", "_t")
+
+    def __init__(self, stats: StatsCallback | None, prefix: str = ""):
+        self._stats = stats
+        self._prefix = prefix
+        self._t = time.perf_counter() if stats is not None else 0.0
+
+    def lap(self, stage: str):
+        if self._stats is None:
+            return
+        now = time.perf_counter()
+        self._stats(self._prefix + stage, now - self._t)
+        self._t = now
+
+
+class PerfStats:
+    """ステージごとの直近サンプルを保持し、パーセンタイルを集計する."""
+
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self, window: int = 240):
+        self.window = max(1, int(window))
+        self._samples: dict[str, deque[float]] = {}
+        self._totals: dict[str, int] = {}
+        self._counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            buf = self._samples.get(stage)
+            if buf is None:
+                buf = deque(maxlen=self.window)
+                self._samples[stage] = buf
+            buf.append(float(seconds))
+            self._totals[stage] = self._totals.get(stage, 0) + 1
+
+    __call__ = record
+
+    def count(self, name: str, n: int = 1):
+        """処理時間ではなく件数を数えるカウンタ."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def counters(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def prefixed(self, prefix: str) -> StatsCallback:
+        return with_prefix(self.record, prefix)
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0)
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+            self._counters.clear()
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """ステージ名 -> 件数/平均/パーセンタイル(ms)."""
+        with self._lock:
+            snapshot = {stage: np.fromiter(buf, dtype=np.float64) for stage, buf in self._samples.items()}
+            totals = dict(self._totals)
+        result: dict[str, dict[str, float]] = {}
+        for stage, values in snapshot.items():
+            if values.size == 0:
+                continue
+            ms = values * 1000.0
+            row = {
+                "count": float(totals.get(stage, values.size)),
+                "mean_ms": float(ms.mean()),
+                "max_ms": float(ms.max()),
+            }
+            for p, v in zip(self.PERCENTILES, np.percentile(ms, self.PERCENTILES)):
+                row[f"p{p}_ms"] = float(v)
+            result[stage] = row
+        return result
+
+    def format_lines(self) -> list[str]:
+        """HUD表示用のテキスト行."""
+        summary = self.summary()
+        if not summary:
+            return ["(no samples)"]
+        width = max(len(stage) for stage in summary)
+        lines = [f"{'stage':<{width}}   p50    p90    p99 ms"]
+        for stage in sorted(summary):
+            row = summary[stage]
+            lines.append(
+                f"{stage:<{width}} {row['p50_ms']:6.2f} {row['p90_ms']:6.2f} {row['p99_ms']:6.2f}"
+            )
+        for name, value in sorted(self.counters().items()):
+            lines.append(f"{name}: {value}")
+        return lines
+
+    def to_csv(self, path: Path | str):
+        fields = ["stage", "count", "mean_ms"] + [f"p{p}_ms" for p in self.PERCENTILES] + ["max_ms"]
+        summary = self.summary()
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            for stage in sorted(summary):
+                row = summary[stage]
+                writer.writerow([stage] + [f"{row[k]:.4f}" if k != "count" else int(row[k]) for k in fields[1:]])
+            for name, value in sorted(self.counters().items()):
+                writer.writerow([name, value] + [""] * (len(fields) - 2))
@@ -0,0 +1,119 @@
+"""再生中のプレビューが目標fpsに間に合うよう、プレビューだけの画質を段階的に落とす.
+
+1フレームの処理時間 (デコードから表示まで) を表示間隔に対する負荷として
+指数移動平均で見て、間に合わなければグリッドを粗くし、それでも足りなければ
+表示するフレームを間引く。余裕が戻るか一時停止すれば段階を戻す。書き出しの
+パラメータには触れず、落とした段階のパラメータは ``preview_params`` で別に作る。
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+
+from ascii_core import AsciiParams
+
+
+@dataclass(frozen=True)
+class QualityLevel:
+    """グリッドの縮小率と、何フレームごとに表示するか."""
+
+    grid_scale: float
+    frame_step: int = 1
+
+    @property
+    def relative_cost(self) -> float:
+        """等倍に対する表示間隔あたりの処理量の目安.
+
+        変換と描画はセル数に比例するがデコードなどは縮まないので、間を取って
+        縮小率に比例するとみなす。
+        """
+        return self.grid_scale / self.frame_step
+
+
+LEVELS = (
+    QualityLevel(1.0),
+    QualityLevel(0.75),
+    QualityLevel(0.5),
+    QualityLevel(0.5, 2),
+    QualityLevel(0.35, 3),
+)
+# 負荷 (処理時間 / 表示間隔) がこれを超えたら1段落とす
+DEGRADE_LOAD = 0.95
+# 1段戻したときの推定負荷がこれを下回れば戻す。間で行き来しないよう低めに取る
+RESTORE_LOAD = 0.6
+# 段階を変えてから次に判断するまでのフレーム数
+SETTLE_FRAMES = 6
+SMOOTHING = 0.3
+MIN_COLS = 10
+MIN_ROWS = 5
+
+
+class PreviewGovernor:
+    """プレビュー1フレームの処理時間を受け取り、画質の段階を決める."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        """等倍に戻す (一時停止・シーク・設定変更のとき)."""
+        self.level = 0
+        self.load: float | None = None
+        self._settled = 0
+
+    @property
+    def current(self) -> QualityLevel:
+        return LEVELS[self.level]
+
+    @property
+    def degraded(self) -> bool:
+        return self.level > 0
+
+    @property
+    def frame_step(self) -> int:
+        return self.current.frame_step
+
+    def record(self, seconds: float, frame_dt: float) -> bool:
+        """表示したフレームの処理時間を渡す。段階が変わったらTrue."""
+        if not self.enabled:
+            return False
+        ratio = seconds / max(frame_dt * self.frame_step, 1e-6)
+        self.load = ratio if self.load is None else self.load + SMOOTHING * (ratio - self.load)
+        self._settled += 1
+        if self._settled < SETTLE_FRAMES:
+            return False
+        level = self.level
+        if self.load > DEGRADE_LOAD and level + 1 < len(LEVELS):
+            level += 1
+        elif level > 0 and self.load * LEVELS[level - 1].relative_cost / self.current.relative_cost < RESTORE_LOAD:
+            level -= 1
+        if level == self.level:
+            return False
+        # 新しい段階での負荷を見積もっておき、測り直すまでの判断に使う
+        self.load *= LEVELS[level].relative_cost / self.current.relative_cost
+        self.level = level
+        self._settled = 0
+        return True
+
+    def preview_params(self, params: AsciiParams) -> AsciiParams | None:
+        """今の段階のプレビュー用パラメータ。等倍ならNone (``params`` をそのまま使う)."""
+        scale = self.current.grid_scale
+        if scale >= 1.0:
+            return None
+        cols = max(min(params.cols, MIN_COLS), int(round(params.cols * scale)))
+        rows = max(min(params.rows, MIN_ROWS), int(round(params.rows * scale)))
+        if (cols, rows) == (params.cols, params.rows):
+            return None
+        return replace(params, cols=cols, rows=rows)
+
+    def describe(self, params: AsciiParams) -> str:
+        """UI表示用の現在の段階."""
+        if not self.enabled:
+            return "Preview: adaptive off"
+        if not self.degraded:
+            return "Preview: full quality"
+        preview = self.preview_params(params) or params
+        text = f"Preview: {preview.cols}x{preview.rows} grid"
+        if self.frame_step > 1:
+            text += f", every {self.frame_step} frames"
+        return text
@@ -0,0 +1,182 @@
+"""編集状態(動画・変換パラメータ・フォント・書き出し設定・消去マスク)の保存と読み込み.
+
+ファイル構成::
+
+    b"ASSCIIP1" | ヘッダ長 (uint64 LE) | JSONヘッダ | 64バイト境界までの詰め物 | マスク領域
+
+マスク領域はビットパックしたマスクを固定長で並べた配列で、読み込み時は
+``np.memmap`` で参照するだけなので、フレームを表示するまで実際には読み出さない。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import struct
+from dataclasses import asdict, dataclass, field, fields
+from pathlib import Path
+
+import numpy as np
+
+from ascii_core import AsciiParams
+from mask_store import MaskStore
+
+
+PROJECT_MAGIC = b"ASSCIIP1"
+PROJECT_VERSION = 1
+PROJECT_SUFFIX = ".asscii"
+_ALIGN = 64
+
+
+@dataclass
+class Project:
+    video_path: Path | None = None
+    params: AsciiParams = field(default_factory=AsciiParams)
+    masks: MaskStore = field(default_factory=MaskStore)
+    font: dict = field(default_factory=dict)
+    export: dict = field(default_factory=dict)
+
+
+def is_project_file(path: Path) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(PROJECT_MAGIC)) == PROJECT_MAGIC
+    except OSError:
+        return False
+
+
+def _params_from_dict(data: dict) -> AsciiParams:
+    # 未知の項目は無視し、欠けている項目は既定値で補う
+    known = {f.name for f in fields(AsciiParams)}
+    params = AsciiParams(**{k: v for k, v in data.items() if k in known})
+    if params.roi is not None:
+        # JSONでは配列になっている
+        params.roi = tuple(float(v) for v in params.roi)
+    return params
+
+
+def _collect_blobs(masks: MaskStore) -> tuple[list[np.ndarray], list[list[int]]]:
+    """区間の並び順で重複を除いたマスク配列と ``[start, end, blob番号]`` の一覧."""
+    blob_ids: dict[int, int] = {}
+    blobs: list[np.ndarray] = []
+    intervals: list[list[int]] = []
+    for start, end, packed in masks.intervals():
+        blob = blob_ids.get(id(packed))
+        if blob is None:
+            blob = len(blobs)
+            blob_ids[id(packed)] = blob
+            blobs.append(np.asarray(packed, dtype=np.uint8))
+        intervals.append([int(start), int(end), blob])
+    return blobs, intervals
+
+
+def _write_blobs(f, blobs: list[np.ndarray], packed_len: int):
+    for blob in blobs:
+        if blob.size != packed_len:
+            raise ValueError("Mask size does not match the stored grid shape.")
+        f.write(blob.tobytes())
+
+
+def save_project(path: Path, project: Project):
+    """一時ファイルに書いてから置き換える.
+
+    ``path`` を写像したままのマスクは置き換える前にメモリへ複写して古い写像を
+    手放し (Windowsでは写像中のファイルを置き換えられない)、書き終えたら新しい
+    ファイルのmemmapを参照させ直す。
+    """
+    path = Path(path)
+    masks = project.masks
+    blobs, intervals = _collect_blobs(masks)
+
+    packed_len = (masks.shape[0] * masks.shape[1] + 7) // 8
+    video_abs = None
+    video_rel = None
+    if project.video_path is not None:
+        video_abs = str(Path(project.video_path).resolve())
+        try:
+            video_rel = os.path.relpath(video_abs, path.resolve().parent)
+        except ValueError:
+            video_rel = None
+    header = {
+        "version": PROJECT_VERSION,
+        "video": video_abs,
+        "video_relative": video_rel,
+        "params": asdict(project.params),
+        "font": project.font,
+        "export": project.export,
+        "masks": {
+            "shape": list(masks.shape),
+            "packed_len": packed_len,
+            "blob_count": len(blobs),
+            "intervals": intervals,
+        },
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    prefix_len = len(PROJECT_MAGIC) + 8 + len(header_bytes)
+    padding = (-prefix_len) % _ALIGN
+
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(PROJECT_MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * padding)
+        _write_blobs(f, blobs, packed_len)
+    blob_count = len(blobs)
+    # 古いファイルを参照する配列が残っていると写像が閉じないので、手元の参照も捨てる
+    # (ループ変数にビューが残らないよう、集めるのと書くのは別の関数で行う)
+    del blobs
+    if path.exists():
+        masks.detach(path)
+    os.replace(tmp, path)
+    if blob_count > 0 and packed_len > 0:
+        views = np.memmap(path, dtype=np.uint8, mode="r", offset=prefix_len + padding, shape=(blob_count, packed_len))
+        masks.rebind(list(views))
+
+
+def load_project(path: Path) -> Project:
+    """ヘッダだけを解析し、マスクはmemmap上のビュー参照として遅延ロードする."""
+    path = Path(path)
+    with open(path, "rb") as f:
+        if f.read(len(PROJECT_MAGIC)) != PROJECT_MAGIC:
+            raise ValueError(f"{path} is not an ASScii project file.")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    if int(header.get("version", 0)) > PROJECT_VERSION:
+        raise ValueError(f"{path} was written by a newer version of ASScii.")
+    prefix_len = len(PROJECT_MAGIC) + 8 + header_len
+    data_offset = prefix_len + (-prefix_len) % _ALIGN
+
+    mask_info = header.get("masks") or {}
+    shape = tuple(int(v) for v in mask_info.get("shape", (0, 0)))
+    packed_len = int(mask_info.get("packed_len", 0))
+    blob_count = int(mask_info.get("blob_count", 0))
+    masks = MaskStore(shape)
+    if blob_count > 0 and packed_len > 0:
+        blobs = np.memmap(path, dtype=np.uint8, mode="r", offset=data_offset, shape=(blob_count, packed_len))
+        # 行ビューを1度だけ作り、同じマスクを共有する区間は同じビューを参照させる
+        views = list(blobs)
+        masks = MaskStore.from_intervals(
+            shape, ((start, end, views[blob]) for start, end, blob in mask_info.get("intervals", []))
+        )
+
+    video_path = None
+    for candidate in (header.get("video_relative"), header.get("video")):
+        if not candidate:
+            continue
+        p = Path(candidate)
+        if not p.is_absolute():
+            p = path.resolve().parent / p
+        if p.exists():
+            video_path = p
+            break
+    if video_path is None and header.get("video"):
+        video_path = Path(header["video"])
+
+    return Project(
+        video_path=video_path,
+        params=_params_from_dict(header.get("params") or {}),
+        masks=masks,
+        font=dict(header.get("font") or {}),
+        export=dict(header.get("export") or {}),
+    )
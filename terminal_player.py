@@ -0,0 +1,277 @@
+"""ASCII変換をターミナルでリアルタイム再生する (SSH越しの確認用).
+
+ANSIエスケープでカーソルを動かし、直前のフレームから変わったセルだけを
+書き直す。再生は単調時計に合わせ、遅れたフレームは読み飛ばす。終了時に
+実際の表示fpsと1フレームあたりの出力バイト数を表示する。
+
+    python terminal_player.py in.mp4 --fps 15
+    ffmpeg -i in.mkv -f yuv4mpegpipe - | python terminal_player.py - --color
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+import time
+import unicodedata
+from typing import BinaryIO
+
+import numpy as np
+
+from ascii_core import AsciiFrame, AsciiParams, TemporalStabilizer, convert_frame, glyph_table, roi_bounds, uses_color
+from ass_exporter import add_param_arguments, add_source_arguments, params_from_args, source_from_args
+from frame_source import FrameSource
+from perf_stats import StatsCallback, Stopwatch
+
+
+# 変化したセルの間にこれ以下の未変化セルしか無ければ、カーソル移動より書き直しのほうが短い
+MERGE_GAP = 4
+# セルの縦横比 (高さ/幅)。端末の文字は縦長なので、縦方向の行数を減らして合わせる
+CELL_ASPECT = 2.0
+
+CSI = "\x1b["
+HIDE_CURSOR = CSI + "?25l"
+SHOW_CURSOR = CSI + "?25h"
+RESET = CSI + "0m"
+
+
+def glyph_widths(glyphs: str, ambiguous_wide: bool = False) -> np.ndarray:
+    """各文字が端末で占める桁数 (1か2)。``ambiguous_wide`` なら幅が曖昧な文字 (░▒▓█ など) も2桁."""
+    wide = ("W", "F", "A") if ambiguous_wide else ("W", "F")
+    return np.array([2 if unicodedata.east_asian_width(ch) in wide else 1 for ch in glyphs], dtype=np.int32)
+
+
+def _fg(key: int) -> str:
+    return f"{CSI}38;2;{key & 0xFF};{(key >> 8) & 0xFF};{key >> 16}m"
+
+
+class TerminalRenderer:
+    """``AsciiFrame`` をANSIエスケープ列に変換する。前回の表示内容との差分だけを出す.
+
+    カーソルの桁は文字の幅 (全角は2桁) を足し合わせて求める。
+    """
+
+    def __init__(self, origin_row: int = 1, ambiguous_wide: bool = False):
+        self.origin_row = int(origin_row)
+        self.ambiguous_wide = bool(ambiguous_wide)
+        self._widths: tuple[str, np.ndarray] | None = None
+        self.reset()
+
+    def forget_color(self):
+        """描画の外で文字色を変えたとき (``RESET`` など) に呼ぶ."""
+        self._fg = None
+
+    def reset(self):
+        """次の描画を全面描き直しにする (端末がクリアされたときなど)."""
+        self._indices: np.ndarray | None = None
+        self._keys: np.ndarray | None = None
+        self._offsets: np.ndarray | None = None
+        self._glyphs: str | None = None
+        self._fg: int | None = None
+        self.last_changed = 0
+
+    @staticmethod
+    def _color_keys(frame: AsciiFrame) -> np.ndarray | None:
+        if frame.colors is None:
+            return None
+        c = frame.colors.astype(np.uint32)
+        # BGR -> 0xBBGGRR
+        return c[..., 2] | (c[..., 1] << 8) | (c[..., 0] << 16)
+
+    def _column_offsets(self, frame: AsciiFrame) -> np.ndarray:
+        # 行ごとの桁位置の累積和。[r, c] がセル c の開始桁 (0始まり)、[r, cols] が行の幅
+        if self._widths is None or self._widths[0] != frame.glyphs:
+            self._widths = (frame.glyphs, glyph_widths(frame.glyphs, self.ambiguous_wide))
+        rows, cols = frame.shape
+        offsets = np.zeros((rows, cols + 1), dtype=np.int32)
+        np.cumsum(self._widths[1][frame.indices], axis=1, out=offsets[:, 1:])
+        return offsets
+
+    def render(self, frame: AsciiFrame) -> str:
+        keys = self._color_keys(frame)
+        lines = frame.lines
+        rows, cols = frame.shape
+        offsets = self._column_offsets(frame)
+        full = (
+            self._indices is None or self._indices.shape != (rows, cols) or self._glyphs != frame.glyphs
+            or (keys is None) != (self._keys is None)
+        )
+        if full:
+            changed = np.ones((rows, cols), dtype=bool)
+            out = [RESET, CSI + "2J"]
+            self._fg = None
+        else:
+            changed = frame.indices != self._indices
+            if keys is not None:
+                changed |= keys != self._keys
+            # 幅の違う文字に変わると、その右のセルは表示位置がずれるので書き直す
+            changed |= offsets[:, :-1] != self._offsets[:, :-1]
+            out = []
+        self.last_changed = int(np.count_nonzero(changed))
+        # 行が短くなったら、はみ出していた古い文字を消す
+        shrunk = np.zeros(rows, dtype=bool) if full else offsets[:, -1] < self._offsets[:, -1]
+
+        for r in np.flatnonzero(changed.any(axis=1) | shrunk).tolist():
+            if shrunk[r]:
+                out.append(f"{CSI}{self.origin_row + r};{offsets[r, -1] + 1}H{CSI}K")
+            if not changed[r].any():
+                continue
+            cells = np.flatnonzero(changed[r])
+            # 近い変化セルはひとつの区間にまとめる
+            breaks = np.flatnonzero(np.diff(cells) > MERGE_GAP + 1) + 1
+            starts = cells[np.r_[0, breaks]].tolist()
+            ends = (cells[np.r_[breaks - 1, len(cells) - 1]] + 1).tolist()
+            line = lines[r]
+            row_offsets = offsets[r].tolist()
+            for s, e in zip(starts, ends):
+                out.append(f"{CSI}{self.origin_row + r};{row_offsets[s] + 1}H")
+                if keys is None:
+                    out.append(line[s:e])
+                    continue
+                row_keys = keys[r].tolist()
+                for c in range(s, e):
+                    if row_keys[c] != self._fg:
+                        self._fg = row_keys[c]
+                        out.append(_fg(self._fg))
+                    out.append(line[c])
+
+        self._indices = frame.indices.copy()
+        self._keys = keys
+        self._offsets = offsets
+        self._glyphs = frame.glyphs
+        return "".join(out)
+
+
+def fit_grid(width: int, height: int, term_cols: int, term_rows: int) -> tuple[int, int]:
+    """端末に収まり、映像の縦横比を保つ (cols, rows)."""
+    aspect = (height / width) / CELL_ASPECT if width > 0 and height > 0 else 0.5
+    cols = max(1, term_cols)
+    rows = max(1, int(round(cols * aspect)))
+    if rows > term_rows:
+        rows = max(1, term_rows)
+        cols = max(1, min(term_cols, int(round(rows / aspect))))
+    return cols, rows
+
+
+def play(
+    source: FrameSource,
+    params: AsciiParams,
+    out: BinaryIO,
+    realtime: bool = True,
+    max_frames: int | None = None,
+    status: bool = True,
+    stats: StatsCallback | None = None,
+    ambiguous_wide: bool = False,
+) -> dict:
+    """ソースを ``params.fps`` で変換しながら ``out`` に描画し、集計を返す.
+
+    ``realtime`` なら単調時計で表示時刻を決め、遅れている分のフレームは
+    読み飛ばす。Falseなら待たずに全フレームを描く (計測用)。
+    ``ambiguous_wide`` は幅が曖昧な文字を2桁で表示する端末 (CJKロケールなど) 向け。
+    """
+    fps = max(params.fps, 0.1)
+    renderer = TerminalRenderer(ambiguous_wide=ambiguous_wide)
+    stabilizer = TemporalStabilizer(params.hysteresis) if params.hysteresis > 0 else None
+    luma_only = not uses_color(params)
+    shown = dropped = total_bytes = total_changed = 0
+    clock_start = time.monotonic()
+    status_row = params.rows + 1
+    out.write(HIDE_CURSOR.encode("ascii"))
+    try:
+        i = 0
+        while max_frames is None or shown < max_frames:
+            if realtime:
+                # 表示予定時刻を過ぎたフレームは飛ばし、次の予定時刻まで待つ
+                due = int((time.monotonic() - clock_start) * fps)
+                if due > i:
+                    dropped += due - i
+                    i = due
+            watch = Stopwatch(stats)
+            target = source.frame_at(i / fps) if source.fps > 0 else i
+            if not source.seek(target):
+                break
+            frame = source.read(luma_only=luma_only)
+            if frame is None:
+                break
+            watch.lap("decode")
+            ascii_frame = convert_frame(frame.luma(), params, bgr=frame.bgr)
+            if stabilizer is not None:
+                ascii_frame = stabilizer.apply(ascii_frame, frame.index)
+            watch.lap("convert")
+            payload = renderer.render(ascii_frame)
+            if status:
+                elapsed = max(time.monotonic() - clock_start, 1e-9)
+                payload += (
+                    f"{RESET}{CSI}{status_row};1H{CSI}2K"
+                    f"{(shown + 1) / elapsed:5.1f} fps  {renderer.last_changed} cells  "
+                    f"{len(payload.encode('utf-8'))} B  dropped {dropped}"
+                )
+                renderer.forget_color()
+            data = payload.encode("utf-8")
+            out.write(data)
+            out.flush()
+            watch.lap("write")
+            total_bytes += len(data)
+            total_changed += renderer.last_changed
+            shown += 1
+            i += 1
+            if realtime:
+                delay = clock_start + i / fps - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        out.write(f"{RESET}{CSI}{params.rows + (2 if status else 1)};1H{SHOW_CURSOR}".encode("ascii"))
+        out.flush()
+    elapsed = max(time.monotonic() - clock_start, 1e-9)
+    cells = max(1, params.rows * params.cols)
+    return {
+        "frames": shown,
+        "dropped": dropped,
+        "fps": shown / elapsed,
+        "target_fps": fps,
+        "bytes_per_frame": total_bytes / max(1, shown),
+        "changed_ratio": total_changed / max(1, shown) / cells,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Play a video as ASCII art in the terminal.")
+    parser.add_argument("input", help="video file, image directory or glob, .y4m file, or - for stdin")
+    add_param_arguments(parser)
+    add_source_arguments(parser)
+    parser.add_argument("--no-status", action="store_true", help="hide the fps / bytes status line")
+    parser.add_argument("--ambiguous-wide", action="store_true",
+                        help="the terminal draws East Asian ambiguous-width glyphs (e.g. ░▒▓█) two columns wide")
+    args = parser.parse_args(argv)
+
+    source = source_from_args(parser, args, args.input)
+    params = params_from_args(args, AsciiParams())
+    if args.fps is None and source.fps > 0:
+        params.fps = source.fps
+    if args.cols is None or args.rows is None:
+        size = shutil.get_terminal_size()
+        x0, y0, x1, y1 = roi_bounds(source.width, source.height, params.roi)
+        # 全角の文字が混じるなら、一番広い文字で埋めても端末に収まるセル数にする
+        glyph_cols = int(glyph_widths(glyph_table(params), args.ambiguous_wide).max(initial=1))
+        cols, rows = fit_grid(x1 - x0, y1 - y0, size.columns // glyph_cols, size.lines - 1)
+        params.cols = args.cols or cols
+        params.rows = args.rows or rows
+    try:
+        summary = play(source, params, sys.stdout.buffer, status=not args.no_status,
+                       ambiguous_wide=args.ambiguous_wide)
+    finally:
+        source.close()
+    print(
+        f"{summary['frames']} frames, {summary['fps']:.1f}/{summary['target_fps']:.1f} fps, "
+        f"{summary['bytes_per_frame']:.0f} bytes/frame, {summary['changed_ratio']:.1%} cells changed, "
+        f"{summary['dropped']} dropped",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""ascii_core の変化検出 (変わらないフレームの使い回し) の確認."""
+
+from dataclasses import replace
+
+import numpy as np
+
+from ascii_core import AsciiParams, ChangeDetector
+
+PARAMS = AsciiParams(cols=8, rows=4)
+
+
+def _gray(value: int) -> np.ndarray:
+    return np.full((32, 64), value, dtype=np.uint8)
+
+
+def test_slow_drift_is_compared_with_the_last_conversion():
+    detector = ChangeDetector()
+    reused = [detector.convert(_gray(100 + i), PARAMS)[1] for i in range(4)]
+    # 1フレームずつなら差は1だが、最後に変換したフレームとの差が溜まると変換し直す
+    assert reused == [False, True, False, True]
+    assert (detector.converted, detector.skipped) == (2, 2)
+
+
+def test_params_change_reconverts_the_same_frame():
+    detector = ChangeDetector()
+    assert detector.convert(_gray(80), PARAMS)[1] is False
+    assert detector.convert(_gray(80), PARAMS)[1] is True
+    frame, reused = detector.convert(_gray(80), replace(PARAMS, invert=False))
+    assert reused is False
+    assert detector.convert(_gray(80), replace(PARAMS, invert=False)) == (frame, True)
+    detector.reset()
+    assert detector.convert(_gray(80), replace(PARAMS, invert=False))[1] is False
+
+
+def test_one_cell_palette_change_is_not_skipped():
+    params = replace(PARAMS, color_mode="color")
+    detector = ChangeDetector()
+    gray = _gray(120)
+    bgr = np.full((32, 64, 3), 120, dtype=np.uint8)
+    first, reused = detector.convert(gray, params, bgr=bgr)
+    assert reused is False
+    assert detector.convert(gray, params, bgr=bgr.copy())[1] is True
+    # 輝度はそのままで、1セル (8x8画素) だけ色が変わる
+    tinted = bgr.copy()
+    tinted[8:16, 16:24] = (0, 0, 255)
+    frame, reused = detector.convert(gray, params, bgr=tinted)
+    assert reused is False
+    changed = np.any(frame.colors != first.colors, axis=2)
+    assert changed.sum() == 1 and changed[1, 2]
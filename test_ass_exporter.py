@@ -0,0 +1,100 @@
+"""ass_exporter の空白を詰めた本文が元と同じ位置に表示されるかの確認."""
+
+import re
+
+import numpy as np
+
+from ass_exporter import compact_bounds, compact_rows, lines_to_ass_text
+
+_TAG = re.compile(r"\{\\c&H([0-9A-F]{6})&\}")
+
+
+def _decode(text: str) -> list[tuple[str, dict[int, int]]]:
+    # 本文を行ごとの文字列と {セル番号: 色キー} に戻す
+    rows = []
+    for raw in text.split("\\N"):
+        cells: list[str] = []
+        tags: dict[int, int] = {}
+        i = 0
+        while i < len(raw):
+            m = _TAG.match(raw, i)
+            if m:
+                tags[len(cells)] = int(m.group(1), 16)
+                i = m.end()
+            elif raw.startswith("\\h", i):
+                cells.append(" ")
+                i += 2
+            else:
+                cells.append(raw[i])
+                i += 1
+        rows.append(("".join(cells), tags))
+    return rows
+
+
+def _layout(text: str, rows: int, cols: int) -> tuple[dict, dict]:
+    """``\\an5`` で ``rows`` x ``cols`` の枠に置いたときの、見える文字と色タグの位置.
+
+    位置は中央揃えの半セルのずれを整数で表すため2倍した座標。見える文字には
+    読み順で効いている色キーも付ける。
+    """
+    decoded = _decode(text)
+    chars: dict[tuple[int, int], tuple[str, int | None]] = {}
+    tags: dict[tuple[int, int], int] = {}
+    color = None
+    for r, (line, line_tags) in enumerate(decoded):
+        y = 2 * r + rows - len(decoded)
+        x0 = cols - len(line)
+        for c in range(len(line) + 1):
+            if c in line_tags:
+                color = line_tags[c]
+                tags[(y, x0 + 2 * c)] = color
+            if c < len(line) and line[c] != " ":
+                chars[(y, x0 + 2 * c)] = (line[c], color)
+    return chars, tags
+
+
+def _assert_same_layout(lines: list[str], colors: np.ndarray | None = None):
+    rows, cols = len(lines), len(lines[0])
+    plain = lines_to_ass_text(lines, colors)
+    compact = lines_to_ass_text(lines, colors, compact=True)
+    assert len(compact) <= len(plain)
+    assert _layout(compact, rows, cols) == _layout(plain, rows, cols)
+    return compact
+
+
+def test_asymmetric_blanks_trim_only_the_shorter_side():
+    lines = ["  #   ", "#     ", "   ##@", "  ##  "]
+    assert compact_bounds("  #   ") == (2, 4)
+    assert compact_bounds("#     ") == (0, 6)
+    assert compact_bounds("  ##  ") == (2, 4)
+    _assert_same_layout(lines)
+
+
+def test_blank_rows_in_the_middle_and_at_the_edges():
+    lines = ["      ", "  #   ", "      ", "   #  ", "      ", "      "]
+    assert compact_rows(lines) == (1, 5)
+    compact = _assert_same_layout(lines)
+    assert compact.count("\\N") == 3
+
+
+def test_all_blank_frame_keeps_one_blank_cell():
+    lines = ["    ", "    ", "    "]
+    assert compact_rows(lines) == (0, 1)
+    assert lines_to_ass_text(lines, compact=True) == "\\h"
+    colors = np.zeros((3, 4, 3), dtype=np.uint8)
+    assert lines_to_ass_text(lines, colors, compact=True) == "\\h"
+
+
+def test_color_change_after_a_blank_run_stays_on_its_cell():
+    lines = ["       ", " ##  #@", "   #   ", "       "]
+    colors = np.zeros((4, 7, 3), dtype=np.uint8)
+    colors[1, 1:3] = (0, 0, 255)
+    colors[1, 5] = (0, 255, 0)
+    colors[1, 6] = (255, 0, 0)
+    # 空白セルの色は見えないので、違う色でも読み飛ばされる
+    colors[1, 3:5] = (9, 9, 9)
+    colors[2, 3] = (255, 0, 0)
+    compact = _assert_same_layout(lines, colors)
+    chars, tags = _layout(compact, 4, 7)
+    assert len(tags) == 3
+    assert sorted(color for _, color in chars.values()) == [0x0000FF, 0x0000FF, 0x00FF00, 0xFF0000, 0xFF0000]
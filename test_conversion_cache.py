@@ -0,0 +1,36 @@
+"""conversion_cache の容量上限の確認."""
+
+import numpy as np
+
+from ascii_core import AsciiFrame, AsciiParams
+from conversion_cache import CHUNK_FRAMES, ConversionCache
+from frame_source import RawVideoSource
+
+
+def test_active_entry_stops_growing_at_the_cap(tmp_path):
+    video = tmp_path / "clip.bin"
+    video.write_bytes(b"\0" * 4096)
+    params = AsciiParams(cols=8, rows=4)
+    cache = ConversionCache(tmp_path / "cache", max_bytes=1)
+    # 1チャンク分だけ入る上限にする
+    entry = cache.open(video, params)
+    cache.max_bytes = entry._chunk_bytes + 4096
+    frame = AsciiFrame(np.ones((4, 8), dtype=np.uint16), entry.glyphs, np.full((4, 8), 7, dtype=np.uint8))
+    for i in range(CHUNK_FRAMES * 3):
+        entry.put(i, frame)
+    entry.close()
+    assert entry.full
+    assert cache.usage() <= cache.max_bytes
+    assert entry.get(0) is not None
+    assert entry.get(CHUNK_FRAMES) is None
+
+
+def test_raw_file_read_differently_gets_its_own_entry(tmp_path):
+    raw = tmp_path / "clip.raw"
+    raw.write_bytes(bytes(range(256)) * 12)
+    params = AsciiParams(cols=8, rows=4)
+    cache = ConversionCache(tmp_path / "cache")
+    with RawVideoSource(raw, 16, 8, "bgr24") as a, RawVideoSource(raw, 32, 8, "gray") as b:
+        entry_a = cache.open(a.path, params, a.cache_tag)
+        entry_b = cache.open(b.path, params, b.cache_tag)
+    assert entry_a.directory != entry_b.directory
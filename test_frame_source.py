@@ -0,0 +1,55 @@
+"""frame_source の読み直し・シークの確認."""
+
+import io
+
+import numpy as np
+
+from frame_source import Y4MSource
+
+
+def _y4m(width: int, height: int, count: int) -> bytes:
+    # フレームごとに輝度と色差を変えた4:2:0のY4M
+    cw, ch = (width + 1) // 2, (height + 1) // 2
+    out = [f"YUV4MPEG2 W{width} H{height} F30:1 C420jpeg\n".encode("ascii")]
+    for i in range(count):
+        out.append(b"FRAME\n")
+        out.append(bytes([40 + 20 * i]) * (width * height))
+        out.append(bytes([100 + 10 * i]) * (cw * ch))
+        out.append(bytes([160 - 10 * i]) * (cw * ch))
+    return b"".join(out)
+
+
+def test_replay_luma_only_frame_as_bgr(tmp_path):
+    path = tmp_path / "clip.y4m"
+    path.write_bytes(_y4m(8, 6, 3))
+    with Y4MSource(path) as expected:
+        first = expected.read()
+    with Y4MSource(path) as source:
+        assert source.read(luma_only=True).bgr is None
+        assert source.seek(0)
+        frame = source.read()
+        assert frame.index == 0
+        np.testing.assert_array_equal(frame.bgr, first.bgr)
+        assert source.read().index == 1
+
+
+def test_replay_luma_only_frame_from_pipe():
+    with Y4MSource(io.BytesIO(_y4m(8, 6, 3))) as source:
+        gray = source.read(luma_only=True).gray
+        assert source.seek(0)
+        frame = source.read()
+        assert frame.index == 0
+        assert frame.bgr.shape == (6, 8, 3)
+        np.testing.assert_array_equal(frame.bgr[..., 0], gray)
+        assert source.read().index == 1
+
+
+def test_odd_size_bgr_matches_luma(tmp_path):
+    path = tmp_path / "odd.y4m"
+    path.write_bytes(_y4m(7, 5, 1))
+    with Y4MSource(path) as source:
+        frame = source.read()
+    assert frame.bgr.shape == (5, 7, 3)
+    assert frame.gray.shape == (5, 7)
+    # 複製した端も含めて一様な色のまま
+    assert (frame.bgr == frame.bgr[0, 0]).all()
@@ -0,0 +1,25 @@
+"""glyph_atlas の被覆率ランプの確認."""
+
+import numpy as np
+
+import glyph_atlas
+
+
+def _fake_rasterize(coverage: dict[str, float]):
+    def rasterize(font_path, glyphs, size):
+        return [np.full((4, 4), round(coverage[ch] * 255), dtype=np.uint8) for ch in glyphs]
+    return rasterize
+
+
+def test_ramp_without_blank_glyph_spans_zero_to_one(monkeypatch):
+    monkeypatch.setattr(glyph_atlas, "_rasterize", _fake_rasterize({"X": 0.4, "O": 0.45, "#": 0.5}))
+    glyph_atlas.charset_ramp.cache_clear()
+    glyphs, levels = glyph_atlas.charset_ramp("fake.ttf", "#XO")
+    assert glyphs == "XO#"
+    np.testing.assert_allclose(levels, (0.0, 0.5, 1.0), atol=0.02)
+
+
+def test_ramp_of_empty_charset(monkeypatch):
+    monkeypatch.setattr(glyph_atlas, "_rasterize", _fake_rasterize({}))
+    glyph_atlas.charset_ramp.cache_clear()
+    assert glyph_atlas.charset_ramp("fake.ttf", "") == ("", ())
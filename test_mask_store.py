@@ -0,0 +1,99 @@
+"""mask_store の区間の分割・結合とmemmapとの付け替えの確認."""
+
+import numpy as np
+
+from mask_store import MaskStore
+
+SHAPE = (3, 5)
+
+
+def _mask(*cells: tuple[int, int]) -> np.ndarray:
+    mask = np.zeros(SHAPE, dtype=bool)
+    for r, c in cells:
+        mask[r, c] = True
+    return mask
+
+
+def _spans(store: MaskStore) -> list[tuple[int, int]]:
+    return [(start, end) for start, end, _ in store.intervals()]
+
+
+def test_set_splits_a_shared_range():
+    a, b = _mask((0, 0)), _mask((2, 4))
+    store = MaskStore(SHAPE)
+    store.set_range(0, 10, a)
+    store.set(4, b)
+    assert _spans(store) == [(0, 4), (4, 5), (5, 10)]
+    packed = [p for _, _, p in store.intervals()]
+    # 分割した両側は同じ配列を参照したまま
+    assert packed[0] is packed[2]
+    np.testing.assert_array_equal(store.get(3), a)
+    np.testing.assert_array_equal(store.get(4), b)
+    np.testing.assert_array_equal(store.get(9), a)
+    store.set(7, None)
+    assert _spans(store) == [(0, 4), (4, 5), (5, 7), (8, 10)]
+    assert store.get(7) is None
+
+
+def test_adjacent_equal_ranges_merge():
+    a = _mask((1, 2))
+    store = MaskStore(SHAPE)
+    store.set_range(0, 3, a)
+    store.set_range(3, 6, a.copy())
+    assert _spans(store) == [(0, 6)]
+    store.set_range(6, 8, _mask((1, 3)))
+    assert _spans(store) == [(0, 6), (6, 8)]
+    # 違うマスクで割った区間を元に戻すと1つにまとまる
+    store.set(2, _mask((0, 1)))
+    store.set(2, a)
+    assert _spans(store) == [(0, 6), (6, 8)]
+
+
+def test_get_outside_intervals_is_none():
+    store = MaskStore(SHAPE)
+    assert store.get(0) is None
+    store.set_range(2, 4, _mask((0, 0)))
+    store.set_range(6, 7, _mask((0, 1)))
+    assert store.get(None) is None
+    assert store.get(-1) is None
+    assert store.get(1) is None
+    assert store.get(4) is None
+    assert store.get(5) is None
+    assert store.get(7) is None
+    assert store.get(6) is not None
+    # 空のマスクは消去として扱う
+    store.set(6, _mask())
+    assert store.get(6) is None
+
+
+def test_detach_and_rebind_round_trip(tmp_path):
+    a, b = _mask((0, 0), (2, 2)), _mask((1, 4))
+    source = MaskStore(SHAPE)
+    source.set_range(0, 6, a)
+    source.set_range(2, 4, b)
+    source.set(4, None)
+    # intervals の順に重複を除いて並べたファイル (project_file と同じ並び)
+    unique: list[np.ndarray] = []
+    for _, _, packed in source.intervals():
+        if not any(packed is u for u in unique):
+            unique.append(packed)
+    path = tmp_path / "masks.bin"
+    np.stack(unique).tofile(path)
+    views = list(np.memmap(path, dtype=np.uint8, mode="r", shape=(len(unique), unique[0].size)))
+    blob = {id(u): i for i, u in enumerate(unique)}
+    store = MaskStore.from_intervals(SHAPE, [(s, e, views[blob[id(p)]]) for s, e, p in source.intervals()])
+
+    assert not store.detach(tmp_path / "other.bin")
+    assert all(isinstance(p, np.memmap) for _, _, p in store.intervals())
+    assert store.detach(path)
+    packed = [p for _, _, p in store.intervals()]
+    assert not any(isinstance(p, np.memmap) for p in packed)
+    assert packed[0] is packed[2] and packed[0] is not packed[1]
+    np.testing.assert_array_equal(store.get(0), a)
+    np.testing.assert_array_equal(store.get(3), b)
+
+    store.rebind(views)
+    packed = [p for _, _, p in store.intervals()]
+    assert packed[0] is views[0] and packed[1] is views[1] and packed[2] is views[0]
+    np.testing.assert_array_equal(store.get(5), a)
+    np.testing.assert_array_equal(store.get(2), b)
@@ -0,0 +1,46 @@
+"""project_file の保存し直しの確認."""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import project_file
+from mask_store import MaskStore
+from project_file import Project, load_project, save_project
+
+
+def _save_masks(path: Path, mask: np.ndarray):
+    # 保存したストアは新しいファイルを写像し直すので、関数の外に残さない
+    masks = MaskStore(mask.shape)
+    masks.set_range(0, 3, mask)
+    masks.set(5, ~mask)
+    save_project(path, Project(masks=masks))
+
+
+@pytest.mark.skipif(not Path("/proc/self/maps").exists(), reason="needs /proc/self/maps")
+def test_resave_releases_old_mapping_before_replace(tmp_path, monkeypatch):
+    path = tmp_path / "edit.asscii"
+    mask = np.zeros((4, 6), dtype=bool)
+    mask[1, 2] = True
+    _save_masks(path, mask)
+
+    project = load_project(path)
+    assert project.masks.get(1)[1, 2]
+    old_inode = os.stat(path).st_ino
+    mapped_at_replace = []
+    real_replace = os.replace
+
+    def replace(src, dst):
+        with open("/proc/self/maps") as f:
+            mapped_at_replace.append(any(
+                str(path) in line and line.split()[4] == str(old_inode) for line in f
+            ))
+        real_replace(src, dst)
+
+    monkeypatch.setattr(project_file.os, "replace", replace)
+    save_project(path, project)
+    assert mapped_at_replace == [False]
+    np.testing.assert_array_equal(project.masks.get(1), mask)
+    np.testing.assert_array_equal(project.masks.get(5), ~mask)
@@ -0,0 +1,35 @@
+"""terminal_player の差分描画の確認."""
+
+import numpy as np
+
+from ascii_core import AsciiFrame
+from terminal_player import CSI, TerminalRenderer, glyph_widths
+
+GLYPHS = " あ#"
+
+
+def _frame(*cells: int, glyphs: str = GLYPHS) -> AsciiFrame:
+    return AsciiFrame(np.array([cells], dtype=np.uint16), glyphs)
+
+
+def test_diff_after_wide_glyph_uses_terminal_columns():
+    renderer = TerminalRenderer()
+    renderer.render(_frame(1, 0, 0, 2))
+    # 「あ」が2桁なのでセル2は4桁目
+    assert renderer.render(_frame(1, 0, 2, 2)) == f"{CSI}1;4H#"
+    assert renderer.last_changed == 1
+
+
+def test_width_change_rewrites_shifted_cells_and_clears_the_tail():
+    renderer = TerminalRenderer()
+    renderer.render(_frame(1, 0, 2, 2))
+    assert renderer.render(_frame(0, 0, 2, 2)) == f"{CSI}1;5H{CSI}K{CSI}1;1H  ##"
+
+
+def test_ambiguous_width_glyphs():
+    np.testing.assert_array_equal(glyph_widths(" ░▒▓█"), [1, 1, 1, 1, 1])
+    # ░ (U+2591) は幅が曖昧な文字ではない
+    np.testing.assert_array_equal(glyph_widths(" ░▒▓█", ambiguous_wide=True), [1, 1, 2, 2, 2])
+    renderer = TerminalRenderer(ambiguous_wide=True)
+    renderer.render(_frame(4, 4, 0, glyphs=" ░▒▓█"))
+    assert renderer.render(_frame(4, 4, 2, glyphs=" ░▒▓█")) == f"{CSI}1;5H▒"
@@ -0,0 +1,129 @@
+"""スクラブ用に一定間隔のフレームを小さな輝度サムネイルにして並べたもの.
+
+フレームスライダーを動かしている間は実際にシークせず、最も近いサムネイルを
+現在のパラメータでASCII化して見せる。作るときは粗い間隔から順に埋めるので、
+途中まででもタイムライン全体のどこかのサムネイルが引ける。フレーム索引が
+あれば各サンプルをキーフレームに寄せ、1枚あたり1回のデコードで済ませる。
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from bisect import bisect_left, insort
+from dataclasses import replace
+
+import cv2
+import numpy as np
+
+from ascii_core import AsciiFrame, AsciiParams, convert_frame
+from frame_index import FrameIndex
+from frame_source import FrameSource
+
+
+THUMB_WIDTH = 256
+MAX_THUMBS = 400
+# 粗い間隔から埋めていくときの最初の刻み (サムネイル間隔の倍数)
+COARSE_STRIDE = 16
+
+
+class TimelineStrip:
+    """フレーム番号順に並んだ輝度サムネイル。別スレッドで埋めながら引ける."""
+
+    def __init__(self, frame_count: int, max_thumbs: int = MAX_THUMBS):
+        self.frame_count = max(0, int(frame_count))
+        self.interval = max(1, math.ceil(self.frame_count / max(1, max_thumbs)))
+        self._indices: list[int] = []
+        self._thumbs: dict[int, np.ndarray] = {}
+        self._ascii: dict[int, AsciiFrame] = {}
+        self._ascii_params: AsciiParams | None = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(t.nbytes for t in self._thumbs.values())
+
+    def targets(self, index: FrameIndex | None = None) -> list[int]:
+        """作る順に並べたサンプル位置 (粗い間隔から細かい間隔へ)."""
+        slots = math.ceil(self.frame_count / self.interval)
+        order: list[int] = []
+        seen: set[int] = set()
+        stride = COARSE_STRIDE
+        while stride >= 1:
+            for k in range(0, slots, stride):
+                if k not in seen:
+                    seen.add(k)
+                    order.append(k)
+            stride //= 2
+        out: list[int] = []
+        for k in order:
+            target = k * self.interval
+            if index is not None:
+                # 区間の前半にキーフレームがあればそこを使う (シーク後のデコードが1枚で済む)
+                key = index.keyframe_before(target + self.interval // 2)
+                if key >= target - self.interval // 2:
+                    target = key
+            out.append(min(target, self.frame_count - 1))
+        return out
+
+    def add(self, frame_idx: int, luma: np.ndarray):
+        h, w = luma.shape[:2]
+        if w > THUMB_WIDTH:
+            size = (THUMB_WIDTH, max(1, int(round(h * THUMB_WIDTH / w))))
+            thumb = cv2.resize(luma, size, interpolation=cv2.INTER_AREA)
+        else:
+            thumb = np.array(luma)
+        with self._lock:
+            if frame_idx in self._thumbs:
+                return
+            self._thumbs[frame_idx] = thumb
+            insort(self._indices, frame_idx)
+
+    def nearest(self, frame_idx: int) -> tuple[int, np.ndarray] | None:
+        """最も近いサムネイルの (フレーム番号, 輝度)。まだ1枚も無ければNone."""
+        with self._lock:
+            indices = self._indices
+            if not indices:
+                return None
+            i = bisect_left(indices, frame_idx)
+            candidates = indices[max(0, i - 1):i + 1]
+            best = min(candidates, key=lambda k: abs(k - frame_idx))
+            return best, self._thumbs[best]
+
+    def ascii_frame(self, frame_idx: int, params: AsciiParams) -> tuple[int, AsciiFrame] | None:
+        """最も近いサムネイルを ``params`` でASCII化したもの (パラメータが同じ間は使い回す)."""
+        found = self.nearest(frame_idx)
+        if found is None:
+            return None
+        idx, thumb = found
+        with self._lock:
+            if self._ascii_params != params:
+                self._ascii.clear()
+                self._ascii_params = replace(params)
+            frame = self._ascii.get(idx)
+        if frame is None:
+            # サムネイルは輝度だけなのでカラーモードでも色は付かない
+            frame = convert_frame(thumb, params)
+            with self._lock:
+                if self._ascii_params == params:
+                    self._ascii[idx] = frame
+        return idx, frame
+
+    def fill(self, source: FrameSource, stop: threading.Event | None = None) -> bool:
+        """``source`` から全サンプルを読む。``stop`` で止められたらFalse."""
+        index = getattr(source, "frame_index", None)
+        targets = self.targets(index)
+        for target in targets:
+            if stop is not None and stop.is_set():
+                return False
+            if target in self._thumbs:
+                continue
+            frame = source.read(luma_only=True) if source.seek(target) else None
+            if frame is None:
+                continue
+            self.add(frame.index, frame.luma())
+        return True
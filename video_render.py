@@ -0,0 +1,253 @@
+"""ASCII変換したフレームを画像に描いて動画ファイルに書き出す (GUIなし).
+
+描画は ``render_ascii_image`` と同じフォント・色で行い、``cv2.VideoWriter`` で
+エンコードする。元の映像と横に並べる (``side``) か、元の映像の上に重ねる
+(``over``) こともできる。描画と合成は数フレームずつのかたまりにして複数の
+プロセスに配り、戻ってきた順ではなく投げた順に書き出す。
+
+    python video_render.py in.mp4 ascii.mp4 --cols 120 --rows 54 --layout side
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import ImageFont
+
+from ascii_core import AsciiFrame, AsciiParams, roi_bounds
+from ascii_render import load_font, render_ascii_image
+from ass_exporter import add_param_arguments, add_source_arguments, params_from_args, source_from_args
+from conversion_cache import ConversionCache
+from frame_source import FrameSource
+from frame_stream import iter_ascii_frames
+from perf_stats import StatsCallback, Stopwatch
+
+
+LAYOUTS = ("ascii", "side", "over")
+# 1回に1つのプロセスへ渡すフレーム数。小さいと受け渡しの手間が、大きいと待ちが増える
+CHUNK_FRAMES = 8
+# プロセスあたり先に投げておくかたまりの数 (メモリに載るのは workers * これ * CHUNK_FRAMES 枚まで)
+CHUNKS_AHEAD = 2
+# 重ねるときに元の映像を暗くする割合
+OVER_DIM = 0.45
+FONT_SIZE = 12
+FOURCC_BY_SUFFIX = {".mp4": "mp4v", ".m4v": "mp4v", ".mov": "mp4v", ".avi": "MJPG", ".mkv": "XVID"}
+FG = (245, 245, 245)
+BG = (10, 10, 10)
+
+
+def _even(n: int) -> int:
+    # 4:2:0のコーデックは幅・高さが偶数でないと書けない
+    return max(2, n + (n & 1))
+
+
+def compose_frame(ascii_rgb: np.ndarray, source_bgr: np.ndarray | None, layout: str,
+                  roi: tuple[float, float, float, float] | None = None) -> np.ndarray:
+    """描いたASCII (RGB) を ``layout`` に従って元の映像と合成したBGR画像.
+
+    ``over`` では ``roi`` (``AsciiParams.roi``) の範囲にだけ文字を重ねる。
+    """
+    ascii_bgr = cv2.cvtColor(ascii_rgb, cv2.COLOR_RGB2BGR)
+    if layout == "ascii" or source_bgr is None:
+        out = ascii_bgr
+    elif layout == "side":
+        # 元の映像をASCIIと同じ高さにして左に置く
+        h = ascii_bgr.shape[0]
+        w = max(1, int(round(source_bgr.shape[1] * h / source_bgr.shape[0])))
+        src = cv2.resize(source_bgr, (w, h), interpolation=cv2.INTER_AREA)
+        out = np.concatenate([src, ascii_bgr], axis=1)
+    else:
+        # 文字の濃さ (背景色からの差) を不透明度にして、暗くした元の映像に重ねる
+        x0, y0, x1, y1 = roi_bounds(source_bgr.shape[1], source_bgr.shape[0], roi)
+        text = cv2.resize(ascii_bgr, (x1 - x0, y1 - y0), interpolation=cv2.INTER_AREA)
+        diff = np.abs(text.astype(np.int16) - np.array(BG[::-1], dtype=np.int16)).max(axis=2)
+        alpha = (np.clip(diff * (1.0 / 128.0), 0.0, 1.0))[..., None]
+        out = (source_bgr * OVER_DIM).astype(np.uint8)
+        region = source_bgr[y0:y1, x0:x1]
+        out[y0:y1, x0:x1] = (region * (OVER_DIM * (1.0 - alpha)) + text * alpha).astype(np.uint8)
+    h, w = out.shape[:2]
+    if (h, w) != (_even(h), _even(w)):
+        out = cv2.copyMakeBorder(out, 0, _even(h) - h, 0, _even(w) - w, cv2.BORDER_CONSTANT, value=BG[::-1])
+    return out
+
+
+class FrameRenderer:
+    """``AsciiFrame`` (と元の映像) を書き出し用のBGR画像にする."""
+
+    def __init__(self, font: ImageFont.FreeTypeFont, layout: str = "ascii", pad: int = 8,
+                 roi: tuple[float, float, float, float] | None = None):
+        self.font = font
+        self.layout = layout
+        self.pad = pad
+        self.roi = roi
+
+    def render(self, frame: AsciiFrame, source_bgr: np.ndarray | None = None) -> np.ndarray:
+        img = render_ascii_image(frame.lines, font=self.font, pad=self.pad, fg=FG, bg=BG, colors=frame.colors)
+        return compose_frame(np.asarray(img), source_bgr, self.layout, self.roi)
+
+
+# ワーカープロセスごとの描画器 (フォントはプロセスをまたいで渡せないので各プロセスで読む)
+_worker_renderer: FrameRenderer | None = None
+
+
+def _init_worker(font_path: str | None, font_size: int, layout: str,
+                 roi: tuple[float, float, float, float] | None = None):
+    global _worker_renderer
+    _worker_renderer = FrameRenderer(load_font(font_path, font_size), layout, roi=roi)
+
+
+def _render_chunk(chunk: list[tuple[AsciiFrame, np.ndarray | None]]) -> list[np.ndarray]:
+    return [_worker_renderer.render(frame, bgr) for frame, bgr in chunk]
+
+
+def _collect(future: Future, stats: StatsCallback | None) -> list[np.ndarray]:
+    # 待った時間が長ければ描画側が、短ければ変換・書き出し側が詰まっている
+    watch = Stopwatch(stats)
+    images = future.result()
+    watch.lap("render_wait")
+    return images
+
+
+def _chunks(frames: Iterable[tuple], with_source: bool, size: int) -> Iterable[list]:
+    chunk: list[tuple[AsciiFrame, np.ndarray | None]] = []
+    for item in frames:
+        frame = item[2]
+        # 描画に要らない輝度格子は送らない
+        chunk.append((AsciiFrame(frame.indices, frame.glyphs, None, frame.colors), item[3] if with_source else None))
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def render_video(
+    video_path: Path | FrameSource,
+    out_path: Path,
+    params: AsciiParams,
+    layout: str = "ascii",
+    font_path: str | None = None,
+    font_size: int = FONT_SIZE,
+    start_sec: float = 0.0,
+    dur_sec: float | None = None,
+    mask_lookup: Callable[[int], np.ndarray | None] | None = None,
+    cache: ConversionCache | None = None,
+    workers: int = 0,
+    fourcc: str | None = None,
+    stats: StatsCallback | None = None,
+) -> dict:
+    """``iter_ascii_frames`` の各フレームを描画して ``params.fps`` の動画に書き出し、集計を返す.
+
+    ``workers`` が正なら描画と合成をその数のプロセスで行う (0なら呼び出し元で描く)。
+    変換と書き出しは順番が要るので呼び出し元のまま。``fourcc`` を省くと
+    出力の拡張子から選ぶ。戻り値の ``fps`` は書き出しまで含めた実測値。
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout}")
+    with_source = layout != "ascii"
+    fourcc = fourcc or FOURCC_BY_SUFFIX.get(Path(out_path).suffix.lower(), "mp4v")
+    frames = iter_ascii_frames(video_path, params, start_sec=start_sec, dur_sec=dur_sec, mask_lookup=mask_lookup,
+                               cache=None if with_source else cache, stats=stats, with_source=with_source)
+    writer: cv2.VideoWriter | None = None
+    written = 0
+    clock_start = time.perf_counter()
+
+    def write(images: list[np.ndarray]):
+        nonlocal writer, written
+        for img in images:
+            watch = Stopwatch(stats)
+            if writer is None:
+                writer = cv2.VideoWriter(str(out_path), cv2.VideoWriter_fourcc(*fourcc), float(params.fps),
+                                         (img.shape[1], img.shape[0]))
+                if not writer.isOpened():
+                    raise RuntimeError(f"Could not open video writer: {out_path} ({fourcc})")
+            writer.write(img)
+            written += 1
+            watch.lap("encode")
+
+    try:
+        if workers <= 0:
+            renderer = FrameRenderer(load_font(font_path, font_size), layout, roi=params.roi)
+            for chunk in _chunks(frames, with_source, CHUNK_FRAMES):
+                images = []
+                for frame, bgr in chunk:
+                    watch = Stopwatch(stats)
+                    images.append(renderer.render(frame, bgr))
+                    watch.lap("render")
+                write(images)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(font_path, font_size, layout, params.roi)) as pool:
+                pending: deque[Future] = deque()
+                for chunk in _chunks(frames, with_source, CHUNK_FRAMES):
+                    pending.append(pool.submit(_render_chunk, chunk))
+                    # 先頭のかたまりから順に受け取るので、出力の順番は投げた順のまま
+                    while len(pending) >= workers * CHUNKS_AHEAD:
+                        write(_collect(pending.popleft(), stats))
+                while pending:
+                    write(_collect(pending.popleft(), stats))
+    finally:
+        frames.close()
+        if writer is not None:
+            writer.release()
+    elapsed = max(time.perf_counter() - clock_start, 1e-9)
+    return {"frames": written, "seconds": elapsed, "fps": written / elapsed, "workers": workers}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Render a video's ASCII conversion to a video file.")
+    parser.add_argument("input", help="video file, image directory or glob, .y4m file, or - for stdin")
+    parser.add_argument("output", type=Path, help="output video (.mp4, .avi, .mkv)")
+    add_param_arguments(parser)
+    parser.add_argument("--layout", choices=LAYOUTS, default="ascii",
+                        help="ascii only, source and ascii side by side, or ascii over the dimmed source")
+    parser.add_argument("--font", help="monospace font file (default: the first common one found)")
+    parser.add_argument("--font-size", type=int, default=FONT_SIZE, help="font size in pixels")
+    parser.add_argument("--start", type=float, default=0.0, help="start time in seconds")
+    parser.add_argument("--duration", type=float, help="seconds (default: until the end)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="render in this many processes (default: CPU count - 1; 0 renders in-process)")
+    parser.add_argument("--fourcc", help="codec FourCC (default: from the output suffix)")
+    add_source_arguments(parser)
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=True,
+                        help="reuse converted frames from the on-disk cache (ascii layout only)")
+    parser.add_argument("--cache-dir", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    source = source_from_args(parser, args, args.input)
+    params = params_from_args(args, AsciiParams())
+    if args.fps is None and source.fps > 0:
+        params.fps = source.fps
+    workers = args.workers
+    if workers is None:
+        workers = max(0, (os.cpu_count() or 1) - 1)
+    try:
+        summary = render_video(
+            source, args.output, params, layout=args.layout, font_path=args.font, font_size=args.font_size,
+            start_sec=max(0.0, args.start), dur_sec=args.duration,
+            cache=ConversionCache(args.cache_dir) if args.cache else None,
+            workers=workers, fourcc=args.fourcc,
+        )
+    except (RuntimeError, ValueError) as e:
+        parser.error(str(e))
+    finally:
+        source.close()
+    print(
+        f"{summary['frames']} frames in {summary['seconds']:.1f}s, {summary['fps']:.1f} fps "
+        f"({summary['workers']} workers)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())